@@ -0,0 +1,206 @@
+"""
+Attention Summary Module for VocalGuard
+
+This module turns the AudioTransformer's attention weights into compact
+payloads. A 30 s clip has ~1,500 frames, so one head-averaged attention matrix
+per layer is millions of floats; serialising them as nested JSON lists is slow
+and makes responses and Firestore documents huge.
+
+In "summary" mode (the default) every layer is reduced to a matrix pooled to a
+fixed resolution (or its top-k strongest query/key pairs) plus a per-frame
+saliency vector. In "full" mode the complete matrices are added as float16,
+either base64-encoded inside JSON or as raw bytes for a msgpack response.
+Results stored in Firestore always keep the summary only.
+"""
+
+import base64
+import os
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from models.attention_pooling import pool_matrix
+
+# Attention payload configuration
+ATTENTION_MODES = ("summary", "full")
+ATTENTION_POOLINGS = ("mean", "max", "topk")
+ATTENTION_ENCODINGS = ("base64", "msgpack")
+DEFAULT_ATTENTION_MODE = os.getenv("VOCALGUARD_ATTENTION_MODE", "summary").lower()
+DEFAULT_ATTENTION_POOLING = os.getenv("VOCALGUARD_ATTENTION_POOLING", "mean").lower()
+DEFAULT_ATTENTION_RESOLUTION = int(os.getenv("VOCALGUARD_ATTENTION_RESOLUTION", "32"))
+DEFAULT_ATTENTION_TOP_K = int(os.getenv("VOCALGUARD_ATTENTION_TOP_K", "16"))
+MAX_ATTENTION_RESOLUTION = 256
+MAX_ATTENTION_TOP_K = 1024
+
+# Decimal places kept in JSON summaries
+SUMMARY_DECIMALS = 5
+
+
+def resolve_attention_options(mode=None, pooling=None, resolution=None, top_k=None, encoding=None):
+    """
+    Validate requested attention payload options, filling in the configured defaults
+
+    Args:
+        mode: "summary" or "full"
+        pooling: "mean", "max" or "topk"
+        resolution: Number of frames the pooled matrix and saliency vector are reduced to
+        top_k: Number of query/key pairs kept per layer with "topk" pooling
+        encoding: "base64" or "msgpack" for full matrices
+
+    Returns:
+        dict: Options for summarize_attention
+
+    Raises:
+        ValueError: If an option is not supported
+    """
+    options = {
+        "mode": (mode or DEFAULT_ATTENTION_MODE).lower(),
+        "pooling": (pooling or DEFAULT_ATTENTION_POOLING).lower(),
+        "resolution": int(resolution or DEFAULT_ATTENTION_RESOLUTION),
+        "top_k": int(top_k or DEFAULT_ATTENTION_TOP_K),
+        "encoding": (encoding or "base64").lower(),
+    }
+    if options["mode"] not in ATTENTION_MODES:
+        raise ValueError(f"Unsupported attention mode '{options['mode']}', expected one of {', '.join(ATTENTION_MODES)}")
+    if options["pooling"] not in ATTENTION_POOLINGS:
+        raise ValueError(f"Unsupported attention pooling '{options['pooling']}', "
+                         f"expected one of {', '.join(ATTENTION_POOLINGS)}")
+    if options["encoding"] not in ATTENTION_ENCODINGS:
+        raise ValueError(f"Unsupported attention encoding '{options['encoding']}', "
+                         f"expected one of {', '.join(ATTENTION_ENCODINGS)}")
+    if not 1 <= options["resolution"] <= MAX_ATTENTION_RESOLUTION:
+        raise ValueError(f"Attention resolution must be between 1 and {MAX_ATTENTION_RESOLUTION}")
+    if not 1 <= options["top_k"] <= MAX_ATTENTION_TOP_K:
+        raise ValueError(f"Attention top_k must be between 1 and {MAX_ATTENTION_TOP_K}")
+    return options
+
+
+def _to_list(tensor):
+    return np.round(tensor.float().cpu().numpy(), SUMMARY_DECIMALS).tolist()
+
+
+def saliency(matrix, resolution):
+    """
+    Attention each frame receives, averaged over queries and binned to the target resolution
+
+    Args:
+        matrix: Head-averaged attention of one layer, (seq_len, seq_len)
+        resolution: Target number of bins
+
+    Returns:
+        torch.Tensor: Saliency vector of at most resolution values
+    """
+    received = matrix.float().mean(dim=0)
+    if received.shape[0] <= resolution:
+        return received
+    return F.adaptive_avg_pool1d(received[None, None], resolution)[0, 0]
+
+
+def top_k_pairs(matrix, k):
+    """
+    Strongest query/key pairs of an attention matrix
+
+    Returns:
+        list: [query_frame, key_frame, weight] triples, strongest first
+    """
+    values, indices = torch.topk(matrix.flatten(), min(k, matrix.numel()))
+    columns = matrix.shape[1]
+    return [
+        [int(index) // columns, int(index) % columns, round(float(value), SUMMARY_DECIMALS)]
+        for value, index in zip(values.cpu(), indices.cpu())
+    ]
+
+
+def encode_matrix(matrix, encoding="base64"):
+    """
+    Encode a full attention matrix compactly as float16
+
+    Args:
+        matrix: Tensor to encode
+        encoding: "base64" (a string for JSON) or "msgpack" (raw bytes)
+
+    Returns:
+        dict: dtype, shape and data
+    """
+    data = matrix.detach().cpu().numpy().astype("<f2").tobytes()
+    return {
+        "dtype": "float16",
+        "shape": list(matrix.shape),
+        "data": base64.b64encode(data).decode("ascii") if encoding == "base64" else data
+    }
+
+
+def summarize_attention(attention_weights, options=None):
+    """
+    Build the attention analysis payload from the AudioTransformer's attention weights
+
+    Args:
+        attention_weights: List of (batch, heads, seq_len, seq_len) tensors, one per layer
+        options: Options from resolve_attention_options (default: the configured defaults)
+
+    Returns:
+        dict: Attention analysis with a summary per layer (and full matrices in "full" mode)
+    """
+    options = options or resolve_attention_options()
+    resolution = options["resolution"]
+
+    analysis = {
+        "mode": options["mode"],
+        "pooling": options["pooling"],
+        "num_layers": len(attention_weights),
+        "num_heads": attention_weights[0].shape[1],
+        "sequence_length": attention_weights[0].shape[2],
+        "resolution": min(resolution, attention_weights[0].shape[2]),
+        "layer_attention": []
+    }
+
+    layer_saliency = []
+    for i, layer_attention in enumerate(attention_weights):
+        # Average attention across heads (first item of the batch)
+        matrix = torch.mean(layer_attention[0], dim=0)
+        layer_saliency.append(saliency(matrix, resolution))
+
+        layer = {
+            "layer": i + 1,
+            "saliency": _to_list(layer_saliency[-1]),
+            "max_attention": float(torch.max(layer_attention).cpu()),
+            "min_attention": float(torch.min(layer_attention).cpu())
+        }
+        if options["pooling"] == "topk":
+            layer["top_k"] = top_k_pairs(matrix, options["top_k"])
+        else:
+            layer["attention_matrix"] = _to_list(pool_matrix(matrix, resolution, options["pooling"]))
+        if options["mode"] == "full":
+            layer["full_attention_matrix"] = encode_matrix(matrix, options["encoding"])
+        analysis["layer_attention"].append(layer)
+
+    # Saliency averaged over all layers
+    analysis["saliency"] = _to_list(torch.stack(layer_saliency).mean(dim=0))
+    return analysis
+
+
+def strip_full_matrices(analysis):
+    """Copy of an attention analysis without the full matrices (for storage)"""
+    if not analysis or "layer_attention" not in analysis:
+        return analysis
+    return {
+        **analysis,
+        "mode": "summary",
+        "layer_attention": [
+            {key: value for key, value in layer.items() if key != "full_attention_matrix"}
+            for layer in analysis["layer_attention"]
+        ]
+    }
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, (np.ndarray, np.generic, torch.Tensor)):
+        return obj.tolist()
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+def pack_msgpack(payload):
+    """Serialize a response payload with msgpack (full matrices stay raw float16 bytes)"""
+    import msgpack
+    return msgpack.packb(payload, use_bin_type=True, default=_msgpack_default)
@@ -0,0 +1,220 @@
+"""
+Audio Context Module for VocalGuard
+
+An AudioContext is created once per upload and passed through the detection
+pipeline. It decodes the file a single time at its native sample rate and
+derives the 16 kHz mono waveform used by the models from that decode (computed
+lazily and cached). Metadata for stored analyses is probed from the container
+header instead, so it never needs a decode of its own.
+"""
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+import librosa
+import soundfile as sf
+
+from core.audio_metadata import probe_audio_metadata
+
+# Sample rate expected by the Wav2Vec2 models
+TARGET_SAMPLE_RATE = 16000
+
+
+class AudioContext:
+    """Decoded audio shared by every stage of one detection request"""
+
+    def __init__(self, path, filename=None, content_hash=None):
+        """
+        Initialize the context (decoding happens lazily on first access)
+
+        Args:
+            path: Path to the audio file
+            filename: Original filename of the upload (default: basename of path)
+            content_hash: SHA-256 of the file if already known (e.g. computed while uploading)
+        """
+        self.path = path
+        self.filename = filename or os.path.basename(path)
+        self.file_size = os.path.getsize(path)
+        self._content_hash = content_hash
+
+        self._lock = threading.Lock()
+        self._waveform = None  # (channels, samples) at native rate
+        self._sample_rate = None
+        self._mono = None
+        self._waveform_16k = None
+        self._metadata = None
+
+    def _decode(self):
+        """Decode the file once at its native sample rate"""
+        if self._waveform is not None:
+            return
+
+        with self._lock:
+            if self._waveform is not None:
+                return
+            try:
+                data, sample_rate = sf.read(self.path, dtype="float32", always_2d=True)
+                waveform = data.T  # (channels, samples)
+            except Exception:
+                # Formats libsndfile can't read (e.g. some mp3/m4a) go through librosa/audioread
+                data, sample_rate = librosa.load(self.path, sr=None, mono=False)
+                waveform = np.atleast_2d(data).astype(np.float32)
+
+            self._sample_rate = int(sample_rate)
+            self._waveform = np.ascontiguousarray(waveform)
+
+    @property
+    def waveform(self):
+        """Native-rate PCM, shape (channels, samples)"""
+        self._decode()
+        return self._waveform
+
+    @property
+    def sample_rate(self):
+        """Native sample rate in Hz"""
+        self._decode()
+        return self._sample_rate
+
+    @property
+    def channels(self):
+        """Number of audio channels"""
+        return self.waveform.shape[0]
+
+    @property
+    def num_samples(self):
+        """Number of samples per channel"""
+        return self.waveform.shape[1]
+
+    @property
+    def duration(self):
+        """Duration in seconds"""
+        return self.num_samples / float(self.sample_rate) if self.sample_rate else 0.0
+
+    @property
+    def mono(self):
+        """Native-rate mono waveform (channel average)"""
+        if self._mono is None:
+            waveform = self.waveform
+            self._mono = waveform[0] if waveform.shape[0] == 1 else np.mean(waveform, axis=0)
+        return self._mono
+
+    @property
+    def waveform_16k(self):
+        """16 kHz mono float32 waveform, resampled on first access and cached"""
+        if self._waveform_16k is None:
+            mono = self.mono
+            if self.sample_rate != TARGET_SAMPLE_RATE:
+                mono = librosa.resample(mono, orig_sr=self.sample_rate, target_sr=TARGET_SAMPLE_RATE)
+            self._waveform_16k = np.ascontiguousarray(mono, dtype=np.float32)
+        return self._waveform_16k
+
+    def iter_windows(self, window_seconds, hop_seconds):
+        """
+        Yield 16 kHz mono windows covering the whole recording
+
+        Window starts are 0, hop, 2*hop, ... and the last window is aligned to
+        the end of the audio, so every sample is covered and only recordings
+        shorter than one window produce a short window. When the
+        file has not been decoded yet and libsndfile can read it, windows are
+        read from disk one at a time, so memory stays bounded for very long
+        recordings.
+
+        Args:
+            window_seconds: Window length in seconds
+            hop_seconds: Distance between window starts in seconds
+
+        Yields:
+            np.ndarray: 16 kHz mono float32 window
+        """
+        if hop_seconds <= 0 or window_seconds <= 0:
+            raise ValueError("window_seconds and hop_seconds must be positive")
+
+        if self._waveform is None:
+            try:
+                yield from self._iter_file_windows(window_seconds, hop_seconds)
+                return
+            except sf.LibsndfileError:
+                # Not readable by libsndfile; fall back to the full decode below
+                pass
+
+        waveform = self.waveform_16k
+        window = int(round(window_seconds * TARGET_SAMPLE_RATE))
+        hop = int(round(hop_seconds * TARGET_SAMPLE_RATE))
+        start = 0
+        while True:
+            if start + window > len(waveform):
+                start = max(0, len(waveform) - window)
+            yield waveform[start:start + window]
+            if start + window >= len(waveform):
+                break
+            start += hop
+
+    def _iter_file_windows(self, window_seconds, hop_seconds):
+        """Read windows straight from the file and resample each one to 16 kHz"""
+        with sf.SoundFile(self.path) as f:
+            sample_rate = f.samplerate
+            total = f.frames
+            window = int(round(window_seconds * sample_rate))
+            hop = int(round(hop_seconds * sample_rate))
+            start = 0
+            while True:
+                if start + window > total:
+                    start = max(0, total - window)
+                f.seek(start)
+                block = f.read(window, dtype="float32", always_2d=True)
+                mono = block[:, 0] if block.shape[1] == 1 else block.mean(axis=1)
+                if sample_rate != TARGET_SAMPLE_RATE:
+                    mono = librosa.resample(mono, orig_sr=sample_rate, target_sr=TARGET_SAMPLE_RATE)
+                yield np.ascontiguousarray(mono, dtype=np.float32)
+                if start + window >= total:
+                    break
+                start += hop
+
+    @property
+    def content_hash(self):
+        """SHA-256 hex digest of the file bytes"""
+        if self._content_hash is None:
+            hasher = hashlib.sha256()
+            with open(self.path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+            self._content_hash = hasher.hexdigest()
+        return self._content_hash
+
+    @property
+    def metadata(self):
+        """
+        Stored-analysis metadata read from the container header
+
+        Returns:
+            dict: file_size, duration, sample_rate, channels, bit_depth, format, source
+        """
+        if self._metadata is None:
+            self._metadata = probe_audio_metadata(self.path)
+        return self._metadata
+
+    def __repr__(self):
+        return f"AudioContext(filename={self.filename!r}, file_size={self.file_size})"
+
+
+def as_audio_context(audio, filename=None, content_hash=None):
+    """
+    Wrap a path in an AudioContext (contexts are returned unchanged)
+
+    Args:
+        audio: Path to an audio file or an existing AudioContext
+        filename: Original filename of the upload
+        content_hash: SHA-256 of the file if already known
+
+    Returns:
+        AudioContext: Context for the audio
+    """
+    if isinstance(audio, AudioContext):
+        if filename:
+            audio.filename = filename
+        if content_hash:
+            audio._content_hash = content_hash
+        return audio
+    return AudioContext(audio, filename=filename, content_hash=content_hash)
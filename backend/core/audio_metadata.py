@@ -0,0 +1,114 @@
+"""
+Audio Metadata Module for VocalGuard
+
+This module reads duration, sample rate, channels and bit depth of an audio
+file from its container header (soundfile, then audioread) so that stored
+analysis metadata does not require decoding the whole file. A full decode is
+only used as a last resort.
+"""
+
+import os
+
+import soundfile as sf
+
+# Bit depth of the libsndfile subtypes that have one
+_SUBTYPE_BIT_DEPTH = {
+    "PCM_S8": "8 bits",
+    "PCM_U8": "8 bits",
+    "PCM_16": "16 bits",
+    "PCM_24": "24 bits",
+    "PCM_32": "32 bits",
+    "FLOAT": "32 bits (float)",
+    "DOUBLE": "64 bits (float)",
+    "ALAC_16": "16 bits",
+    "ALAC_20": "20 bits",
+    "ALAC_24": "24 bits",
+    "ALAC_32": "32 bits",
+}
+
+# Reported bit depth for lossy/compressed formats and unknown subtypes
+COMPRESSED_BIT_DEPTH = "compressed"
+UNKNOWN_BIT_DEPTH = "unknown"
+
+
+def _probe_soundfile(path):
+    """Read metadata from the header with libsndfile"""
+    info = sf.info(path)
+    return {
+        "duration": float(info.frames) / info.samplerate if info.samplerate else 0.0,
+        "sample_rate": int(info.samplerate),
+        "channels": int(info.channels),
+        "bit_depth": _SUBTYPE_BIT_DEPTH.get(info.subtype, COMPRESSED_BIT_DEPTH),
+        "format": info.format,
+        "source": "soundfile",
+    }
+
+
+def _probe_audioread(path):
+    """Read metadata with audioread (ffmpeg/gstreamer/coreaudio backends)"""
+    import audioread
+
+    with audioread.audio_open(path) as f:
+        return {
+            "duration": float(f.duration),
+            "sample_rate": int(f.samplerate),
+            "channels": int(f.channels),
+            "bit_depth": UNKNOWN_BIT_DEPTH,
+            "format": os.path.splitext(path)[1].lstrip(".").upper() or None,
+            "source": "audioread",
+        }
+
+
+def _probe_decode(path):
+    """Fall back to decoding the file"""
+    import librosa
+
+    data, sample_rate = librosa.load(path, sr=None, mono=False)
+    channels = 1 if data.ndim == 1 else data.shape[0]
+    return {
+        "duration": float(data.shape[-1]) / sample_rate if sample_rate else 0.0,
+        "sample_rate": int(sample_rate),
+        "channels": int(channels),
+        "bit_depth": UNKNOWN_BIT_DEPTH,
+        "format": os.path.splitext(path)[1].lstrip(".").upper() or None,
+        "source": "decode",
+    }
+
+
+def probe_audio_metadata(path, allow_decode=True):
+    """
+    Get the metadata of an audio file, reading only its header when possible
+
+    Args:
+        path: Path to the audio file
+        allow_decode: Whether to decode the file when no header prober can read it
+
+    Returns:
+        dict: file_size, duration, sample_rate, channels, bit_depth, format and
+            source (which prober produced the values)
+    """
+    probers = [_probe_soundfile, _probe_audioread]
+    if allow_decode:
+        probers.append(_probe_decode)
+
+    metadata = None
+    for prober in probers:
+        try:
+            metadata = prober(path)
+            break
+        except Exception:
+            continue
+
+    if metadata is None:
+        print(f"Error getting audio metadata for {path}")
+        metadata = {
+            "duration": 0,
+            "sample_rate": 16000,
+            "channels": 1,
+            "bit_depth": UNKNOWN_BIT_DEPTH,
+            "format": None,
+            "source": "fallback",
+        }
+
+    metadata["file_size"] = os.path.getsize(path)
+    return metadata
@@ -0,0 +1,331 @@
+"""
+Batch Analysis Module for VocalGuard
+
+This module analyses many audio files in one request. Uploads may be plain
+audio files or zip/tar archives; archive members are extracted one at a time
+and streamed to disk in chunks. Files are analysed on the shared inference
+executor while later files are still being ingested, so concurrent files share
+micro-batched forward passes. Results are persisted to Firestore in bulk
+batched writes and yielded as each group of files finishes, which lets the
+endpoint return them in one response or stream them as NDJSON.
+"""
+
+import asyncio
+import os
+import tarfile
+import time
+import zipfile
+
+from starlette.concurrency import run_in_threadpool
+
+from core.audio_context import AudioContext
+from core.executor import inference_executor, ExecutorSaturatedError
+from core.upload import (
+    ingest_upload, write_chunks, check_duration, UploadRejectedError,
+    MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE, MULTIPART_OVERHEAD_BYTES
+)
+
+# Batch limits
+BATCH_MAX_FILES = int(os.getenv("VOCALGUARD_BATCH_MAX_FILES", "500"))
+BATCH_MAX_ARCHIVE_BYTES = int(float(os.getenv("VOCALGUARD_BATCH_MAX_ARCHIVE_MB", "2048")) * 1024 * 1024)
+# Whole batch request body (all files and archives together)
+BATCH_MAX_REQUEST_BYTES = int(float(os.getenv(
+    "VOCALGUARD_BATCH_MAX_REQUEST_MB", str(BATCH_MAX_ARCHIVE_BYTES // (1024 * 1024))
+)) * 1024 * 1024) + MULTIPART_OVERHEAD_BYTES
+BATCH_PERSIST_SIZE = int(os.getenv("VOCALGUARD_BATCH_PERSIST_SIZE", "50"))  # results per Firestore flush
+
+# Audio files accepted inside archives
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".flac", ".ogg", ".m4a", ".aac", ".opus", ".aiff", ".aif"}
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# Retry delay when the shared executor is saturated by other requests
+SATURATED_RETRY_DELAY = 0.25
+
+
+def is_archive(filename):
+    """Whether an uploaded filename is a zip or tar archive"""
+    return (filename or "").lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _list_archive_members(path):
+    """List (name, opener) pairs of the audio files in a zip or tar archive"""
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        members = [
+            (info.filename, lambda info=info: archive.open(info))
+            for info in archive.infolist()
+            if not info.is_dir()
+        ]
+    else:
+        archive = tarfile.open(path, "r:*")
+        members = [
+            (member.name, lambda member=member: archive.extractfile(member))
+            for member in archive.getmembers()
+            if member.isfile()
+        ]
+
+    audio_members = [
+        (name, opener) for name, opener in members
+        if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS
+        and not os.path.basename(name).startswith(".")
+    ]
+    return archive, audio_members
+
+
+async def _iter_member(opener, chunk_size):
+    """Yield an archive member's decompressed content in chunks"""
+    member_file = await run_in_threadpool(opener)
+    try:
+        while True:
+            chunk = await run_in_threadpool(member_file.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        member_file.close()
+
+
+async def iter_batch_inputs(files, max_files=BATCH_MAX_FILES):
+    """
+    Spool the uploaded files and archive members to disk one at a time
+
+    Args:
+        files: List of FastAPI UploadFiles (audio files or zip/tar archives)
+        max_files: Maximum number of audio files in the batch
+
+    Yields:
+        tuple: (filename, SpooledUpload or None, error message or None)
+    """
+    count = 0
+    for file in files:
+        if not is_archive(file.filename):
+            count += 1
+            if count > max_files:
+                yield file.filename, None, f"Batch exceeds the maximum of {max_files} files"
+                continue
+            try:
+                yield file.filename, await ingest_upload(file), None
+            except UploadRejectedError as e:
+                yield file.filename, None, str(e)
+            continue
+
+        try:
+            archive_upload = await ingest_upload(file, max_bytes=BATCH_MAX_ARCHIVE_BYTES, max_seconds=None)
+        except UploadRejectedError as e:
+            yield file.filename, None, str(e)
+            continue
+
+        try:
+            archive, members = await run_in_threadpool(_list_archive_members, archive_upload.path)
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            archive_upload.cleanup()
+            yield file.filename, None, f"Invalid archive: {str(e)}"
+            continue
+
+        try:
+            for name, opener in members:
+                count += 1
+                if count > max_files:
+                    yield name, None, f"Batch exceeds the maximum of {max_files} files"
+                    continue
+                try:
+                    upload = await write_chunks(_iter_member(opener, UPLOAD_CHUNK_SIZE), name, MAX_UPLOAD_BYTES)
+                    await check_duration(upload)
+                    yield name, upload, None
+                except UploadRejectedError as e:
+                    yield name, None, str(e)
+                except Exception as e:
+                    yield name, None, f"Failed to extract file: {str(e)}"
+        finally:
+            archive.close()
+            archive_upload.cleanup()
+
+
+def analyse_batch_file(path, filename, content_hash, precision=None):
+    """
+    Run detection on one file of a batch without storing it
+
+    Defined at module level so it can run on the shared inference executor in
+    both thread and process mode.
+
+    Returns:
+        tuple: (detection result, audio metadata probed from the file header)
+    """
+    # Imported here to avoid a circular import with the detection pipeline
+    from core.detect_deepfake import detect_deepfake
+
+    audio = AudioContext(path, filename, content_hash)
+    result = detect_deepfake(audio, store_results=False, filename=filename, analysis_type="standard",
+                             content_hash=content_hash, precision=precision)
+    return result, audio.metadata
+
+
+def _store_results(user_id, entries):
+    """Persist the successful entries of a group with bulk batched writes (or the write-behind spool)"""
+    from core.detect_deepfake import MODEL_VERSION
+    from core.quantization import model_version_for
+    from services.database_service import DatabaseService
+    from services.persistence import analysis_writer
+
+    stored = [entry for entry in entries if entry["status"] == "ok"]
+    if not stored:
+        return
+
+    analyses = []
+    for entry in stored:
+        result, metadata = entry["result"], entry.pop("metadata")
+        analyses.append(DatabaseService.build_analysis_documents(
+            user_id=user_id,
+            filename=entry["filename"],
+            file_size=metadata["file_size"],
+            duration=metadata["duration"],
+            sample_rate=metadata["sample_rate"],
+            channels=metadata["channels"],
+            bit_depth=metadata["bit_depth"],
+            is_deepfake=result["is_fake"],
+            confidence_score=result["confidence"],
+            features_used=["wav2vec2-xlsr"],
+            feature_scores={"probabilities": result["probabilities"]},
+            model_version=model_version_for(MODEL_VERSION, result.get("precision", "fp32")),
+            processing_time=result["processing_time"]
+        ))
+
+    for entry, ids in zip(stored, analysis_writer.persist_many(analyses)):
+        entry["result"].update(ids)
+
+
+async def spool_batch_inputs(files, max_files=BATCH_MAX_FILES):
+    """
+    Spool every upload and archive member to disk before analysis starts
+
+    Needed when results are streamed: the request's UploadFiles are closed
+    once the endpoint returns, before a streaming response body runs.
+
+    Returns:
+        list: (filename, SpooledUpload or None, error message or None) tuples
+    """
+    return [entry async for entry in iter_batch_inputs(files, max_files)]
+
+
+async def _iter_spooled(inputs):
+    while inputs:
+        yield inputs.pop(0)
+
+
+async def run_batch(files, user_id=None, store_results=True, precision=None,
+                    persist_size=BATCH_PERSIST_SIZE):
+    """
+    Analyse a batch of uploads and yield per-file entries as they finish
+
+    Args:
+        files: List of FastAPI UploadFiles (audio files or zip/tar archives), or
+            the list returned by spool_batch_inputs
+        user_id: User the analyses belong to
+        store_results: Whether to persist results to Firestore
+        precision: "fp32" or "int8" (default: VOCALGUARD_PRECISION)
+        persist_size: Number of finished files written per Firestore flush
+
+    Yields:
+        dict: {"type": "result", ...} per file, then one {"type": "summary", ...}
+    """
+    start_time = time.time()
+    semaphore = asyncio.Semaphore(inference_executor.max_workers)
+    pending = {}  # task -> upload it analyses
+    # Every spooled file this batch received, deleted here once no task can read it
+    uploads = []
+    finished = []
+    counts = {"total": 0, "fake": 0, "real": 0, "errors": 0}
+
+    async def analyse(index, filename, upload):
+        try:
+            while True:
+                try:
+                    result, metadata = await inference_executor.run(
+                        analyse_batch_file, upload.path, filename, upload.sha256, precision
+                    )
+                    break
+                except ExecutorSaturatedError:
+                    # Other requests fill the queue; wait for a slot instead of failing the file
+                    await asyncio.sleep(SATURATED_RETRY_DELAY)
+            if result.get("error"):
+                return {"index": index, "filename": filename, "status": "error", "error": result["error"]}
+            return {"index": index, "filename": filename, "status": "ok", "result": result, "metadata": metadata}
+        except Exception as e:
+            return {"index": index, "filename": filename, "status": "error", "error": str(e)}
+        finally:
+            semaphore.release()
+
+    async def flush(entries):
+        if store_results and user_id:
+            try:
+                await run_in_threadpool(_store_results, user_id, entries)
+            except Exception as e:
+                print(f"Error storing batch results in database: {e}")
+        for entry in entries:
+            entry.pop("metadata", None)
+            counts["total"] += 1
+            if entry["status"] != "ok":
+                counts["errors"] += 1
+            elif entry["result"]["is_fake"]:
+                counts["fake"] += 1
+            else:
+                counts["real"] += 1
+            entry["type"] = "result"
+        return entries
+
+    def collect_done():
+        for task in [task for task in pending if task.done()]:
+            pending.pop(task).cleanup()
+            finished.append(task.result())
+
+    spooled = files if files and isinstance(files[0], tuple) else None
+    inputs = _iter_spooled(spooled) if spooled is not None else iter_batch_inputs(files)
+
+    index = 0
+    try:
+        async for filename, upload, error in inputs:
+            if upload:
+                uploads.append(upload)
+            if error:
+                finished.append({"index": index, "filename": filename, "status": "error", "error": error})
+            else:
+                await semaphore.acquire()
+                pending[asyncio.create_task(analyse(index, filename, upload))] = upload
+            index += 1
+
+            collect_done()
+            if len(finished) >= persist_size:
+                for entry in await flush(finished):
+                    yield entry
+                finished = []
+
+        while pending:
+            await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            collect_done()
+            if len(finished) >= persist_size or not pending:
+                for entry in await flush(finished):
+                    yield entry
+                finished = []
+
+        if finished:
+            for entry in await flush(finished):
+                yield entry
+    finally:
+        # The client went away or analysis failed: stop the remaining tasks and
+        # delete the files only once none of them can still be reading one
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await inputs.aclose()
+        # Files spooled up front but never analysed are deleted too
+        for _, upload, _ in spooled or []:
+            if upload:
+                uploads.append(upload)
+        for upload in uploads:
+            upload.cleanup()
+
+    yield {
+        "type": "summary",
+        **counts,
+        "processing_time": (time.time() - start_time) * 1000
+    }
@@ -0,0 +1,241 @@
+"""
+Micro-Batching Module for VocalGuard
+
+This module provides an in-process scheduler that gathers concurrent inference
+requests for a short window (max_wait_ms or max_batch_size items, whichever
+comes first), runs them through the model as one batched forward pass and hands
+every caller its own result.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+class BatchTimeoutError(TimeoutError):
+    """Raised when a request does not get a result within its timeout"""
+
+
+class _PendingRequest:
+    """A single request waiting in the scheduler queue"""
+
+    __slots__ = ("item", "future", "enqueued_at", "deadline")
+
+    def __init__(self, item, timeout):
+        self.item = item
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+        self.deadline = self.enqueued_at + timeout if timeout else None
+
+
+class MicroBatchScheduler:
+    """
+    Dynamic micro-batching scheduler
+
+    batch_fn receives a list of items and must return a list of results in the
+    same order. Callers can submit from any thread, including executor threads
+    serving async request handlers.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=10.0,
+                 request_timeout=60.0, name="default"):
+        """
+        Initialize the scheduler
+
+        Args:
+            batch_fn: Callable taking a list of items and returning a list of results
+            max_batch_size: Maximum number of items in one forward pass
+            max_wait_ms: How long to wait for more items after the first one arrives
+            request_timeout: Default per-request timeout in seconds (None to disable)
+            name: Name used in logs and stats
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.request_timeout = request_timeout
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "batched_items": 0,
+            "max_batch_size_seen": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "total_queue_wait_ms": 0.0,
+        }
+
+    def _ensure_started(self):
+        """Start the worker thread on first use"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._worker, name=f"microbatch-{self.name}", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, item, timeout=None):
+        """
+        Queue an item for batched inference
+
+        Args:
+            item: Input passed to batch_fn
+            timeout: Per-request timeout in seconds (default: request_timeout)
+
+        Returns:
+            concurrent.futures.Future: Future resolved with the item's result
+        """
+        self._ensure_started()
+        request = _PendingRequest(item, self.request_timeout if timeout is None else timeout)
+        self._stats["requests"] += 1
+        self._queue.put(request)
+        return request.future
+
+    def run(self, item, timeout=None):
+        """
+        Queue an item and block until its result is ready
+
+        Args:
+            item: Input passed to batch_fn
+            timeout: Per-request timeout in seconds (default: request_timeout)
+
+        Returns:
+            The result produced by batch_fn for this item
+        """
+        timeout = self.request_timeout if timeout is None else timeout
+        future = self.submit(item, timeout)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._stats["timeouts"] += 1
+            raise BatchTimeoutError(f"Inference request timed out after {timeout} s")
+
+    def _collect_batch(self):
+        """Block for the first request, then gather more until the window closes"""
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        window_end = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = window_end - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        """Worker loop: collect a batch, run it and dispatch results"""
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            now = time.monotonic()
+            live = []
+            for request in batch:
+                # Skip requests whose caller already gave up
+                if request.deadline is not None and now > request.deadline:
+                    if request.future.cancel():
+                        self._stats["timeouts"] += 1
+                    continue
+                if not request.future.set_running_or_notify_cancel():
+                    continue
+                self._stats["total_queue_wait_ms"] += (now - request.enqueued_at) * 1000
+                live.append(request)
+
+            if not live:
+                continue
+
+            self._stats["batches"] += 1
+            self._stats["batched_items"] += len(live)
+            self._stats["max_batch_size_seen"] = max(self._stats["max_batch_size_seen"], len(live))
+
+            try:
+                results = self.batch_fn([request.item for request in live])
+                if len(results) != len(live):
+                    raise RuntimeError(
+                        f"batch_fn returned {len(results)} results for {len(live)} items"
+                    )
+                for request, result in zip(live, results):
+                    request.future.set_result(result)
+            except Exception as e:
+                print(f"Error in micro-batch '{self.name}': {e}")
+                self._stats["errors"] += 1
+                for request in live:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def shutdown(self):
+        """Stop the worker thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def stats(self):
+        """
+        Get scheduler statistics
+
+        Returns:
+            dict: Request, batch and timeout counters
+        """
+        stats = dict(self._stats)
+        stats["name"] = self.name
+        stats["queue_depth"] = self._queue.qsize()
+        stats["max_batch_size"] = self.max_batch_size
+        stats["max_wait_ms"] = self.max_wait * 1000
+        stats["avg_batch_size"] = (
+            stats["batched_items"] / stats["batches"] if stats["batches"] else 0.0
+        )
+        stats["avg_queue_wait_ms"] = (
+            stats["total_queue_wait_ms"] / stats["batched_items"] if stats["batched_items"] else 0.0
+        )
+        return stats
+
+
+# Schedulers shared by the whole process, keyed by caller-provided keys
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(key, batch_fn, **kwargs):
+    """
+    Get or create the shared scheduler for a key
+
+    Args:
+        key: Hashable key (e.g. the model registry key of the detector)
+        batch_fn: Batch callable used when the scheduler is created
+        **kwargs: Extra MicroBatchScheduler arguments
+
+    Returns:
+        MicroBatchScheduler: Shared scheduler
+    """
+    scheduler = _schedulers.get(key)
+    if scheduler is not None:
+        return scheduler
+    with _schedulers_lock:
+        if key not in _schedulers:
+            _schedulers[key] = MicroBatchScheduler(batch_fn, **kwargs)
+        return _schedulers[key]
+
+
+def scheduler_stats():
+    """Get statistics for every shared scheduler"""
+    return [scheduler.stats() for scheduler in list(_schedulers.values())]
@@ -0,0 +1,174 @@
+"""
+Transformer Benchmark Module for VocalGuard
+
+This module checks that the fused attention path of the AudioTransformer
+(F.scaled_dot_product_attention, used for layers whose attention weights are
+not requested) matches the explicit softmax implementation, and measures the
+latency of both. It also benchmarks transformer latency against clip length
+for each temporal front-end (no downsampling, average pooling, strided
+convolution), with and without the max_len frame cap.
+
+Running it as a script writes results/transformer_attention_parity.json and
+results/transformer_latency.json, and exits non-zero if the logits or the
+returned attention weights drift beyond the tolerance.
+"""
+
+import json
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.transformer_models import (
+    AudioTransformer, ALL_ATTENTION_LAYERS, TRANSFORMER_DOWNSAMPLE_FACTOR, TRANSFORMER_MAX_FRAMES
+)
+
+# Parity check configuration
+SEQUENCE_LENGTHS = (200, 750, 1500)  # Wav2Vec2 frames: ~4 s, 15 s and 30 s of audio
+TOLERANCE = 1e-4
+REPEATS = 3
+
+# Latency benchmark configuration
+CLIP_SECONDS = (5, 10, 20, 30, 60, 120)
+FRAMES_PER_SECOND = 50  # Wav2Vec2 output frame rate
+FRONT_ENDS = {
+    "none": {"downsample": "none", "max_len": None},
+    "avg": {"downsample": "avg", "max_len": None},
+    "conv": {"downsample": "conv", "max_len": None},
+    "avg_capped": {"downsample": "avg", "max_len": TRANSFORMER_MAX_FRAMES or 1000},
+}
+# All-layer attention weights beyond this many frames take gigabytes, so they are not timed
+MAX_ATTENTION_BENCHMARK_FRAMES = 2000
+
+
+def _time(run, repeats=REPEATS):
+    """Best wall time of several runs in milliseconds"""
+    best = float("inf")
+    for _ in range(repeats):
+        start_time = time.time()
+        run()
+        best = min(best, (time.time() - start_time) * 1000)
+    return best
+
+
+def run_parity_check(sequence_lengths=SEQUENCE_LENGTHS, device=None, tolerance=TOLERANCE, seed=0):
+    """
+    Compare the fused attention path against the explicit implementation
+
+    Args:
+        sequence_lengths: Feature sequence lengths to test
+        device: Torch device (default: cuda if available, else cpu)
+        tolerance: Maximum allowed absolute difference
+        seed: Random seed for the weights and features
+
+    Returns:
+        dict: Per-length logit and attention differences, latencies and a passed flag
+    """
+    device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    torch.manual_seed(seed)
+    model = AudioTransformer().to(device).eval()
+    num_layers = len(model.transformer_blocks)
+    num_heads = model.transformer_blocks[0].attention.num_heads
+
+    report = {"device": str(device), "torch_version": torch.__version__, "tolerance": tolerance, "lengths": []}
+    passed = True
+
+    with torch.no_grad():
+        for length in sequence_lengths:
+            features = torch.randn(1, length, model.input_projection.in_features, device=device)
+
+            reference_logits, reference_weights = model(features, attention_layers=ALL_ATTENTION_LAYERS)
+            fused_logits, fused_weights = model(features, attention_layers=[])
+            last_logits, last_weights = model(features, attention_layers=[-1])
+
+            logits_diff = float((reference_logits - fused_logits).abs().max())
+            last_logits_diff = float((reference_logits - last_logits).abs().max())
+            weights_diff = float((reference_weights[-1] - last_weights[0]).abs().max())
+            length_passed = (
+                not fused_weights and len(last_weights) == 1
+                and max(logits_diff, last_logits_diff, weights_diff) <= tolerance
+            )
+            passed = passed and length_passed
+
+            report["lengths"].append({
+                "sequence_length": length,
+                "max_abs_logit_diff_fused": logits_diff,
+                "max_abs_logit_diff_last_layer": last_logits_diff,
+                "max_abs_attention_diff_last_layer": weights_diff,
+                "explicit_ms": _time(lambda: model(features, attention_layers=ALL_ATTENTION_LAYERS)),
+                "fused_ms": _time(lambda: model(features, attention_layers=[])),
+                # float32 weights no longer kept alive for a logits-only pass
+                "attention_bytes_avoided": num_layers * num_heads * model.sequence_length(length) ** 2 * 4,
+                "passed": length_passed,
+            })
+
+    report["passed"] = passed
+    return report
+
+
+def run_latency_benchmark(clip_seconds=CLIP_SECONDS, front_ends=FRONT_ENDS,
+                          downsample_factor=TRANSFORMER_DOWNSAMPLE_FACTOR, device=None, seed=0):
+    """
+    Measure AudioTransformer latency against clip length for each front-end
+
+    Args:
+        clip_seconds: Clip durations to benchmark
+        front_ends: Name -> AudioTransformer keyword arguments (downsample, max_len)
+        downsample_factor: Frame-rate reduction of the downsampling front-ends
+        device: Torch device (default: cuda if available, else cpu)
+        seed: Random seed for the weights and features
+
+    Returns:
+        dict: Per front-end and clip length, the frames attended over and the
+            latency of a logits-only and an all-layer-attention pass
+    """
+    device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    report = {"device": str(device), "torch_threads": torch.get_num_threads(),
+              "downsample_factor": downsample_factor, "front_ends": {}}
+
+    with torch.no_grad():
+        for name, config in front_ends.items():
+            torch.manual_seed(seed)
+            model = AudioTransformer(downsample_factor=downsample_factor, **config).to(device).eval()
+            rows = []
+            for seconds in clip_seconds:
+                num_frames = int(seconds * FRAMES_PER_SECOND)
+                transformer_frames = model.sequence_length(num_frames)
+                features = torch.randn(1, num_frames, model.input_projection.in_features, device=device)
+                rows.append({
+                    "clip_seconds": seconds,
+                    "input_frames": num_frames,
+                    "transformer_frames": transformer_frames,
+                    "logits_ms": _time(lambda: model(features, attention_layers=[])),
+                    "all_attention_ms": (
+                        _time(lambda: model(features, attention_layers=ALL_ATTENTION_LAYERS))
+                        if transformer_frames <= MAX_ATTENTION_BENCHMARK_FRAMES else None
+                    ),
+                })
+            report["front_ends"][name] = rows
+
+    return report
+
+
+if __name__ == "__main__":
+    results_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "results")
+    os.makedirs(results_dir, exist_ok=True)
+
+    report = run_parity_check()
+    parity_path = os.path.join(results_dir, "transformer_attention_parity.json")
+    with open(parity_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"Parity report saved to {parity_path}")
+
+    latency = run_latency_benchmark()
+    latency_path = os.path.join(results_dir, "transformer_latency.json")
+    with open(latency_path, "w") as f:
+        json.dump(latency, f, indent=2)
+    print(json.dumps(latency, indent=2))
+    print(f"Latency report saved to {latency_path}")
+
+    sys.exit(0 if report["passed"] else 1)
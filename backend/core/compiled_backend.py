@@ -0,0 +1,332 @@
+"""
+Compiled Backend Module for VocalGuard
+
+This module provides an optional TorchScript backend for the detection models.
+The Wav2Vec2 classification model is traced once per bucketed input length
+(inputs are zero-padded up to the next bucket and the padding is masked out),
+and the AudioTransformer is traced once for any sequence length. Traced modules
+are saved under cache/compiled/<model hash>/ so later worker starts load them
+instead of tracing again. Inputs that no bucket fits, and any trace that fails,
+run on the eager model instead.
+"""
+
+import abc
+import hashlib
+import os
+import threading
+import warnings
+
+import torch
+import torch.nn as nn
+
+# Compiled backend configuration
+COMPILED_BACKEND = os.getenv("VOCALGUARD_COMPILED_BACKEND", "off").lower()  # "torchscript" or "off"
+BUCKET_SECONDS = [
+    float(value) for value in os.getenv("VOCALGUARD_COMPILED_BUCKETS", "2,4,6,8,10").split(",") if value.strip()
+]
+COMPILE_ON_LOAD = os.getenv("VOCALGUARD_COMPILE_ON_LOAD", "false").lower() in ("1", "true", "yes")
+
+# Directory for traced artifacts (shared with the other on-disk caches)
+_cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
+COMPILED_CACHE_DIR = os.getenv("VOCALGUARD_COMPILED_CACHE_DIR") or os.path.join(_cache_dir, "compiled")
+
+
+def compiled_backend_enabled():
+    """Whether the TorchScript backend is switched on"""
+    return COMPILED_BACKEND in ("torchscript", "jit", "true", "1")
+
+
+def model_hash(module, device, model_path=None):
+    """
+    Identify a module's traced artifacts
+
+    When the weights come from a model directory, the size and modification
+    time of its model.safetensors and the contents of its config.json stand in
+    for the weights, so nothing has to be read or hashed tensor by tensor.
+    Modules without a weights file (e.g. randomly initialised ones) fall back
+    to hashing their state dict.
+
+    Args:
+        module: torch module
+        device: Device the module runs on
+        model_path: Model directory the weights were loaded from, if any
+
+    Returns:
+        str: Hex digest identifying the traced artifacts of this module
+    """
+    hasher = hashlib.sha256()
+    hasher.update(f"{type(module).__name__}:{torch.__version__}:{torch.device(device).type}".encode())
+    # Covers configuration without weights (e.g. the transformer's downsampling front-end)
+    hasher.update(repr(module).encode())
+
+    weights_path = os.path.join(model_path, "model.safetensors") if model_path else None
+    if weights_path and os.path.exists(weights_path):
+        stat = os.stat(weights_path)
+        hasher.update(f"{os.path.abspath(weights_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        config_path = os.path.join(model_path, "config.json")
+        if os.path.exists(config_path):
+            with open(config_path, "rb") as f:
+                hasher.update(f.read())
+        return hasher.hexdigest()
+
+    for name, tensor in module.state_dict().items():
+        hasher.update(name.encode())
+        hasher.update(str(tuple(tensor.shape)).encode())
+        hasher.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return hasher.hexdigest()
+
+
+class _LogitsModule(nn.Module):
+    """Traceable view of a HuggingFace audio classification model returning logits"""
+
+    def __init__(self, model, use_attention_mask):
+        super().__init__()
+        self.model = model
+        self.use_attention_mask = use_attention_mask
+
+    def forward(self, input_values, attention_mask):
+        if self.use_attention_mask:
+            return self.model(input_values, attention_mask=attention_mask, return_dict=False)[0]
+        return self.model(input_values, return_dict=False)[0]
+
+
+class _AttentionLayersModule(nn.Module):
+    """Traceable view of an AudioTransformer returning the attention weights of selected layers only"""
+
+    def __init__(self, model, attention_layers):
+        super().__init__()
+        self.model = model
+        self.attention_layers = sorted(attention_layers)
+
+    def forward(self, features):
+        logits, attention_weights = self.model(features, attention_layers=self.attention_layers)
+        if not self.attention_layers:
+            return logits
+        return logits, attention_weights
+
+
+class _CompiledModule(abc.ABC):
+    """Shared artifact handling and fallback accounting"""
+
+    def __init__(self, module, device, name, cache_dir=COMPILED_CACHE_DIR, model_path=None):
+        self.module = module
+        self.device = torch.device(device)
+        self.name = name
+        self.directory = os.path.join(cache_dir, model_hash(module, self.device, model_path)[:32])
+        self._traced = {}
+        self._failed = set()
+        self._lock = threading.Lock()
+        self._stats = {"compiled_calls": 0, "eager_fallbacks": 0, "traced": 0, "loaded": 0, "trace_failures": 0}
+
+    @abc.abstractmethod
+    def _trace(self, variant, example_inputs, check_inputs):
+        """Trace the module for a variant"""
+
+    def _get_traced(self, variant, example_inputs, check_inputs):
+        """Load the traced module for a variant from disk, tracing and saving it on first use"""
+        traced = self._traced.get(variant)
+        if traced is not None or variant in self._failed:
+            return traced
+
+        with self._lock:
+            traced = self._traced.get(variant)
+            if traced is not None or variant in self._failed:
+                return traced
+
+            path = os.path.join(self.directory, f"{self.name}_{variant}.pt")
+            try:
+                if os.path.exists(path):
+                    traced = torch.jit.load(path, map_location=self.device)
+                    self._stats["loaded"] += 1
+                else:
+                    traced = self._trace(variant, example_inputs, check_inputs)
+                    os.makedirs(self.directory, exist_ok=True)
+                    temp_path = f"{path}.{os.getpid()}.tmp"
+                    torch.jit.save(traced, temp_path)
+                    os.replace(temp_path, path)
+                    self._stats["traced"] += 1
+            except Exception as e:
+                print(f"Compiling {self.name} ({variant}) failed, using eager mode: {e}")
+                self._failed.add(variant)
+                self._stats["trace_failures"] += 1
+                return None
+
+            self._traced[variant] = traced
+            return traced
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats.update({"variants": sorted(self._traced), "failed_variants": sorted(self._failed)})
+        return stats
+
+
+class CompiledAudioClassifier(_CompiledModule):
+    """
+    Bucketed TorchScript version of a Wav2Vec2 audio classification model
+
+    Call it with (input_values, attention_mask) like the eager model; it returns logits.
+    """
+
+    def __init__(self, model, device, use_attention_mask, bucket_seconds=BUCKET_SECONDS,
+                 sample_rate=16000, cache_dir=COMPILED_CACHE_DIR, model_path=None):
+        """
+        Initialize the compiled classifier
+
+        Args:
+            model: Eager AutoModelForAudioClassification model
+            device: Device the model runs on
+            use_attention_mask: Whether the model takes an attention mask. Without
+                one, padding changes the prediction, so only inputs whose length
+                equals a bucket exactly run compiled.
+            bucket_seconds: Bucketed input lengths in seconds
+            sample_rate: Sample rate of the input values
+            cache_dir: Root directory for traced artifacts
+            model_path: Model directory the weights were loaded from (see model_hash)
+        """
+        super().__init__(_LogitsModule(model, use_attention_mask).eval(), device,
+                         "classifier_mask" if use_attention_mask else "classifier", cache_dir, model_path)
+        self.use_attention_mask = use_attention_mask
+        self.buckets = sorted({int(seconds * sample_rate) for seconds in bucket_seconds if seconds > 0})
+
+    def _trace(self, variant, example_inputs, check_inputs):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", torch.jit.TracerWarning)
+            return torch.jit.trace(self.module, example_inputs, check_inputs=check_inputs)
+
+    def _bucket_for(self, length):
+        for bucket in self.buckets:
+            if bucket == length or (self.use_attention_mask and bucket > length):
+                return bucket
+        return None
+
+    def _examples(self, bucket):
+        def make(batch_size):
+            return (torch.zeros(batch_size, bucket, device=self.device),
+                    torch.ones(batch_size, bucket, dtype=torch.long, device=self.device))
+        # Checking with a second batch size makes sure the trace is not tied to batch 1
+        return make(1), [make(2)]
+
+    def warmup(self):
+        """Load or trace every bucket up front instead of on first use"""
+        for bucket in self.buckets:
+            self._get_traced(bucket, *self._examples(bucket))
+
+    def __call__(self, input_values, attention_mask=None):
+        batch_size, length = input_values.shape
+        bucket = self._bucket_for(length)
+        traced = self._get_traced(bucket, *self._examples(bucket)) if bucket is not None else None
+
+        if traced is None:
+            self._stats["eager_fallbacks"] += 1
+            return self.module(input_values, attention_mask)
+
+        if attention_mask is None:
+            attention_mask = torch.ones(batch_size, length, dtype=torch.long, device=input_values.device)
+        if bucket > length:
+            input_values = nn.functional.pad(input_values, (0, bucket - length))
+            attention_mask = nn.functional.pad(attention_mask, (0, bucket - length))
+
+        self._stats["compiled_calls"] += 1
+        return traced(input_values, attention_mask.long())
+
+
+class CompiledAudioTransformer(_CompiledModule):
+    """
+    TorchScript version of AudioTransformer
+
+    Traced once and checked at a second sequence length and batch size, so the
+    same artifact serves every input. Call it like the eager model; it returns
+    (logits, attention_weights). Every attention layer selection is its own
+    variant, so logits-only calls run a trace that uses the fused attention kernel.
+    """
+
+    def __init__(self, model, device, cache_dir=COMPILED_CACHE_DIR, model_path=None):
+        super().__init__(model, device, "audio_transformer", cache_dir, model_path)
+        self.input_dim = model.input_projection.in_features
+        self._variant_layers = {}
+
+    def _trace(self, variant, example_inputs, check_inputs):
+        module = self.module
+        if variant != "dynamic":
+            module = _AttentionLayersModule(self.module, self._variant_layers[variant]).eval()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", torch.jit.TracerWarning)
+            return torch.jit.trace(module, example_inputs, check_inputs=check_inputs, strict=False)
+
+    def _variant_for(self, attention_layers):
+        """Variant name of an attention layer selection ("dynamic" for all layers)"""
+        layers = self.module.resolve_attention_layers(attention_layers)
+        if len(layers) == len(self.module.transformer_blocks):
+            return "dynamic"
+        variant = "layers_" + "_".join(str(index) for index in sorted(layers)) if layers else "logits"
+        self._variant_layers[variant] = layers
+        return variant
+
+    def _examples(self):
+        example = (torch.zeros(1, 200, self.input_dim, device=self.device),)
+        check = [(torch.randn(2, 137, self.input_dim, device=self.device),)]
+        return example, check
+
+    def warmup(self):
+        """Load or trace the module up front instead of on first use"""
+        self._get_traced("dynamic", *self._examples())
+
+    def __call__(self, features, mask=None, attention_layers="all"):
+        variant = self._variant_for(attention_layers)
+        # Traces cover sequences and batches that fit the precomputed positional
+        # encodings (and so never hit the max_len cap); larger inputs run eagerly
+        frames = self.module.downsampler.output_length(features.shape[1])
+        table_size = self.module.positional_encoding.pe.size(1)
+        use_traced = mask is None and frames <= table_size and features.shape[0] <= table_size
+        traced = self._get_traced(variant, *self._examples()) if use_traced else None
+        if traced is None:
+            self._stats["eager_fallbacks"] += 1
+            return self.module(features, mask, attention_layers=attention_layers)
+
+        self._stats["compiled_calls"] += 1
+        if variant == "logits":
+            return traced(features), []
+        logits, attention_weights = traced(features)
+        return logits, list(attention_weights)
+
+
+def compile_detector(detector):
+    """
+    Attach a compiled classifier to a DeepfakeAudioDetector
+
+    Args:
+        detector: Loaded fp32 DeepfakeAudioDetector
+
+    Returns:
+        CompiledAudioClassifier or None if the backend is off
+    """
+    if not compiled_backend_enabled():
+        return None
+    compiled = CompiledAudioClassifier(
+        detector.model,
+        detector.device,
+        use_attention_mask=getattr(detector.feature_extractor, "return_attention_mask", False),
+        model_path=detector.model_path
+    )
+    if COMPILE_ON_LOAD:
+        compiled.warmup()
+    return compiled
+
+
+def compile_transformer(detector):
+    """
+    Attach a compiled AudioTransformer to a TransformerDeepfakeDetector
+
+    Args:
+        detector: Loaded fp32 TransformerDeepfakeDetector
+
+    Returns:
+        CompiledAudioTransformer or None if the backend is off
+    """
+    if not compiled_backend_enabled():
+        return None
+    compiled = CompiledAudioTransformer(detector.transformer_model, detector.device,
+                                        model_path=detector.model_path)
+    if COMPILE_ON_LOAD:
+        compiled.warmup()
+    return compiled
@@ -17,6 +17,17 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from models.models import DeepFakeDetector
 from models.transformer_models import TransformerDeepfakeDetector
 from services.database_service import DatabaseService
+from services.persistence import analysis_writer
+from core.model_registry import model_registry
+from core.batching import get_scheduler
+from core.audio_context import AudioContext, as_audio_context
+from core.result_cache import result_cache, make_cache_key
+from core.quantization import (
+    resolve_precision, model_version_for, quantize_detector, quantize_transformer_detector,
+    QUANTIZED_DEVICE
+)
+from core.compiled_backend import compile_detector, compile_transformer
+from core.attention_summary import resolve_attention_options, summarize_attention, strip_full_matrices
 
 # Model version for tracking
 MODEL_VERSION = "3.0.0"  # Updated to reflect wav2vec2-xlsr model integration
@@ -24,15 +35,36 @@ MODEL_VERSION = "3.0.0"  # Updated to reflect wav2vec2-xlsr model integration
 # Path to the safetensors model directory (deepfake_audio_model subfolder)
 MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "deepfake_audio_model")
 
+# Micro-batching of concurrent detection requests
+MICRO_BATCHING = os.getenv("VOCALGUARD_MICRO_BATCHING", "true").lower() in ("1", "true", "yes")
+BATCH_MAX_SIZE = int(os.getenv("VOCALGUARD_BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("VOCALGUARD_BATCH_MAX_WAIT_MS", "10"))
+BATCH_REQUEST_TIMEOUT = float(os.getenv("VOCALGUARD_BATCH_TIMEOUT_S", "60"))
+
+# Sliding-window inference for recordings longer than one window
+WINDOW_STRATEGIES = ("mean", "max", "trimmed_mean")
+WINDOW_SECONDS = float(os.getenv("VOCALGUARD_WINDOW_SECONDS", "10"))
+WINDOW_HOP_SECONDS = float(os.getenv("VOCALGUARD_WINDOW_HOP_SECONDS", "5"))
+WINDOW_STRATEGY = os.getenv("VOCALGUARD_WINDOW_STRATEGY", "mean")
+WINDOW_BATCH_SIZE = int(os.getenv("VOCALGUARD_WINDOW_BATCH_SIZE", "8"))
+
+def get_default_device():
+    """Get the torch device used for inference"""
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
 class DeepfakeAudioDetector:
-    def __init__(self, model_path):
+    def __init__(self, model_path, device=None):
         """
         Initialize the deepfake audio detector with a local model
         
         Args:
             model_path (str): Path to the directory containing the saved model
+            device: Torch device to run on (default: cuda if available, else cpu)
         """
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.device = torch.device(device) if device else get_default_device()
+        self.model_path = model_path
+        self.precision = "fp32"
+        self.compiled = None  # Optional CompiledAudioClassifier (see core.compiled_backend)
         print(f"Using device: {self.device}")
         
         # Load feature extractor and model from local directory
@@ -43,16 +75,20 @@ class DeepfakeAudioDetector:
         self.id2label = self.model.config.id2label if hasattr(self.model.config, "id2label") else {0: "real", 1: "fake"}
         print(f"Loaded model with labels: {self.id2label}")
     
-    def preprocess_audio(self, audio_path):
+    def load_waveform(self, audio_path):
         """
-        Preprocess audio file to match model requirements
+        Load an audio file as a 16 kHz mono float32 waveform
         
         Args:
-            audio_path (str): Path to the audio file
+            audio_path (str or AudioContext): Path to the audio file or its decoded context
         
         Returns:
-            torch.Tensor: Processed audio input tensor
+            np.ndarray: Audio waveform at 16 kHz
         """
+        # Reuse the request's decoded audio when available
+        if isinstance(audio_path, AudioContext):
+            return audio_path.waveform_16k
+        
         # Load audio with librosa (handles more formats)
         try:
             # Option 1: Using librosa
@@ -69,6 +105,8 @@ class DeepfakeAudioDetector:
             # Convert to mono if stereo
             if waveform.shape[0] > 1:
                 waveform = torch.mean(waveform, dim=0)
+            else:
+                waveform = waveform[0]
             
             # Convert to numpy for feature extractor
             waveform = waveform.numpy()
@@ -77,6 +115,20 @@ class DeepfakeAudioDetector:
             if sample_rate != 16000:
                 waveform = librosa.resample(waveform, orig_sr=sample_rate, target_sr=16000)
         
+        return waveform
+    
+    def preprocess_audio(self, audio_path):
+        """
+        Preprocess audio file to match model requirements
+        
+        Args:
+            audio_path (str or AudioContext): Path to the audio file or its decoded context
+        
+        Returns:
+            torch.Tensor: Processed audio input tensor
+        """
+        waveform = self.load_waveform(audio_path)
+        
         # Process through feature extractor
         inputs = self.feature_extractor(
             waveform, 
@@ -86,12 +138,35 @@ class DeepfakeAudioDetector:
         
         return inputs
     
+    def _build_result(self, probabilities, threshold=0.5):
+        """
+        Convert the class probabilities of one clip into a detection result
+        
+        Args:
+            probabilities (torch.Tensor): Softmax probabilities for one clip
+            threshold (float): Confidence threshold for classification
+            
+        Returns:
+            dict: Detection results including prediction, confidence scores, and label
+        """
+        pred_idx = torch.argmax(probabilities).cpu().item()
+        confidence = probabilities[pred_idx].cpu().item()
+        all_probs = probabilities.cpu().numpy()
+        
+        return {
+            "prediction": self.id2label[pred_idx],
+            "confidence": confidence,
+            "label_index": pred_idx,
+            "probabilities": {self.id2label[i]: float(prob) for i, prob in enumerate(all_probs)},
+            "is_fake": pred_idx == 1 if "fake" in self.id2label.values() else (confidence > threshold)
+        }
+    
     def detect(self, audio_path, threshold=0.5):
         """
         Detect if an audio file is fake or real
         
         Args:
-            audio_path (str): Path to the audio file
+            audio_path (str or AudioContext): Path to the audio file or its decoded context
             threshold (float): Confidence threshold for classification
             
         Returns:
@@ -104,29 +179,423 @@ class DeepfakeAudioDetector:
         inputs = {key: val.to(self.device) for key, val in inputs.items()}
         
         # Run inference
-        with torch.no_grad():
-            outputs = self.model(**inputs)
+        logits = self.run_model(inputs)
         
         # Get predictions
-        logits = outputs.logits
         probabilities = torch.nn.functional.softmax(logits, dim=1)
-        predictions = torch.argmax(probabilities, dim=1)
         
-        # Convert to numpy
-        pred_idx = predictions[0].cpu().item()
-        confidence = probabilities[0][pred_idx].cpu().item()
-        all_probs = probabilities[0].cpu().numpy()
+        return self._build_result(probabilities[0], threshold)
+    
+    def run_model(self, inputs):
+        """
+        Run the classification model on feature-extractor inputs
         
-        # Return results
-        result = {
-            "prediction": self.id2label[pred_idx],
-            "confidence": confidence,
-            "label_index": pred_idx,
-            "probabilities": {self.id2label[i]: float(prob) for i, prob in enumerate(all_probs)},
-            "is_fake": pred_idx == 1 if "fake" in self.id2label.values() else (confidence > threshold)
-        }
+        Uses the compiled backend when one is attached; it falls back to the
+        eager model for input lengths it has no trace for.
         
+        Args:
+            inputs (dict): input_values and optional attention_mask on self.device
+            
+        Returns:
+            torch.Tensor: Logits of shape (batch, num_labels)
+        """
+        with torch.no_grad():
+            if self.compiled is not None:
+                return self.compiled(inputs["input_values"], inputs.get("attention_mask"))
+            return self.model(**inputs).logits
+    
+    def detect_batch(self, waveforms, threshold=0.5):
+        """
+        Detect several 16 kHz waveforms with a single batched forward pass
+        
+        Waveforms are padded to the longest one and an attention mask keeps the
+        padding out of the prediction. Models whose feature extractor does not
+        support attention masks are only batched across equal-length inputs.
+        
+        Args:
+            waveforms (list): List of 16 kHz mono float32 waveforms
+            threshold (float): Confidence threshold for classification
+            
+        Returns:
+            list: One detection result dict per waveform, in input order
+        """
+        probabilities = torch.nn.functional.softmax(self.forward_logits(waveforms), dim=1)
+        return [self._build_result(row, threshold) for row in probabilities]
+    
+    def forward_logits(self, waveforms):
+        """
+        Run a batched forward pass and return the raw logits
+        
+        Waveforms are padded to the longest one and an attention mask keeps the
+        padding out of the prediction. Models whose feature extractor does not
+        support attention masks are only batched across equal-length inputs.
+        
+        Args:
+            waveforms (list): List of 16 kHz mono float32 waveforms
+            
+        Returns:
+            torch.Tensor: Logits of shape (len(waveforms), num_labels)
+        """
+        use_attention_mask = getattr(self.feature_extractor, "return_attention_mask", False)
+        if use_attention_mask:
+            groups = [list(range(len(waveforms)))]
+        else:
+            by_length = {}
+            for i, waveform in enumerate(waveforms):
+                by_length.setdefault(len(waveform), []).append(i)
+            groups = list(by_length.values())
+        
+        logits = [None] * len(waveforms)
+        for indices in groups:
+            inputs = self.feature_extractor(
+                [waveforms[i] for i in indices],
+                sampling_rate=16000,
+                padding=True,
+                return_attention_mask=use_attention_mask,
+                return_tensors="pt"
+            )
+            inputs = {key: val.to(self.device) for key, val in inputs.items()}
+            
+            outputs = self.run_model(inputs)
+            
+            for row, i in enumerate(indices):
+                logits[i] = outputs[row]
+        
+        return torch.stack(logits)
+    
+    def detect_windowed(self, audio, window_seconds=10.0, hop_seconds=5.0, strategy="mean",
+                        batch_size=8, trim_ratio=0.1, threshold=0.5):
+        """
+        Detect long recordings with sliding windows and aggregate the window logits
+        
+        Windows are streamed from the file (see AudioContext.iter_windows), so
+        memory stays bounded by batch_size windows no matter how long the
+        recording is. The last window always reaches the end of the audio, so
+        nothing is dropped.
+        
+        Args:
+            audio (str or AudioContext): Path to the audio file or its context
+            window_seconds (float): Window length in seconds
+            hop_seconds (float): Distance between window starts in seconds
+            strategy (str): Logit aggregation: "mean", "max" (element-wise over
+                windows, flags a clip if any window looks fake) or "trimmed_mean"
+            batch_size (int): Number of windows per forward pass
+            trim_ratio (float): Fraction of windows dropped at each end for "trimmed_mean"
+            threshold (float): Confidence threshold for classification
+            
+        Returns:
+            dict: Detection result plus window count, strategy and per-window fake probabilities
+        """
+        if strategy not in WINDOW_STRATEGIES:
+            raise ValueError(f"Unknown window aggregation strategy: {strategy}")
+        
+        audio = as_audio_context(audio)
+        window_logits = []
+        batch = []
+        for window in audio.iter_windows(window_seconds, hop_seconds):
+            batch.append(window)
+            if len(batch) >= batch_size:
+                window_logits.append(self.forward_logits(batch).cpu())
+                batch = []
+        if batch:
+            window_logits.append(self.forward_logits(batch).cpu())
+        
+        return self.aggregate_window_logits(torch.cat(window_logits, dim=0), window_seconds, hop_seconds,
+                                            strategy, trim_ratio, threshold)
+
+    def aggregate_window_logits(self, logits, window_seconds, hop_seconds, strategy="mean",
+                                trim_ratio=0.1, threshold=0.5):
+        """
+        Turn per-window logits into one detection result (see detect_windowed)
+        
+        Args:
+            logits (torch.Tensor): Window logits of shape (num_windows, num_labels)
+            window_seconds (float): Window length in seconds
+            hop_seconds (float): Distance between window starts in seconds
+            strategy (str): Logit aggregation: "mean", "max" or "trimmed_mean"
+            trim_ratio (float): Fraction of windows dropped at each end for "trimmed_mean"
+            threshold (float): Confidence threshold for classification
+            
+        Returns:
+            dict: Detection result plus window count, strategy and per-window fake probabilities
+        """
+        if strategy not in WINDOW_STRATEGIES:
+            raise ValueError(f"Unknown window aggregation strategy: {strategy}")
+        
+        if strategy == "max":
+            aggregated = logits.max(dim=0).values
+        elif strategy == "trimmed_mean" and logits.shape[0] > 2:
+            trim = int(logits.shape[0] * trim_ratio)
+            sorted_logits = torch.sort(logits, dim=0).values
+            aggregated = sorted_logits[trim:logits.shape[0] - trim].mean(dim=0)
+        else:
+            aggregated = logits.mean(dim=0)
+        
+        result = self._build_result(torch.nn.functional.softmax(aggregated, dim=0), threshold)
+        
+        window_probabilities = torch.nn.functional.softmax(logits, dim=1)
+        fake_index = next((i for i, label in self.id2label.items() if label == "fake"), logits.shape[1] - 1)
+        result.update({
+            "num_windows": int(logits.shape[0]),
+            "window_seconds": window_seconds,
+            "hop_seconds": hop_seconds,
+            "aggregation": strategy,
+            "window_fake_probabilities": [float(p) for p in window_probabilities[:, int(fake_index)]]
+        })
         return result
+
+    def extract_hidden_states(self, waveform):
+        """
+        Run only the Wav2Vec2 backbone on a 16 kHz waveform
+
+        The returned outputs hold every hidden state, so the classification head
+        and the AudioTransformer can both be fed from a single backbone pass.
+
+        Args:
+            waveform (np.ndarray or list): 16 kHz mono float32 waveform, or a list
+                of equal-length waveforms to run as one batch
+
+        Returns:
+            tuple: (backbone outputs with hidden_states, attention mask or None)
+        """
+        inputs = self.feature_extractor(
+            waveform,
+            sampling_rate=16000,
+            return_tensors="pt"
+        )
+        inputs = {key: val.to(self.device) for key, val in inputs.items()}
+
+        with torch.no_grad():
+            outputs = self.model.base_model(**inputs, output_hidden_states=True)
+
+        return outputs, inputs.get("attention_mask")
+
+    def iter_window_hidden_states(self, audio, window_seconds=10.0, hop_seconds=5.0, batch_size=8):
+        """
+        Run the Wav2Vec2 backbone over sliding windows of a long recording
+
+        Windows come from AudioContext.iter_windows, so memory stays bounded by
+        batch_size windows no matter how long the recording is.
+
+        Args:
+            audio (str or AudioContext): Path to the audio file or its context
+            window_seconds (float): Window length in seconds
+            hop_seconds (float): Distance between window starts in seconds
+            batch_size (int): Number of windows per backbone pass
+
+        Yields:
+            tuple: (backbone outputs, attention mask or None) for each batch of windows
+        """
+        batch = []
+        for window in as_audio_context(audio).iter_windows(window_seconds, hop_seconds):
+            batch.append(window)
+            if len(batch) >= batch_size:
+                yield self.extract_hidden_states(batch)
+                batch = []
+        if batch:
+            yield self.extract_hidden_states(batch)
+
+    def head_logits(self, outputs, attention_mask=None):
+        """
+        Apply the sequence classification head to precomputed backbone outputs
+
+        Mirrors the head of Wav2Vec2ForSequenceClassification (optional weighted
+        layer sum, projector, masked mean pooling, classifier).
+
+        Args:
+            outputs: Backbone outputs from extract_hidden_states
+            attention_mask (torch.Tensor): Attention mask used for the backbone pass
+
+        Returns:
+            torch.Tensor: Logits of shape (batch, num_labels)
+        """
+        with torch.no_grad():
+            if getattr(self.model.config, "use_weighted_layer_sum", False):
+                hidden_states = torch.stack(outputs.hidden_states, dim=1)
+                norm_weights = torch.nn.functional.softmax(self.model.layer_weights, dim=-1)
+                hidden_states = (hidden_states * norm_weights.view(-1, 1, 1)).sum(dim=1)
+            else:
+                hidden_states = outputs[0]
+
+            hidden_states = self.model.projector(hidden_states)
+            if attention_mask is None:
+                pooled_output = hidden_states.mean(dim=1)
+            else:
+                padding_mask = self.model._get_feature_vector_attention_mask(hidden_states.shape[1], attention_mask)
+                hidden_states[~padding_mask] = 0.0
+                pooled_output = hidden_states.sum(dim=1) / padding_mask.sum(dim=1).view(-1, 1)
+
+            return self.model.classifier(pooled_output)
+
+    def classify_hidden_states(self, outputs, attention_mask=None, threshold=0.5):
+        """
+        Classify precomputed backbone outputs of a single recording (see head_logits)
+
+        Args:
+            outputs: Backbone outputs from extract_hidden_states
+            attention_mask (torch.Tensor): Attention mask used for the backbone pass
+            threshold (float): Confidence threshold for classification
+
+        Returns:
+            dict: Detection results including prediction, confidence scores, and label
+        """
+        probabilities = torch.nn.functional.softmax(self.head_logits(outputs, attention_mask), dim=1)
+        return self._build_result(probabilities[0], threshold)
+
+    @property
+    def supports_shared_backbone(self):
+        """Whether the classification head can be applied to precomputed hidden states"""
+        return all(hasattr(self.model, name) for name in ("projector", "classifier", "base_model"))
+
+def _resolve_device(device, precision):
+    """Get the device for a precision (INT8 models always run on the CPU)"""
+    if precision == "int8":
+        return QUANTIZED_DEVICE
+    return torch.device(device) if device else get_default_device()
+
+def _model_key(kind, model_path, device, precision):
+    """Registry key of a model; fp32 keeps the plain kind name"""
+    kind = kind if precision == "fp32" else f"{kind}-{precision}"
+    return model_registry.make_key(kind, model_path, MODEL_VERSION, device)
+
+def _load_detector(model_path, device):
+    """Load an fp32 detector and attach the compiled backend when enabled"""
+    detector = DeepfakeAudioDetector(model_path, device=device)
+    detector.compiled = compile_detector(detector)
+    return detector
+
+def _load_transformer_detector(model_path, device, base_detector):
+    """Load an fp32 transformer detector sharing the base detector's Wav2Vec2 model"""
+    detector = TransformerDeepfakeDetector(
+        model_path,
+        device=device,
+        feature_extractor=base_detector.feature_extractor,
+        base_model=base_detector.model
+    )
+    detector.compiled_model = compile_transformer(detector)
+    return detector
+
+def get_detector(model_path=MODEL_DIR, device=None, precision=None):
+    """
+    Get a warm DeepfakeAudioDetector from the process-wide model registry
+    
+    The model is loaded on first use and reused by every later call with the
+    same path, model version, device and precision. The INT8 detector is
+    quantized once from the fp32 one.
+    
+    Args:
+        model_path (str): Path to the model directory
+        device: Torch device (default: cuda if available, else cpu)
+        precision (str): "fp32" or "int8" (default: VOCALGUARD_PRECISION)
+        
+    Returns:
+        DeepfakeAudioDetector: Ready-to-use detector
+    """
+    precision = resolve_precision(precision)
+    device = _resolve_device(device, precision)
+    key = _model_key("wav2vec2", model_path, device, precision)
+    if precision == "int8":
+        return model_registry.get_or_load(key, lambda: quantize_detector(
+            get_detector(model_path, device, "fp32")
+        ))
+    return model_registry.get_or_load(key, lambda: _load_detector(model_path, device))
+
+def get_transformer_detector(model_path=MODEL_DIR, device=None, precision=None):
+    """
+    Get a warm TransformerDeepfakeDetector from the process-wide model registry
+    
+    The transformer detector shares the feature extractor and Wav2Vec2 model of
+    the registered DeepfakeAudioDetector instead of loading its own copy.
+    
+    Args:
+        model_path (str): Path to the model directory
+        device: Torch device (default: cuda if available, else cpu)
+        precision (str): "fp32" or "int8" (default: VOCALGUARD_PRECISION)
+        
+    Returns:
+        TransformerDeepfakeDetector: Ready-to-use detector
+    """
+    precision = resolve_precision(precision)
+    device = _resolve_device(device, precision)
+    base_detector = get_detector(model_path, device, precision)
+    key = _model_key("transformer", model_path, device, precision)
+    if precision == "int8":
+        return model_registry.get_or_load(key, lambda: quantize_transformer_detector(
+            get_transformer_detector(model_path, device, "fp32"),
+            base_detector.model
+        ))
+    return model_registry.get_or_load(key, lambda: _load_transformer_detector(model_path, device, base_detector))
+
+def get_batch_scheduler(model_path=MODEL_DIR, device=None, precision=None):
+    """
+    Get the shared micro-batching scheduler for the Wav2Vec2 detector
+    
+    Args:
+        model_path (str): Path to the model directory
+        device: Torch device (default: cuda if available, else cpu)
+        precision (str): "fp32" or "int8" (default: VOCALGUARD_PRECISION)
+        
+    Returns:
+        MicroBatchScheduler: Scheduler running DeepfakeAudioDetector.detect_batch
+    """
+    precision = resolve_precision(precision)
+    device = _resolve_device(device, precision)
+    detector = get_detector(model_path, device, precision)
+    key = _model_key("wav2vec2", model_path, device, precision)
+    return get_scheduler(
+        key,
+        detector.detect_batch,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        request_timeout=BATCH_REQUEST_TIMEOUT,
+        name="wav2vec2" if precision == "fp32" else f"wav2vec2-{precision}"
+    )
+
+def detection_cache_options():
+    """
+    Settings besides the model version that change a run_detection verdict
+    
+    Returns:
+        dict: Windowing configuration to fold into the result cache key
+    """
+    if WINDOW_SECONDS <= 0:
+        return {"window": 0}
+    return {"window": WINDOW_SECONDS, "hop": WINDOW_HOP_SECONDS, "strategy": WINDOW_STRATEGY}
+
+def run_detection(audio_path, detector=None):
+    """
+    Run the Wav2Vec2 detector on an audio file, batching with concurrent requests when enabled
+    
+    Recordings longer than WINDOW_SECONDS are run through sliding windows
+    (DeepfakeAudioDetector.detect_windowed) instead of one full-length pass.
+    
+    Args:
+        audio_path (str or AudioContext): Path to the audio file or its decoded context
+        detector: Optional detector (default: the registry detector for MODEL_DIR)
+        
+    Returns:
+        dict: Detection result from DeepfakeAudioDetector
+    """
+    detector = detector or get_detector(MODEL_DIR)
+    
+    if WINDOW_SECONDS > 0:
+        audio = as_audio_context(audio_path)
+        if audio.metadata.get("duration", 0) > WINDOW_SECONDS:
+            return detector.detect_windowed(
+                audio,
+                window_seconds=WINDOW_SECONDS,
+                hop_seconds=WINDOW_HOP_SECONDS,
+                strategy=WINDOW_STRATEGY,
+                batch_size=WINDOW_BATCH_SIZE
+            )
+        audio_path = audio
+    
+    if not MICRO_BATCHING:
+        return detector.detect(audio_path)
+    
+    waveform = detector.load_waveform(audio_path)
+    return get_batch_scheduler(MODEL_DIR, detector.device, detector.precision).run(waveform)
+
 def load_model(model_path=None):
     """
     Load the pre-trained deepfake detection model
@@ -139,103 +608,126 @@ def load_model(model_path=None):
     model.eval()
     return model
 
-def detect_deepfake(audio_path, user_id=None, store_results=True, filename=None, analysis_type="advanced"):
+def get_model_name(analysis_type):
+    """Get the reported model name for an analysis type"""
+    return ("wav2vec2-xlsr-deepfake" if analysis_type == "advanced" else 
+            "standard-ml-classifier" if analysis_type == "standard" else
+            "wav2vec2-demo" if analysis_type == "demo" else
+            "unknown-model")
+
+def format_detection_result(detection_result, analysis_type, processing_time, filename):
+    """
+    Convert a DeepfakeAudioDetector result into the API response format
+    
+    Args:
+        detection_result (dict): Result from DeepfakeAudioDetector
+        analysis_type (str): Type of analysis ("standard", "advanced" or "demo")
+        processing_time (float): Processing time in milliseconds
+        filename (str): Filename reported back to the client
+        
+    Returns:
+        dict: API result
+    """
+    result = {
+        "probability": detection_result["confidence"],
+        "is_fake": detection_result["is_fake"],
+        "confidence": detection_result["confidence"],
+        "label": detection_result["prediction"],
+        "model_used": get_model_name(analysis_type),
+        "processing_time": processing_time,
+        "probabilities": detection_result["probabilities"],
+        "filename": filename
+    }
+    
+    # Long recordings analysed with sliding windows
+    if "num_windows" in detection_result:
+        result["windows"] = {
+            key: detection_result[key]
+            for key in ("num_windows", "window_seconds", "hop_seconds", "aggregation", "window_fake_probabilities")
+        }
+    
+    return result
+
+def detect_deepfake(audio_path, user_id=None, store_results=True, filename=None, analysis_type="advanced", content_hash=None,
+                    precision=None):
     """
     Detect if an audio file is a deepfake using the Wav2Vec2 model in /models/deepfake_audio_model/.
     
     Args:
-        audio_path: Path to the audio file
+        audio_path: Path to the audio file or an AudioContext created for the upload
         user_id: Optional user ID to associate with the analysis
         store_results: Whether to store results in Firebase database
         filename: Original filename of the uploaded audio
         analysis_type: Type of analysis ("standard" or "advanced")
+        content_hash: SHA-256 of the audio bytes, if already computed during upload
+        precision: "fp32" or "int8" (default: VOCALGUARD_PRECISION)
         
     Returns:
         dict: Results including probability of being fake, classification, and analysis IDs
     """
     start_time = time.time()
     try:
-        # Initialize the detector with the model path
-        detector = DeepfakeAudioDetector(MODEL_DIR)
+        precision = resolve_precision(precision)
+        model_version = model_version_for(MODEL_VERSION, precision)
+        
+        # Decode the upload once and share it with every stage
+        audio = as_audio_context(audio_path, filename, content_hash)
+        audio_path = audio.path
         
-        # Detect if audio is fake
-        detection_result = detector.detect(audio_path)
+        # Reuse the verdict of an identical upload analysed by the same model
+        cache_key = (make_cache_key(audio.content_hash, model_version, analysis_type, detection_cache_options())
+                     if result_cache is not None else None)
+        detection_result = result_cache.get(cache_key) if cache_key else None
+        cache_hit = detection_result is not None
+        
+        if not cache_hit:
+            # Get the warm detector from the model registry
+            detector = get_detector(MODEL_DIR, precision=precision)
+            
+            # Detect if audio is fake (batched with concurrent requests when enabled)
+            detection_result = run_detection(audio, detector)
+            
+            if cache_key:
+                result_cache.set(cache_key, detection_result)
         
         # Convert the detailed result to our API format
         processing_time = (time.time() - start_time) * 1000  # ms
-        # Determine model name based on analysis type
-        model_name = ("wav2vec2-xlsr-deepfake" if analysis_type == "advanced" else 
-                     "standard-ml-classifier" if analysis_type == "standard" else
-                     "wav2vec2-demo" if analysis_type == "demo" else
-                     "unknown-model")
-        
-        result = {
-            "probability": detection_result["confidence"],
-            "is_fake": detection_result["is_fake"],
-            "confidence": detection_result["confidence"],
-            "label": detection_result["prediction"],
-            "model_used": model_name,
-            "processing_time": processing_time,
-            "probabilities": detection_result["probabilities"],
-            "filename": filename or os.path.basename(audio_path)
-        }
+        result = format_detection_result(detection_result, analysis_type, processing_time, audio.filename)
+        result["cached"] = cache_hit
+        result["precision"] = precision
         
         # Store results in Firebase if requested
         if store_results and user_id:
             try:
-                db_service = DatabaseService()
-                
-                # Get audio metadata
-                with open(audio_path, 'rb') as f:
-                    file_size = len(f.read())
-                
-                # Get audio duration and sample rate
-                try:
-                    audio_data, sample_rate = librosa.load(audio_path, sr=None)
-                    duration = librosa.get_duration(y=audio_data, sr=sample_rate)
-                except Exception as e:
-                    print(f"Error getting audio metadata: {e}")
-                    # Fallback values
-                    duration = 0
-                    sample_rate = 16000
+                # Get audio metadata from the container header (no extra decode)
+                audio_metadata = audio.metadata
                 
                 # Use provided filename or extract from path
-                if not filename:
-                    filename = os.path.basename(audio_path)
-                
-                # Save metadata in database
-                metadata_id = db_service.create_audio_metadata(
-                    user_id=user_id,
-                    filename=filename,
-                    file_size=file_size,
-                    duration=duration,
-                    sample_rate=sample_rate
-                )
+                filename = audio.filename
                 
-                # Create analysis result
+                # Metadata, analysis result and details are written in one batch
                 features_used = ["wav2vec2-xlsr"]
-                analysis_id = db_service.create_analysis_result(
-                    metadata_id=metadata_id,
-                    is_deepfake=result["is_fake"],
-                    confidence_score=result["confidence"],
-                    features_used=features_used
-                )
-                
-                # Create detailed results
                 feature_scores = {
                     "probabilities": detection_result["probabilities"]
                 }
-                details_id = db_service.create_result_details(
-                    analysis_id=analysis_id,
+                documents = DatabaseService.build_analysis_documents(
+                    user_id=user_id,
+                    filename=filename,
+                    file_size=audio_metadata["file_size"],
+                    duration=audio_metadata["duration"],
+                    sample_rate=audio_metadata["sample_rate"],
+                    channels=audio_metadata["channels"],
+                    bit_depth=audio_metadata["bit_depth"],
+                    is_deepfake=result["is_fake"],
+                    confidence_score=result["confidence"],
+                    features_used=features_used,
                     feature_scores=feature_scores,
-                    model_version=MODEL_VERSION,
+                    model_version=model_version,
                     processing_time=processing_time
                 )
                 
-                # Add IDs to the result
-                result["metadata_id"] = metadata_id
-                result["analysis_id"] = analysis_id
-                result["details_id"] = details_id
+                # Add IDs to the result (write-behind mode returns before Firestore is written)
+                result.update(analysis_writer.persist(documents))
                 
             except Exception as db_error:
                 print(f"Error storing results in database: {db_error}")
@@ -244,10 +736,7 @@ def detect_deepfake(audio_path, user_id=None, store_results=True, filename=None,
         return result
     except Exception as e:
         print(f"Error in detect_deepfake: {str(e)}")
-        model_name = ("wav2vec2-xlsr-deepfake" if analysis_type == "advanced" else 
-                     "standard-ml-classifier" if analysis_type == "standard" else
-                     "wav2vec2-demo" if analysis_type == "demo" else
-                     "unknown-model")
+        model_name = get_model_name(analysis_type)
         
         print(traceback.format_exc())
         return {
@@ -261,43 +750,150 @@ def detect_deepfake(audio_path, user_id=None, store_results=True, filename=None,
             "filename": filename or (os.path.basename(audio_path) if audio_path else "unknown")
         }
 
-def detect_deepfake_ensemble(audio_path, user_id=None, store_results=True, filename=None, use_transformer=True):
+def build_attention_analysis(transformer_result, attention_weights, attention_options):
+    """
+    Summarise the transformer's attention weights for the response (see core.attention_summary)
+    
+    Returns:
+        dict: Attention analysis, or {"error": ...} if the transformer or the summary failed
+    """
+    if attention_weights is None:
+        return {"error": transformer_result.get("error", "No attention weights")}
+    try:
+        return summarize_attention(attention_weights, attention_options)
+    except Exception as e:
+        print(f"Error in attention analysis: {e}")
+        return {"error": str(e)}
+
+def run_windowed_ensemble(detector, transformer_detector, audio, attention_resolution):
+    """
+    Feed both heads from one sliding-window backbone pass over a long recording
+    
+    Every batch of windows runs through the Wav2Vec2 backbone once. The
+    classification head and the AudioTransformer score each window; the head's
+    logits are aggregated like detect_windowed and the transformer's are
+    averaged. The attention analysis comes from the window the transformer
+    found most likely fake, so memory stays bounded by one batch of windows.
+    
+    Args:
+        detector: DeepfakeAudioDetector supporting the shared backbone
+        transformer_detector: TransformerDeepfakeDetector
+        audio (AudioContext): Decoded upload
+        attention_resolution (int): Size the transformer result's attention_weights are pooled to
+        
+    Returns:
+        tuple: (Wav2Vec2 detection result, transformer result, attention weights of the
+            reported window per layer or None)
+    """
+    fake_index = transformer_detector.label2id["fake"]
+    head_logits, transformer_logits = [], []
+    attention_features, attention_score = None, -1.0
+    for outputs, attention_mask in detector.iter_window_hidden_states(audio, WINDOW_SECONDS, WINDOW_HOP_SECONDS,
+                                                                     WINDOW_BATCH_SIZE):
+        head_logits.append(detector.head_logits(outputs, attention_mask).cpu())
+        
+        features = outputs.hidden_states[-1]
+        logits = transformer_detector.transformer_logits(features).cpu()
+        transformer_logits.append(logits)
+        fake_probabilities = torch.nn.functional.softmax(logits, dim=1)[:, fake_index]
+        window = int(torch.argmax(fake_probabilities))
+        if float(fake_probabilities[window]) > attention_score:
+            attention_score = float(fake_probabilities[window])
+            attention_features = features[window:window + 1]
+    
+    detection_result = detector.aggregate_window_logits(torch.cat(head_logits), WINDOW_SECONDS,
+                                                        WINDOW_HOP_SECONDS, WINDOW_STRATEGY)
+    transformer_logits = torch.cat(transformer_logits)
+    transformer_result, attention_weights = transformer_detector.detect_with_attention(
+        attention_features, attention_resolution, logits=transformer_logits.mean(dim=0, keepdim=True)
+    )
+    if not transformer_result.get("error"):
+        transformer_result["num_windows"] = int(transformer_logits.shape[0])
+    return detection_result, transformer_result, attention_weights
+
+def detect_deepfake_ensemble(audio_path, user_id=None, store_results=True, filename=None, use_transformer=True,
+                             precision=None, attention_options=None):
     """
     Detect deepfake using ensemble of Wav2Vec2 and Transformer models
     
     Args:
-        audio_path: Path to the audio file
+        audio_path: Path to the audio file or an AudioContext created for the upload
         user_id: Optional user ID to associate with the analysis
         store_results: Whether to store results in Firebase database
         filename: Original filename of the uploaded audio
         use_transformer: Whether to use transformer model in ensemble
+        precision: "fp32" or "int8" (default: VOCALGUARD_PRECISION)
+        attention_options: Attention payload options from resolve_attention_options (default: summary)
         
     Returns:
         dict: Enhanced results with ensemble predictions and attention analysis
     """
     start_time = time.time()
     try:
-        # Get Wav2Vec2 results
-        wav2vec2_result = detect_deepfake(audio_path, user_id=None, store_results=False, filename=filename)
+        precision = resolve_precision(precision)
+        model_version = model_version_for(MODEL_VERSION, precision)
+        
+        # Decode the upload once and share it with every stage
+        audio = as_audio_context(audio_path, filename)
+        audio_path = audio.path
+        
+        detector = get_detector(MODEL_DIR, precision=precision)
+        shared_backbone = use_transformer and detector.supports_shared_backbone
+        # Recordings longer than one window are run through the backbone window by window
+        windowed = WINDOW_SECONDS > 0 and audio.metadata.get("duration", 0) > WINDOW_SECONDS
         
         results = {
-            "wav2vec2_result": wav2vec2_result,
+            "wav2vec2_result": None,
             "transformer_result": None,
             "ensemble_result": None,
             "attention_analysis": None
         }
         
         if use_transformer:
-            # Initialize transformer detector
-            transformer_detector = TransformerDeepfakeDetector(MODEL_DIR)
+            # Get the warm transformer detector from the model registry
+            transformer_detector = get_transformer_detector(MODEL_DIR, precision=precision)
+            # Stored with the verdict: front-end settings and encoding fixes change the transformer's outputs
+            transformer_version = transformer_detector.version
+            attention_options = attention_options or resolve_attention_options()
+        
+        if shared_backbone and windowed:
+            # One windowed backbone pass feeds the classification head and the AudioTransformer
+            detection_result, transformer_result, attention_weights = run_windowed_ensemble(
+                detector, transformer_detector, audio, attention_options["resolution"]
+            )
+        elif shared_backbone:
+            # Run the Wav2Vec2 backbone once and feed both the classification
+            # head and the AudioTransformer from the same hidden states
+            waveform = detector.load_waveform(audio)
+            backbone_outputs, attention_mask = detector.extract_hidden_states(waveform)
+            detection_result = detector.classify_hidden_states(backbone_outputs, attention_mask)
             
-            # Get transformer results
-            transformer_result = transformer_detector.detect(audio_path)
+            # Get transformer results and attention analysis from a single transformer pass
+            transformer_result, attention_weights = transformer_detector.detect_with_attention(
+                backbone_outputs.hidden_states[-1], attention_resolution=attention_options["resolution"]
+            )
+        
+        if shared_backbone:
+            wav2vec2_result = format_detection_result(
+                detection_result,
+                "advanced",
+                (time.time() - start_time) * 1000,
+                audio.filename
+            )
+        else:
+            # Get Wav2Vec2 results (windowed for long recordings, see run_detection)
+            wav2vec2_result = detect_deepfake(audio, user_id=None, store_results=False, filename=filename,
+                                              precision=precision)
+            if use_transformer:
+                transformer_result, attention_weights = transformer_detector.detect_with_attention(
+                    transformer_detector.extract_features(audio), attention_resolution=attention_options["resolution"]
+                )
+        results["wav2vec2_result"] = wav2vec2_result
+        
+        if use_transformer:
             results["transformer_result"] = transformer_result
-            
-            # Get attention analysis
-            attention_analysis = transformer_detector.get_attention_analysis(audio_path)
-            results["attention_analysis"] = attention_analysis
+            results["attention_analysis"] = build_attention_analysis(transformer_result, attention_weights,
+                                                                     attention_options)
             
             # Ensemble prediction (weighted average)
             if not wav2vec2_result.get("error") and not transformer_result.get("error"):
@@ -346,73 +942,53 @@ def detect_deepfake_ensemble(audio_path, user_id=None, store_results=True, filen
         # Use ensemble result if available, otherwise use wav2vec2 result
         final_result = results.get("ensemble_result") or wav2vec2_result
         final_result["processing_time"] = processing_time
-        final_result["filename"] = filename or os.path.basename(audio_path)
+        final_result["filename"] = audio.filename
+        final_result["precision"] = precision
         
         # Store results in database if requested
         if store_results and user_id and not final_result.get("error"):
             try:
-                db_service = DatabaseService()
-                
-                # Get audio metadata
-                with open(audio_path, 'rb') as f:
-                    file_size = len(f.read())
-                
-                # Get audio duration and sample rate
-                try:
-                    audio_data, sample_rate = librosa.load(audio_path, sr=None)
-                    duration = librosa.get_duration(y=audio_data, sr=sample_rate)
-                except Exception as e:
-                    print(f"Error getting audio metadata: {e}")
-                    duration = 0
-                    sample_rate = 16000
+                # Get audio metadata from the container header (no extra decode)
+                audio_metadata = audio.metadata
                 
                 # Use provided filename or extract from path
-                if not filename:
-                    filename = os.path.basename(audio_path)
-                
-                # Save metadata in database
-                metadata_id = db_service.create_audio_metadata(
-                    user_id=user_id,
-                    filename=filename,
-                    file_size=file_size,
-                    duration=duration,
-                    sample_rate=sample_rate
-                )
+                filename = audio.filename
                 
-                # Create analysis result
                 features_used = ["wav2vec2-xlsr"]
                 if use_transformer:
                     features_used.append("transformer-attention")
                 
-                analysis_id = db_service.create_analysis_result(
-                    metadata_id=metadata_id,
-                    is_deepfake=final_result["is_fake"],
-                    confidence_score=final_result["confidence"],
-                    features_used=features_used
-                )
-                
                 # Create detailed results with ensemble information
                 feature_scores = {
                     "wav2vec2_probabilities": wav2vec2_result.get("probabilities", {}),
                     "ensemble_result": results.get("ensemble_result"),
-                    "attention_analysis": results.get("attention_analysis")
+                    # Only the attention summary is stored, never the full matrices
+                    "attention_analysis": strip_full_matrices(results.get("attention_analysis"))
                 }
                 
                 if results.get("transformer_result"):
                     feature_scores["transformer_probabilities"] = results["transformer_result"].get("probabilities", {})
                     feature_scores["attention_weights"] = results["transformer_result"].get("attention_weights", [])
                 
-                details_id = db_service.create_result_details(
-                    analysis_id=analysis_id,
+                # Metadata, analysis result and details are written in one batch
+                documents = DatabaseService.build_analysis_documents(
+                    user_id=user_id,
+                    filename=filename,
+                    file_size=audio_metadata["file_size"],
+                    duration=audio_metadata["duration"],
+                    sample_rate=audio_metadata["sample_rate"],
+                    channels=audio_metadata["channels"],
+                    bit_depth=audio_metadata["bit_depth"],
+                    is_deepfake=final_result["is_fake"],
+                    confidence_score=final_result["confidence"],
+                    features_used=features_used,
                     feature_scores=feature_scores,
-                    model_version=f"{MODEL_VERSION}_ensemble" if use_transformer else MODEL_VERSION,
+                    model_version=f"{model_version}_ensemble-{transformer_version}" if use_transformer else model_version,
                     processing_time=processing_time
                 )
                 
-                # Add IDs to the result
-                final_result["metadata_id"] = metadata_id
-                final_result["analysis_id"] = analysis_id
-                final_result["details_id"] = details_id
+                # Add IDs to the result (write-behind mode returns before Firestore is written)
+                final_result.update(analysis_writer.persist(documents))
                 
             except Exception as db_error:
                 print(f"Error storing ensemble results in database: {db_error}")
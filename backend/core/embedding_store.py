@@ -0,0 +1,260 @@
+"""
+Embedding Store Module for VocalGuard
+
+This module stores fixed-size embeddings in a memory-mapped binary file instead
+of a JSON document. Each entry occupies one slot of a preallocated
+(capacity, dim) float16/float32 array; a compact key index and a last-access
+array live in their own memory-mapped files. Lookups and inserts touch a single
+slot, and least-recently-used entries are evicted by reusing their slot, so the
+files are never rewritten as the store grows.
+
+Each process keeps its key-to-slot index in memory, in least-recently-used
+order, next to a list of free slots, so neither a lookup nor an insert scans the
+key file. Several worker processes may share one store: every insert takes an
+exclusive lock on a lock file next to the store and bumps a shared generation
+counter, and a process whose generation is behind rebuilds its index from the
+key and access-stamp files under the same lock. A lookup re-checks the stored
+key of the slot it found, so a slot taken over by another worker is a miss
+rather than someone else's embedding.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process only
+    fcntl = None
+
+# Format version of the on-disk layout
+STORE_VERSION = 2
+
+
+class EmbeddingStore:
+    """Memory-mapped embedding store with LRU eviction, shareable between processes"""
+
+    def __init__(self, directory, dim=768, capacity=10000, dtype="float16", key_size=32):
+        """
+        Open (or create) an embedding store
+
+        Args:
+            directory: Directory holding the store files
+            dim: Embedding dimension
+            capacity: Maximum number of embeddings
+            dtype: Storage dtype ("float16" or "float32")
+            key_size: Maximum key length in bytes (longer keys are hashed)
+        """
+        self.directory = directory
+        self.dim = int(dim)
+        self.capacity = max(1, int(capacity))
+        self.dtype = np.dtype(dtype)
+        self.key_size = int(key_size)
+
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "inserts": 0, "evictions": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._vectors_path = os.path.join(directory, "embeddings.bin")
+        self._keys_path = os.path.join(directory, "keys.bin")
+        self._stamps_path = os.path.join(directory, "stamps.bin")
+        self._generation_path = os.path.join(directory, "generation.bin")
+        self._lock_path = os.path.join(directory, "store.lock")
+
+        with self._file_lock():
+            self._open()
+
+    def _layout(self):
+        return {
+            "version": STORE_VERSION,
+            "dim": self.dim,
+            "capacity": self.capacity,
+            "dtype": self.dtype.name,
+            "key_size": self.key_size,
+        }
+
+    def _open(self):
+        """Map the store files, creating them when missing or incompatible"""
+        layout = self._layout()
+        existing = None
+        if os.path.exists(self._meta_path):
+            try:
+                with open(self._meta_path, "r") as f:
+                    existing = json.load(f)
+            except Exception:
+                existing = None
+
+        mode = "r+" if existing == layout and all(
+            os.path.exists(path)
+            for path in (self._vectors_path, self._keys_path, self._stamps_path, self._generation_path)
+        ) else "w+"
+
+        self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode=mode,
+                                  shape=(self.capacity, self.dim))
+        self._keys = np.memmap(self._keys_path, dtype=f"S{self.key_size}", mode=mode,
+                               shape=(self.capacity,))
+        self._stamps = np.memmap(self._stamps_path, dtype=np.float64, mode=mode,
+                                 shape=(self.capacity,))
+        # Bumped by every insert, so other processes know their index is out of date
+        self._generation = np.memmap(self._generation_path, dtype=np.int64, mode=mode, shape=(1,))
+
+        if mode == "w+":
+            with open(self._meta_path, "w") as f:
+                json.dump(layout, f)
+
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the in-memory index and free list from the key and stamp files"""
+        self._seen_generation = int(self._generation[0])
+        occupied = np.flatnonzero(self._keys != b"")
+        # Least recently used first, so eviction takes the head of the index
+        order = occupied[np.argsort(self._stamps[occupied], kind="stable")]
+        self._index = OrderedDict((self._keys[slot], int(slot)) for slot in order)
+        self._free = [int(slot) for slot in np.flatnonzero(self._keys == b"")[::-1]]
+
+    def _refresh(self):
+        """Reload the index if another process inserted since it was built (caller holds the file lock)"""
+        if int(self._generation[0]) != self._seen_generation:
+            self._load_index()
+
+    def _is_current(self):
+        return int(self._generation[0]) == self._seen_generation
+
+    def _sync(self):
+        """Bring the index up to date with inserts made by other processes"""
+        if not self._is_current():
+            with self._file_lock():
+                self._refresh()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process using the store directory"""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _encode_key(self, key):
+        """Convert a key to its fixed-size stored form"""
+        raw = key.encode() if isinstance(key, str) else bytes(key)
+        if len(raw) > self.key_size or not raw:
+            raw = hashlib.md5(raw).hexdigest().encode()[:self.key_size]
+        return raw
+
+    def get(self, key):
+        """
+        Look up an embedding
+
+        Args:
+            key: Entry key
+
+        Returns:
+            numpy.ndarray or None: float32 copy of the embedding
+        """
+        stored_key = self._encode_key(key)
+        with self._lock:
+            slot = self._index.get(stored_key)
+            if slot is None:
+                # The entry may have been written by another process
+                self._sync()
+                slot = self._index.get(stored_key)
+            if slot is None:
+                self._stats["misses"] += 1
+                return None
+
+            vector = np.array(self._vectors[slot], dtype=np.float32)
+            if self._keys[slot] != stored_key:
+                # Another process reused the slot for a different key
+                self._stats["stale"] += 1
+                self._stats["misses"] += 1
+                self._sync()
+                return None
+            self._index.move_to_end(stored_key)
+            self._stamps[slot] = time.time()
+            self._stats["hits"] += 1
+            return vector
+
+    def put(self, key, embedding):
+        """
+        Insert or replace an embedding, evicting the least recently used one if full
+
+        Args:
+            key: Entry key
+            embedding: 1-D array of length dim
+        """
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"Expected embedding of size {self.dim}, got {vector.shape[0]}")
+
+        stored_key = self._encode_key(key)
+        with self._lock, self._file_lock():
+            self._refresh()
+            slot = self._index.get(stored_key)
+            inserted = slot is None
+            if inserted:
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    _, slot = self._index.popitem(last=False)
+                    self._stats["evictions"] += 1
+                self._stats["inserts"] += 1
+
+            # Clear the key first so readers never pair it with a half-written vector
+            self._keys[slot] = b""
+            self._vectors[slot] = vector.astype(self.dtype)
+            self._stamps[slot] = time.time()
+            self._keys[slot] = stored_key
+            self._index[stored_key] = slot
+            self._index.move_to_end(stored_key)
+            if inserted:
+                self._generation[0] += 1
+                self._seen_generation = int(self._generation[0])
+
+    def __contains__(self, key):
+        stored_key = self._encode_key(key)
+        with self._lock:
+            self._sync()
+            slot = self._index.get(stored_key)
+            return slot is not None and self._keys[slot] == stored_key
+
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return len(self._index)
+
+    def flush(self):
+        """Write dirty pages of every mapped file to disk"""
+        with self._lock:
+            self._vectors.flush()
+            self._keys.flush()
+            self._stamps.flush()
+            self._generation.flush()
+
+    def stats(self):
+        """
+        Get store statistics
+
+        Returns:
+            dict: Hit/miss counters, size and capacity
+        """
+        stats = dict(self._stats)
+        stats.update({
+            "size": len(self),
+            "capacity": self.capacity,
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+        })
+        return stats
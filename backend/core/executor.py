@@ -0,0 +1,172 @@
+"""
+Inference Executor Module for VocalGuard
+
+This module runs the blocking detection pipeline (audio decoding, model
+forward passes, Firestore writes) on a bounded thread or process pool so that
+async request handlers never block the event loop. It also tracks queue depth
+and timing metrics.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Executor configuration
+EXECUTOR_MODE = os.getenv("VOCALGUARD_EXECUTOR_MODE", "thread").lower()  # "thread" or "process"
+EXECUTOR_WORKERS = int(os.getenv("VOCALGUARD_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXECUTOR_MAX_QUEUE = int(os.getenv("VOCALGUARD_EXECUTOR_MAX_QUEUE", "32"))
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when the executor queue is full and a new job is rejected"""
+
+
+def _timed_call(fn, args, kwargs):
+    """
+    Run fn and report when it started and how long it took
+
+    Defined at module level so it can be pickled for process pools.
+    """
+    started_at = time.time()
+    result = fn(*args, **kwargs)
+    return result, started_at, time.time() - started_at
+
+
+class InferenceExecutor:
+    """Bounded executor for CPU-bound detection work"""
+
+    def __init__(self, mode=EXECUTOR_MODE, max_workers=EXECUTOR_WORKERS,
+                 max_queue=EXECUTOR_MAX_QUEUE, name="inference", initializer=None):
+        """
+        Initialize the executor
+
+        Args:
+            mode: "thread" or "process"
+            max_workers: Number of jobs that run at the same time
+            max_queue: Number of jobs allowed to wait for a worker before new ones are rejected
+            name: Name used in stats
+            initializer: Optional callable run once in every process worker (process mode only)
+        """
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown executor mode: {mode}")
+
+        self.mode = mode
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.name = name
+        self.initializer = initializer
+
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "in_flight": 0,
+            "total_wait_ms": 0.0,
+            "total_run_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+    def _get_pool(self):
+        """Create the underlying pool on first use"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    if self.mode == "process":
+                        self._pool = ProcessPoolExecutor(
+                            max_workers=self.max_workers, initializer=self.initializer
+                        )
+                    else:
+                        self._pool = ThreadPoolExecutor(
+                            max_workers=self.max_workers, thread_name_prefix=self.name
+                        )
+        return self._pool
+
+    @property
+    def queue_depth(self):
+        """Number of submitted jobs still waiting for a worker"""
+        return max(0, self._stats["in_flight"] - self.max_workers)
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run a blocking function on the pool without blocking the event loop
+
+        Args:
+            fn: Blocking callable (must be picklable in process mode)
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The return value of fn
+
+        Raises:
+            ExecutorSaturatedError: If max_workers + max_queue jobs are already in flight
+        """
+        with self._counter_lock:
+            if self._stats["in_flight"] >= self.max_workers + self.max_queue:
+                self._stats["rejected"] += 1
+                raise ExecutorSaturatedError(
+                    f"Inference queue is full ({self._stats['in_flight']} jobs in flight)"
+                )
+            self._stats["in_flight"] += 1
+            self._stats["submitted"] += 1
+
+        submitted_at = time.time()
+        loop = asyncio.get_running_loop()
+        try:
+            result, started_at, run_time = await loop.run_in_executor(
+                self._get_pool(), functools.partial(_timed_call, fn, args, kwargs)
+            )
+        except Exception:
+            with self._counter_lock:
+                self._stats["failed"] += 1
+            raise
+        finally:
+            with self._counter_lock:
+                self._stats["in_flight"] -= 1
+
+        wait_ms = max(0.0, (started_at - submitted_at) * 1000)
+        with self._counter_lock:
+            self._stats["completed"] += 1
+            self._stats["total_wait_ms"] += wait_ms
+            self._stats["total_run_ms"] += run_time * 1000
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+        return result
+
+    def shutdown(self, wait=False):
+        """Shut the pool down"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+                self._pool = None
+
+    def stats(self):
+        """
+        Get executor statistics
+
+        Returns:
+            dict: Queue depth, concurrency and timing counters
+        """
+        stats = dict(self._stats)
+        finished = stats["completed"]
+        stats.update({
+            "name": self.name,
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": min(stats["in_flight"], self.max_workers),
+            "queue_depth": self.queue_depth,
+            "avg_wait_ms": stats["total_wait_ms"] / finished if finished else 0.0,
+            "avg_run_ms": stats["total_run_ms"] / finished if finished else 0.0,
+        })
+        return stats
+
+
+# Shared executor for the detection endpoints
+inference_executor = InferenceExecutor()
@@ -5,19 +5,26 @@ import torchaudio
 from transformers import Wav2Vec2Processor, Wav2Vec2Model
 import os
 import hashlib
-import time
 import json
+import threading
 from pathlib import Path
 
+from core.audio_context import AudioContext
+from core.embedding_store import EmbeddingStore
+
 # Initialize Wav2Vec2 model and processor (lazy loading)
 _wav2vec2_model = None
 _wav2vec2_processor = None
 
-# Cache for Wav2Vec2 embeddings
-_wav2vec2_cache = {}
+# Cache for Wav2Vec2 embeddings (memory-mapped binary store, opened lazily)
+_embedding_store = None
+_embedding_store_lock = threading.Lock()
 _cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
-_cache_file = os.path.join(_cache_dir, "wav2vec2_cache.json")
-_max_cache_size = 100  # Maximum number of items in cache
+_store_dir = os.path.join(_cache_dir, "wav2vec2_embeddings")
+_legacy_cache_file = os.path.join(_cache_dir, "wav2vec2_cache.json")
+_max_cache_size = int(os.getenv("VOCALGUARD_EMBEDDING_CACHE_SIZE", "10000"))  # Maximum number of items in cache
+_cache_dtype = os.getenv("VOCALGUARD_EMBEDDING_CACHE_DTYPE", "float16")
+_embedding_dim = 768  # Size of facebook/wav2vec2-base embeddings
 
 def _get_audio_hash(audio_path):
     """
@@ -47,72 +54,48 @@ def _get_audio_hash(audio_path):
         # Fallback to just the file path
         return hashlib.md5(audio_path.encode()).hexdigest()
 
-def _load_cache():
-    """Load embedding cache from disk"""
-    global _wav2vec2_cache
-    
-    if not os.path.exists(_cache_dir):
-        os.makedirs(_cache_dir, exist_ok=True)
-        
-    if os.path.exists(_cache_file):
-        try:
-            with open(_cache_file, 'r') as f:
-                cache_data = json.load(f)
-                
-            # Convert lists back to numpy arrays
-            for key, value in cache_data.items():
-                if 'embedding' in value:
-                    value['embedding'] = np.array(value['embedding'])
-            _wav2vec2_cache = cache_data
-        except Exception as e:
-            # Silent fail for cache loading issues
-            _wav2vec2_cache = {}
-    else:
-        _wav2vec2_cache = {}
-
-def _save_cache():
-    """Save embedding cache to disk"""
-    if not _wav2vec2_cache:
+def _import_legacy_cache(store):
+    """Move entries of the old JSON cache into the binary store, then remove the JSON file"""
+    if not os.path.exists(_legacy_cache_file):
         return
-        
-    if not os.path.exists(_cache_dir):
-        os.makedirs(_cache_dir, exist_ok=True)
-    
     try:
-        # Convert numpy arrays to lists for JSON serialization
-        cache_data = {}
-        for key, value in _wav2vec2_cache.items():
-            cache_data[key] = {
-                'timestamp': value['timestamp'],
-                'filename': value['filename']
-            }
+        with open(_legacy_cache_file, 'r') as f:
+            cache_data = json.load(f)
+        for key, value in sorted(cache_data.items(), key=lambda x: x[1].get('timestamp', 0)):
             if 'embedding' in value:
-                cache_data[key]['embedding'] = value['embedding'].tolist()
-        
-        with open(_cache_file, 'w') as f:
-            json.dump(cache_data, f)
+                store.put(key, np.array(value['embedding']))
+        store.flush()
+        os.remove(_legacy_cache_file)
     except Exception:
-        # Silent fail for cache saving issues
+        # Silent fail for cache migration issues
         pass
 
-def _trim_cache():
-    """Trim the cache to the maximum size by removing oldest entries"""
-    global _wav2vec2_cache
+def _get_embedding_store():
+    """
+    Lazy initialization of the Wav2Vec2 embedding store
     
-    if len(_wav2vec2_cache) <= _max_cache_size:
-        return
-        
-    # Sort by timestamp (oldest first)
-    sorted_items = sorted(_wav2vec2_cache.items(), key=lambda x: x[1]['timestamp'])
+    Returns:
+        EmbeddingStore or None: The store, or None if it can't be opened
+    """
+    global _embedding_store
     
-    # Remove oldest items
-    items_to_remove = len(_wav2vec2_cache) - _max_cache_size
-    for i in range(items_to_remove):
-        key, _ = sorted_items[i]
-        del _wav2vec2_cache[key]
-
-# Load cache at module initialization
-_load_cache()
+    if _embedding_store is None:
+        with _embedding_store_lock:
+            if _embedding_store is None:
+                try:
+                    store = EmbeddingStore(
+                        _store_dir,
+                        dim=_embedding_dim,
+                        capacity=_max_cache_size,
+                        dtype=_cache_dtype
+                    )
+                    _import_legacy_cache(store)
+                    _embedding_store = store
+                except Exception as e:
+                    print(f"Error opening embedding cache: {e}")
+                    return None
+    
+    return _embedding_store
 
 def _get_wav2vec2():
     """
@@ -141,7 +124,7 @@ def extract_features(audio_path, sr=16000, n_mfcc=40, use_wav2vec2=True):
     Extract audio features from an audio file using Wav2Vec2 and traditional features
     
     Args:
-        audio_path: Path to the audio file
+        audio_path: Path to the audio file or an AudioContext
         sr: Sample rate (default: 16000 - Wav2Vec2 expected sample rate)
         n_mfcc: Number of MFCC features to extract (default: 40)
         use_wav2vec2: Whether to use Wav2Vec2 features (default: True)
@@ -150,14 +133,20 @@ def extract_features(audio_path, sr=16000, n_mfcc=40, use_wav2vec2=True):
         numpy.ndarray: Extracted features
     """
     try:
-        # Load the audio file
-        y, orig_sr = librosa.load(audio_path, sr=None)
-        
-        # For Wav2Vec2, we need to resample to 16kHz
-        if orig_sr != 16000:
-            y_16k = librosa.resample(y, orig_sr=orig_sr, target_sr=16000)
+        if isinstance(audio_path, AudioContext):
+            # Reuse the request's decoded audio
+            y, orig_sr = audio_path.mono, audio_path.sample_rate
+            y_16k = audio_path.waveform_16k
+            audio_path = audio_path.path
         else:
-            y_16k = y
+            # Load the audio file
+            y, orig_sr = librosa.load(audio_path, sr=None)
+            
+            # For Wav2Vec2, we need to resample to 16kHz
+            if orig_sr != 16000:
+                y_16k = librosa.resample(y, orig_sr=orig_sr, target_sr=16000)
+            else:
+                y_16k = y
             
         # Extract features using Wav2Vec2 if enabled
         if use_wav2vec2:
@@ -215,7 +204,8 @@ def extract_wav2vec2_features(waveform_or_path, audio_path=None, max_length=1600
     Args:
         waveform_or_path: Audio waveform (16kHz) or path to audio file
         audio_path: Path to the audio file (used for caching)
-        max_length: Maximum length of waveform in samples (default: 160000 = 10 seconds at 16kHz)
+        max_length: Window length in samples (default: 160000 = 10 seconds at 16kHz);
+            longer audio is processed window by window and averaged, not truncated
         
     Returns:
         numpy.ndarray: Wav2Vec2 features
@@ -235,39 +225,48 @@ def extract_wav2vec2_features(waveform_or_path, audio_path=None, max_length=1600
         audio_hash = _get_audio_hash(audio_path) if audio_path else None
         
         # Check cache
-        if audio_hash and audio_hash in _wav2vec2_cache:
+        store = _get_embedding_store() if audio_hash else None
+        cached_embedding = store.get(audio_hash) if store is not None else None
+        if cached_embedding is not None:
             print(f"Using cached Wav2Vec2 embedding for {audio_path}")
-            return _wav2vec2_cache[audio_hash]['embedding']
+            return cached_embedding
         
-        # Truncate or pad the waveform if necessary
-        if len(waveform) > max_length:
-            waveform = waveform[:max_length]
+        # Long recordings are processed in max_length windows (the last one is
+        # aligned to the end) instead of being truncated
+        starts = list(range(0, max(len(waveform) - max_length, 0) + 1, max_length))
+        if starts[-1] + max_length < len(waveform):
+            starts.append(len(waveform) - max_length)
         
-        # Convert to float32 tensor
-        waveform_tensor = torch.tensor(waveform).float()
-        
-        # Prepare input for Wav2Vec2
-        inputs = processor(waveform_tensor, sampling_rate=16000, return_tensors="pt", padding=True)
-        
-        # Extract features without gradient calculation
-        with torch.no_grad():
-            outputs = model(**inputs)
+        frame_sums = None
+        num_frames = 0
+        for start in starts:
+            # Convert to float32 tensor
+            waveform_tensor = torch.tensor(waveform[start:start + max_length]).float()
+            
+            # Prepare input for Wav2Vec2
+            inputs = processor(waveform_tensor, sampling_rate=16000, return_tensors="pt", padding=True)
+            
+            # Extract features without gradient calculation
+            with torch.no_grad():
+                outputs = model(**inputs)
+                
+            # Get the hidden states from the last layer
+            hidden_states = outputs.last_hidden_state
             
-        # Get the hidden states from the last layer
-        hidden_states = outputs.last_hidden_state
+            window_sum = torch.sum(hidden_states, dim=1).squeeze(0)
+            frame_sums = window_sum if frame_sums is None else frame_sums + window_sum
+            num_frames += hidden_states.shape[1]
         
-        # Average across time dimension to get a fixed-size representation
-        wav2vec2_embeddings = torch.mean(hidden_states, dim=1).squeeze().numpy()
+        # Average across time dimension (over every window) to get a fixed-size representation
+        wav2vec2_embeddings = (frame_sums / num_frames).numpy()
         
-        # Cache the embedding
-        if audio_hash:
-            _wav2vec2_cache[audio_hash] = {
-                'timestamp': time.time(),
-                'filename': audio_path,
-                'embedding': wav2vec2_embeddings
-            }
-            _trim_cache()
-            _save_cache()
+        # Cache the embedding (writes a single slot of the store)
+        if store is not None:
+            try:
+                store.put(audio_hash, wav2vec2_embeddings)
+            except Exception:
+                # Silent fail for cache saving issues
+                pass
         
         return wav2vec2_embeddings
         
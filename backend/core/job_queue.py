@@ -0,0 +1,352 @@
+"""
+Job Queue Module for VocalGuard
+
+This module runs long analyses as background jobs. Submitting a job stores it
+in an SQLite queue and returns a job ID immediately; a pool of worker threads
+claims jobs by priority lane, runs the registered handler and stores the result
+for the status/result endpoints. Failed jobs are retried with exponential
+backoff. Claimed jobs hold a lease, so a job whose worker process died is
+picked up again once the lease expires. Several processes (e.g. pre-forked
+uvicorn workers) can share one queue file.
+"""
+
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+# Job queue configuration
+JOB_WORKERS = int(os.getenv("VOCALGUARD_JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("VOCALGUARD_JOB_MAX_ATTEMPTS", "3"))
+JOB_LEASE_SECONDS = float(os.getenv("VOCALGUARD_JOB_LEASE_SECONDS", "900"))
+JOB_RESULT_TTL = float(os.getenv("VOCALGUARD_JOB_RESULT_TTL", str(7 * 24 * 3600)))  # seconds
+JOB_POLL_INTERVAL = 0.5  # seconds between queue polls when idle
+JOB_RETRY_BASE_DELAY = 2.0  # seconds, doubled on every retry
+
+# Priority lanes (lower value is served first)
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+# Job states
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+# Queue database and spooled job inputs (shared with the other on-disk caches)
+_cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
+JOB_DB_PATH = os.getenv("VOCALGUARD_JOB_DB") or os.path.join(_cache_dir, "jobs.sqlite3")
+JOB_FILES_DIR = os.path.join(_cache_dir, "job_files")
+
+
+class JobNotFoundError(KeyError):
+    """Raised when a job ID is unknown"""
+
+
+class JobQueue:
+    """Durable SQLite job queue with priority lanes, retries and a worker pool"""
+
+    def __init__(self, path=JOB_DB_PATH, files_dir=JOB_FILES_DIR, workers=JOB_WORKERS,
+                 max_attempts=JOB_MAX_ATTEMPTS, lease_seconds=JOB_LEASE_SECONDS):
+        """
+        Initialize the queue
+
+        Args:
+            path: Path to the SQLite database file
+            files_dir: Directory holding input files owned by queued jobs
+            workers: Number of worker threads started by start()
+            max_attempts: Attempts per job before it is marked failed
+            lease_seconds: Time after which a running job is considered abandoned
+        """
+        self.path = path
+        self.files_dir = files_dir
+        self.workers = max(1, int(workers))
+        self.max_attempts = max(1, int(max_attempts))
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._handlers = {}
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {"submitted": 0, "succeeded": 0, "failed": 0, "retried": 0,
+                       "total_wait_time": 0.0, "total_run_time": 0.0}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.makedirs(files_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, user_id TEXT, priority INTEGER NOT NULL, "
+                "status TEXT NOT NULL, payload TEXT NOT NULL, result TEXT, error TEXT, "
+                "attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, available_at REAL NOT NULL, started_at REAL, "
+                "finished_at REAL, lease_expires_at REAL, worker TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, priority, available_at)")
+
+    def _connect(self):
+        # One short-lived connection per call keeps this safe across threads and processes
+        return sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def register(self, kind, handler):
+        """
+        Register the handler of a job kind
+
+        Args:
+            kind: Job kind name
+            handler: Callable (payload dict) -> JSON-serialisable result
+        """
+        self._handlers[kind] = handler
+
+    def adopt_file(self, path, job_id):
+        """Move an input file into the queue's file directory so it outlives the request"""
+        target = os.path.join(self.files_dir, f"{job_id}{os.path.splitext(path)[1]}")
+        shutil.move(path, target)
+        return target
+
+    def submit(self, kind, payload, user_id=None, priority="normal", job_id=None):
+        """
+        Add a job to the queue
+
+        Args:
+            kind: Registered job kind
+            payload: JSON-serialisable handler input
+            user_id: Owner of the job
+            priority: "high", "normal" or "low"
+            job_id: Optional pre-generated job ID
+
+        Returns:
+            str: Job ID
+
+        Raises:
+            ValueError: For an unknown kind or priority
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {', '.join(PRIORITIES)}")
+
+        job_id = job_id or str(uuid.uuid4())
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, user_id, priority, status, payload, max_attempts, "
+                "created_at, available_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, user_id, PRIORITIES[priority], QUEUED, json.dumps(payload),
+                 self.max_attempts, now, now)
+            )
+        self._count("submitted")
+        self._wakeup.set()
+        return job_id
+
+    def _claim(self):
+        """Atomically take the next runnable job (or an abandoned running one)"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, kind, payload, attempts, max_attempts, created_at FROM jobs "
+                "WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at < ?) "
+                "ORDER BY priority, created_at LIMIT 1",
+                (QUEUED, now, RUNNING, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, "
+                "lease_expires_at = ?, worker = ? WHERE id = ?",
+                (RUNNING, now, now + self.lease_seconds, self.worker_id, row[0])
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        job_id, kind, payload, attempts, max_attempts, created_at = row
+        self._count("total_wait_time", now - created_at)
+        return {"id": job_id, "kind": kind, "payload": json.loads(payload),
+                "attempt": attempts + 1, "max_attempts": max_attempts}
+
+    def _finish(self, job, result=None, error=None):
+        """Store the outcome of an attempt, scheduling a retry when attempts remain"""
+        now = time.time()
+        with self._connect() as conn:
+            if error is None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ?, "
+                    "lease_expires_at = NULL WHERE id = ?",
+                    (SUCCEEDED, json.dumps(result), now, job["id"])
+                )
+                self._count("succeeded")
+            elif job["attempt"] < job["max_attempts"]:
+                delay = JOB_RETRY_BASE_DELAY * 2 ** (job["attempt"] - 1)
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, available_at = ?, lease_expires_at = NULL "
+                    "WHERE id = ?",
+                    (QUEUED, error, now + delay, job["id"])
+                )
+                self._count("retried")
+                return
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_expires_at = NULL "
+                    "WHERE id = ?",
+                    (FAILED, error, now, job["id"])
+                )
+                self._count("failed")
+        self._release_files(job["payload"])
+
+    def _release_files(self, payload):
+        """Delete the input file of a finished job"""
+        path = payload.get("path")
+        if path and os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.files_dir):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def run_next(self):
+        """
+        Claim and run one job
+
+        Returns:
+            bool: True if a job was run, False if the queue had nothing runnable
+        """
+        job = self._claim()
+        if job is None:
+            return False
+
+        start_time = time.time()
+        handler = self._handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind: {job['kind']}")
+            result = handler(job["payload"])
+        except Exception as e:
+            print(f"Job {job['id']} ({job['kind']}) attempt {job['attempt']} failed: {str(e)}")
+            self._finish(job, error=str(e))
+        else:
+            self._finish(job, result=result)
+        finally:
+            self._count("total_run_time", time.time() - start_time)
+        return True
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_next():
+                    continue
+            except Exception as e:
+                print(f"Job worker error: {str(e)}")
+            self._wakeup.wait(JOB_POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def start(self):
+        """Purge expired jobs and start the worker threads"""
+        if self._threads:
+            return
+        # Identify the process that actually runs the workers (after any fork)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.purge_expired()
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self, timeout=5.0):
+        """Stop the worker threads (running jobs finish or are retried after their lease)"""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def get(self, job_id):
+        """
+        Get a job's status, and its result once finished
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            dict: Job record
+
+        Raises:
+            JobNotFoundError: If the job doesn't exist
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, user_id, priority, status, result, error, attempts, max_attempts, "
+                "created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            raise JobNotFoundError(job_id)
+
+        priority_names = {value: name for name, value in PRIORITIES.items()}
+        return {
+            "job_id": row[0],
+            "kind": row[1],
+            "user_id": row[2],
+            "priority": priority_names.get(row[3], row[3]),
+            "status": row[4],
+            "result": json.loads(row[5]) if row[5] else None,
+            "error": row[6],
+            "attempts": row[7],
+            "max_attempts": row[8],
+            "created_at": row[9],
+            "started_at": row[10],
+            "finished_at": row[11],
+        }
+
+    def purge_expired(self, ttl=JOB_RESULT_TTL):
+        """Delete finished jobs older than ttl seconds"""
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (SUCCEEDED, FAILED, time.time() - ttl)
+            )
+
+    def stats(self):
+        """
+        Get queue metrics
+
+        Returns:
+            dict: Queue depth per lane, job counts per status and worker counters
+        """
+        with self._connect() as conn:
+            by_status = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            by_lane = dict(conn.execute(
+                "SELECT priority, COUNT(*) FROM jobs WHERE status = ? GROUP BY priority", (QUEUED,)
+            ).fetchall())
+
+        with self._stats_lock:
+            stats = dict(self._stats)
+        finished = stats["succeeded"] + stats["failed"] + stats["retried"]
+        started = finished + by_status.get(RUNNING, 0)
+        stats.update({
+            "workers": len(self._threads),
+            "queue_depth": by_status.get(QUEUED, 0),
+            "queue_depth_by_lane": {name: by_lane.get(value, 0) for name, value in PRIORITIES.items()},
+            "jobs_by_status": by_status,
+            "avg_wait_time": stats.pop("total_wait_time") / started if started else 0.0,
+            "avg_run_time": stats.pop("total_run_time") / finished if finished else 0.0,
+        })
+        return stats
+
+
+# Shared queue for the API
+job_queue = JobQueue()
@@ -0,0 +1,184 @@
+"""
+Model Registry Module for VocalGuard
+
+This module keeps a single warm instance of every detection model per process.
+Models are keyed by (kind, path, version, device) so that the expensive
+from_pretrained/safetensors load happens once, and every later request gets a
+ready-to-use detector. Load time and resident memory are recorded per model.
+"""
+
+import os
+import threading
+import time
+
+# Fallback page size for /proc/self/statm parsing
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss_bytes():
+    """
+    Get the resident set size of the current process
+
+    Returns:
+        int: Resident memory in bytes (0 if it can't be determined)
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except Exception:
+        pass
+
+    try:
+        import resource
+        # ru_maxrss is the peak RSS in kilobytes on Linux (bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+def _parameter_bytes(model):
+    """
+    Estimate the memory held by the torch parameters and buffers of a loaded model
+
+    Args:
+        model: Loaded detector (any object holding torch modules as attributes)
+
+    Returns:
+        int: Number of bytes held by parameters and buffers
+    """
+    try:
+        import torch.nn as nn
+    except ImportError:
+        return 0
+
+    modules = [model] if isinstance(model, nn.Module) else [
+        value for value in vars(model).values() if isinstance(value, nn.Module)
+    ]
+
+    seen = set()
+    total = 0
+    for module in modules:
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            if id(tensor) in seen:
+                continue
+            seen.add(id(tensor))
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    """Process-wide registry of loaded models"""
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    @staticmethod
+    def make_key(kind, model_path, version, device):
+        """
+        Build the registry key for a model
+
+        Args:
+            kind: Model kind (e.g. "wav2vec2", "transformer")
+            model_path: Path to the model directory
+            version: Model version string
+            device: torch device or device name
+
+        Returns:
+            tuple: Hashable registry key
+        """
+        path = os.path.abspath(model_path) if model_path else None
+        return (kind, path, str(version), str(device))
+
+    def get_or_load(self, key, loader):
+        """
+        Return the model stored under key, loading it on first use
+
+        Concurrent callers asking for the same key wait for a single load
+        instead of loading the model several times.
+
+        Args:
+            key: Registry key (see make_key)
+            loader: Zero-argument callable that builds the model
+
+        Returns:
+            The loaded model
+        """
+        model = self._models.get(key)
+        if model is not None:
+            self._stats[key]["hits"] += 1
+            return model
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._stats[key]["hits"] += 1
+                return model
+
+            rss_before = current_rss_bytes()
+            start_time = time.time()
+            model = loader()
+            load_time = (time.time() - start_time) * 1000  # ms
+            rss_after = current_rss_bytes()
+
+            self._stats[key] = {
+                "kind": key[0],
+                "model_path": key[1],
+                "version": key[2],
+                "device": key[3],
+                "load_time_ms": load_time,
+                "rss_delta_bytes": max(0, rss_after - rss_before),
+                "parameter_bytes": _parameter_bytes(model),
+                "loaded_at": time.time(),
+                "hits": 0,
+            }
+            self._models[key] = model
+            print(f"Loaded {key[0]} model in {load_time:.1f} ms "
+                  f"(RSS +{self._stats[key]['rss_delta_bytes'] / 1e6:.1f} MB)")
+            return model
+
+    def is_loaded(self, key):
+        """Check whether a model is already loaded"""
+        return key in self._models
+
+    def evict(self, key):
+        """
+        Drop a model from the registry
+
+        Args:
+            key: Registry key
+
+        Returns:
+            bool: True if a model was removed
+        """
+        with self._lock:
+            self._stats.pop(key, None)
+            return self._models.pop(key, None) is not None
+
+    def clear(self):
+        """Drop every loaded model"""
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+
+    def stats(self):
+        """
+        Report load time and memory for every loaded model
+
+        Returns:
+            dict: Per-model statistics and current process RSS
+        """
+        return {
+            "process_rss_bytes": current_rss_bytes(),
+            "models": [dict(stat) for stat in self._stats.values()],
+        }
+
+
+# Shared registry for the whole process
+model_registry = ModelRegistry()
@@ -0,0 +1,169 @@
+"""
+Pre-fork Server Module for VocalGuard
+
+This module runs several uvicorn worker processes that share one copy of the
+model weights. The parent process loads the detection models into the model
+registry, freezes the garbage collector's view of them and then forks the
+workers. Tensor storage is never written during inference, so its pages stay
+shared copy-on-write and total RSS grows by the per-worker overhead instead of
+by one model copy per worker.
+
+Every worker gets its own share of the torch intra-op threads and, optionally,
+its own group of CPU cores.
+"""
+
+import gc
+import os
+import signal
+import socket
+import time
+
+# Pre-fork configuration
+WORKERS = int(os.getenv("VOCALGUARD_WORKERS", "1"))
+THREADS_PER_WORKER = int(os.getenv("VOCALGUARD_THREADS_PER_WORKER", "0"))  # 0 = cpu_count / workers
+WORKER_AFFINITY = os.getenv("VOCALGUARD_WORKER_AFFINITY", "false").lower() in ("1", "true", "yes")
+RESTART_DELAY = 1.0  # seconds before a crashed worker is replaced
+
+
+def _available_cores():
+    """CPU cores this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_core_groups(workers, threads_per_worker=THREADS_PER_WORKER):
+    """
+    Split the available cores into one group per worker
+
+    Args:
+        workers: Number of worker processes
+        threads_per_worker: Threads per worker (0 to divide the cores evenly)
+
+    Returns:
+        list: One list of core ids per worker
+    """
+    cores = _available_cores()
+    per_worker = threads_per_worker or max(1, len(cores) // workers)
+    return [
+        [cores[(index * per_worker + offset) % len(cores)] for offset in range(per_worker)]
+        for index in range(workers)
+    ]
+
+
+def _bind_socket(host, port):
+    """Create the listening socket shared by every worker"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock, cores, pin_cores, uvicorn_kwargs):
+    """Body of a forked worker: limit its threads and serve requests on the shared socket"""
+    import torch
+    import uvicorn
+
+    if pin_cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already fixed once inter-op work has started
+        pass
+
+    # Default signal handling so uvicorn can install its own
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    config = uvicorn.Config(app, **uvicorn_kwargs)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def serve(app, host="0.0.0.0", port=8000, workers=WORKERS, preload=None,
+          threads_per_worker=THREADS_PER_WORKER, pin_cores=WORKER_AFFINITY, **uvicorn_kwargs):
+    """
+    Load models once, then fork workers that serve app on a shared socket
+
+    The parent only loads weights; it must not run a forward pass, start the
+    micro-batching thread or open gRPC channels (e.g. a Firestore client)
+    before forking, since none of these survive fork.
+
+    Args:
+        app: ASGI application
+        host: Interface to bind
+        port: Port to bind
+        workers: Number of worker processes
+        preload: Zero-argument callable that loads the models into the registry
+        threads_per_worker: torch intra-op threads per worker (0 = cpu_count / workers)
+        pin_cores: Pin every worker to its own group of cores
+        **uvicorn_kwargs: Extra uvicorn.Config arguments (log_level, ...)
+    """
+    if preload is not None:
+        import torch
+        # A single-threaded parent never starts an OpenMP pool, which would not survive fork
+        torch.set_num_threads(1)
+        start_time = time.time()
+        preload()
+        print(f"Preloaded models in {time.time() - start_time:.1f} s, forking {workers} workers")
+
+    # Move every object created so far to the permanent generation so the
+    # collector doesn't touch (and copy) their pages in the workers
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind_socket(host, port)
+    core_groups = plan_core_groups(workers, threads_per_worker)
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                _run_worker(app, sock, core_groups[index], pin_cores, uvicorn_kwargs)
+            except BaseException as e:
+                print(f"Worker {index} failed: {e}")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children[pid] = index
+        print(f"Started worker {index} (pid {pid}) with {len(core_groups[index])} threads")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for index in range(workers):
+        spawn(index)
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            index = children.pop(pid, None)
+            if index is None or stopping:
+                continue
+            print(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(RESTART_DELAY)
+            spawn(index)
+    finally:
+        sock.close()
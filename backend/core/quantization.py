@@ -0,0 +1,228 @@
+"""
+Quantization Module for VocalGuard
+
+This module provides an opt-in INT8 engine for CPU-only nodes. The Linear layers
+of the Wav2Vec2 classification model (DeepfakeAudioDetector) and of the
+AudioTransformer are converted with PyTorch dynamic quantization: weights are
+stored as int8 and activations are quantized on the fly, so no calibration data
+is needed. Quantized detectors are built once from the warm fp32 detectors and
+cached in the model registry under their own precision key.
+
+Running this module as a script writes an accuracy-parity report of the INT8
+models against fp32 on backend/data/data/{real,fake}.
+"""
+
+import copy
+import json
+import os
+import time
+
+import torch
+import torch.nn as nn
+
+# Supported inference precisions
+PRECISIONS = ("fp32", "int8")
+DEFAULT_PRECISION = os.getenv("VOCALGUARD_PRECISION", "fp32").lower()
+
+# Dynamic INT8 quantization only runs on CPU
+QUANTIZED_DEVICE = torch.device("cpu")
+
+
+def resolve_precision(precision=None):
+    """
+    Validate a requested precision, falling back to VOCALGUARD_PRECISION
+
+    Args:
+        precision: "fp32", "int8" or None for the configured default
+
+    Returns:
+        str: The precision to use
+
+    Raises:
+        ValueError: If the precision is not supported
+    """
+    precision = (precision or DEFAULT_PRECISION).lower()
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unsupported precision '{precision}', expected one of {', '.join(PRECISIONS)}")
+    return precision
+
+
+def model_version_for(model_version, precision):
+    """Model version string that keeps cached/stored verdicts of each precision apart"""
+    return model_version if precision == "fp32" else f"{model_version}-{precision}"
+
+
+def _select_quantized_engine():
+    """Pick a quantized kernel backend available on this CPU"""
+    engines = torch.backends.quantized.supported_engines
+    if torch.backends.quantized.engine not in engines or torch.backends.quantized.engine == "none":
+        for engine in ("x86", "fbgemm", "qnnpack"):
+            if engine in engines:
+                torch.backends.quantized.engine = engine
+                break
+
+
+def quantize_linear_layers(module):
+    """
+    Return an INT8 copy of a module with every nn.Linear dynamically quantized
+
+    Args:
+        module: fp32 torch module (left untouched)
+
+    Returns:
+        torch.nn.Module: Quantized copy on the CPU
+    """
+    _select_quantized_engine()
+    module = copy.deepcopy(module).to(QUANTIZED_DEVICE).eval()
+    return torch.quantization.quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def quantize_detector(detector):
+    """
+    Build an INT8 DeepfakeAudioDetector from a loaded fp32 one
+
+    The feature extractor and labels are shared; only the model is copied.
+
+    Args:
+        detector: fp32 DeepfakeAudioDetector
+
+    Returns:
+        DeepfakeAudioDetector: Detector running the quantized model on the CPU
+    """
+    quantized = copy.copy(detector)
+    quantized.model = quantize_linear_layers(detector.model)
+    quantized.compiled = None
+    quantized.device = QUANTIZED_DEVICE
+    quantized.precision = "int8"
+    return quantized
+
+
+def quantize_transformer_detector(detector, base_model):
+    """
+    Build an INT8 TransformerDeepfakeDetector from a loaded fp32 one
+
+    Args:
+        detector: fp32 TransformerDeepfakeDetector
+        base_model: Already quantized Wav2Vec2 model to share (from quantize_detector)
+
+    Returns:
+        TransformerDeepfakeDetector: Detector running the quantized AudioTransformer on the CPU
+    """
+    quantized = copy.copy(detector)
+    quantized.base_model = base_model
+    quantized.transformer_model = quantize_linear_layers(detector.transformer_model)
+    quantized.compiled_model = None
+    quantized.device = QUANTIZED_DEVICE
+    quantized.precision = "int8"
+    return quantized
+
+
+def _list_labelled_files(data_dir, max_files_per_class=None):
+    """List (path, is_fake) pairs from the real/ and fake/ subdirectories"""
+    files = []
+    for label in ("real", "fake"):
+        class_dir = os.path.join(data_dir, label)
+        if not os.path.isdir(class_dir):
+            continue
+        names = sorted(name for name in os.listdir(class_dir) if not name.startswith("."))
+        if max_files_per_class:
+            names = names[:max_files_per_class]
+        files.extend((os.path.join(class_dir, name), label == "fake") for name in names)
+    return files
+
+
+def _fake_probability(result):
+    return float(result.get("probabilities", {}).get("fake", 0.0))
+
+
+def _compare(name, files, run_fp32, run_int8):
+    """Run both precisions over the files and summarise accuracy, agreement and speed"""
+    stats = {"fp32": {"correct": 0, "seconds": 0.0}, "int8": {"correct": 0, "seconds": 0.0}}
+    agreements = 0
+    differences = []
+
+    for path, is_fake in files:
+        results = {}
+        for precision, run in (("fp32", run_fp32), ("int8", run_int8)):
+            start_time = time.time()
+            results[precision] = run(path)
+            stats[precision]["seconds"] += time.time() - start_time
+            stats[precision]["correct"] += int(bool(results[precision].get("is_fake")) == is_fake)
+
+        agreements += int(results["fp32"].get("is_fake") == results["int8"].get("is_fake"))
+        differences.append(abs(_fake_probability(results["fp32"]) - _fake_probability(results["int8"])))
+
+    count = len(files)
+    report = {"model": name, "files": count}
+    for precision, values in stats.items():
+        report[precision] = {
+            "accuracy": values["correct"] / count if count else 0.0,
+            "clips_per_second": count / values["seconds"] if values["seconds"] else 0.0,
+        }
+    report["prediction_agreement"] = agreements / count if count else 0.0
+    report["mean_abs_probability_diff"] = sum(differences) / count if count else 0.0
+    report["max_abs_probability_diff"] = max(differences) if differences else 0.0
+    report["speedup"] = (report["int8"]["clips_per_second"] / report["fp32"]["clips_per_second"]
+                         if report["fp32"]["clips_per_second"] else 0.0)
+    return report
+
+
+def run_parity_report(data_dir, model_path=None, max_files_per_class=None, results_path=None):
+    """
+    Compare the INT8 detectors against fp32 on a labelled data directory
+
+    Args:
+        data_dir: Directory with real/ and fake/ audio subdirectories
+        model_path: Path to the model directory (default: the detection model)
+        max_files_per_class: Optional limit of files per class
+        results_path: Optional JSON file to write the report to
+
+    Returns:
+        dict: Accuracy, prediction agreement, probability drift and throughput per model
+    """
+    # Imported here to avoid a circular import with the detection pipeline
+    from core.detect_deepfake import MODEL_DIR, get_detector, get_transformer_detector
+    from core.audio_context import AudioContext
+
+    model_path = model_path or MODEL_DIR
+    files = _list_labelled_files(data_dir, max_files_per_class)
+    if not files:
+        raise ValueError(f"No audio files found in {data_dir}/real or {data_dir}/fake")
+
+    # fp32 runs on the CPU as well so the speedup compares the same hardware
+    detectors = {precision: get_detector(model_path, QUANTIZED_DEVICE, precision) for precision in PRECISIONS}
+    transformers = {precision: get_transformer_detector(model_path, QUANTIZED_DEVICE, precision)
+                    for precision in PRECISIONS}
+
+    report = {
+        "data_dir": data_dir,
+        "torch_threads": torch.get_num_threads(),
+        "quantized_engine": torch.backends.quantized.engine,
+        "models": [
+            _compare("wav2vec2", files,
+                     lambda path: detectors["fp32"].detect(AudioContext(path)),
+                     lambda path: detectors["int8"].detect(AudioContext(path))),
+            _compare("transformer", files,
+                     lambda path: transformers["fp32"].detect(AudioContext(path)),
+                     lambda path: transformers["int8"].detect(AudioContext(path))),
+        ],
+    }
+
+    if results_path:
+        os.makedirs(os.path.dirname(results_path), exist_ok=True)
+        with open(results_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "data")
+    results_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "results",
+                                "quantization_parity.json")
+
+    print(json.dumps(run_parity_report(data_dir, results_path=results_path), indent=2))
+    print(f"Parity report saved to {results_path}")
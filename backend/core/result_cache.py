@@ -0,0 +1,266 @@
+"""
+Result Cache Module for VocalGuard
+
+This module caches detection verdicts keyed by the SHA-256 of the audio bytes,
+the model version and the analysis type, so re-uploads of the same clip are
+answered without running inference. Two backends are provided: an in-memory
+LRU (per process) and an SQLite file in the cache directory that several
+uvicorn workers can share. Both evict least-recently-used entries and expire
+entries after a TTL.
+"""
+
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Cache configuration
+RESULT_CACHE_BACKEND = os.getenv("VOCALGUARD_RESULT_CACHE", "memory").lower()  # "memory", "disk" or "off"
+RESULT_CACHE_SIZE = int(os.getenv("VOCALGUARD_RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.getenv("VOCALGUARD_RESULT_CACHE_TTL", str(24 * 3600)))  # seconds
+
+# Cache directory (shared with the other on-disk caches)
+_cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
+_cache_file = os.path.join(_cache_dir, "result_cache.sqlite3")
+
+
+def make_cache_key(content_hash, model_version, analysis_type, options=None):
+    """
+    Build the cache key for a verdict
+
+    Args:
+        content_hash: SHA-256 hex digest of the audio bytes
+        model_version: Version of the model that produced the verdict
+        analysis_type: Type of analysis ("standard", "advanced", "demo", ...)
+        options: Pipeline settings that change the verdict (windowing, attention
+            payload, ...); folded into the model version component
+
+    Returns:
+        str: Cache key
+    """
+    if options:
+        model_version = f"{model_version}+" + ",".join(f"{name}={options[name]}" for name in sorted(options))
+    return f"{content_hash}:{model_version}:{analysis_type}"
+
+
+class ResultCache(abc.ABC):
+    """Base class with hit/miss accounting shared by the backends"""
+
+    backend = "base"
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of cached verdicts
+            ttl: Time to live of an entry in seconds (None or 0 to disable)
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0}
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _is_expired(self, created_at, now):
+        return bool(self.ttl) and now - created_at > self.ttl
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set(self, key, value):
+        """Store a JSON-serialisable value under key"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def clear(self):
+        """Remove every entry"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def __len__(self):
+        raise NotImplementedError
+
+    def __bool__(self):
+        # An empty cache is still enabled (None means caching is off)
+        return True
+
+    def stats(self):
+        """
+        Get cache statistics
+
+        Returns:
+            dict: Hit/miss counters, hit rate and size
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "backend": self.backend,
+            "size": len(self),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+        })
+        return stats
+
+
+class MemoryResultCache(ResultCache):
+    """In-process LRU cache with TTL"""
+
+    backend = "memory"
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL):
+        super().__init__(max_entries, ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry[0], now):
+                del self._entries[key]
+                self._count("expirations")
+                entry = None
+            if entry is None:
+                self._count("misses")
+                return None
+            self._entries.move_to_end(key)
+        self._count("hits")
+        # Hand out a copy so callers can't mutate the cached verdict
+        return json.loads(entry[1])
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), json.dumps(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._count("evictions")
+        self._count("sets")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskResultCache(ResultCache):
+    """SQLite-backed LRU cache with TTL, shared by every process using the same file"""
+
+    backend = "disk"
+
+    def __init__(self, path=_cache_file, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL):
+        """
+        Initialize the cache
+
+        Args:
+            path: Path to the SQLite database file
+            max_entries: Maximum number of cached verdicts
+            ttl: Time to live of an entry in seconds (None or 0 to disable)
+        """
+        super().__init__(max_entries, ttl)
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_verdicts_accessed ON verdicts (accessed_at)")
+
+    def _connect(self):
+        # One short-lived connection per call keeps this safe across threads and processes
+        return sqlite3.connect(self.path, timeout=5.0)
+
+    def get(self, key):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM verdicts WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and self._is_expired(row[1], now):
+                    conn.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+                    self._count("expirations")
+                    row = None
+                if row is None:
+                    self._count("misses")
+                    return None
+                conn.execute("UPDATE verdicts SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"Error reading result cache: {e}")
+            self._count("misses")
+            return None
+        self._count("hits")
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO verdicts (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now)
+                )
+                overflow = conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM verdicts WHERE key IN "
+                        "(SELECT key FROM verdicts ORDER BY accessed_at ASC LIMIT ?)",
+                        (overflow,)
+                    )
+                    self._count("evictions", overflow)
+        except sqlite3.Error as e:
+            print(f"Error writing result cache: {e}")
+            return
+        self._count("sets")
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM verdicts")
+
+    def __len__(self):
+        try:
+            with self._connect() as conn:
+                return conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+
+def create_result_cache(backend=RESULT_CACHE_BACKEND, **kwargs):
+    """
+    Create a result cache for the configured backend
+
+    Args:
+        backend: "memory", "disk" or "off"
+        **kwargs: Backend arguments (max_entries, ttl, path)
+
+    Returns:
+        ResultCache or None: The cache, or None when caching is disabled
+    """
+    if backend in ("off", "none", "false", "0"):
+        return None
+    if backend == "disk":
+        return DiskResultCache(**kwargs)
+    if backend == "memory":
+        return MemoryResultCache(**kwargs)
+    raise ValueError(f"Unknown result cache backend: {backend}")
+
+
+# Shared cache for the detection pipeline
+result_cache = create_result_cache()
@@ -0,0 +1,318 @@
+"""
+Streaming Detection Module for VocalGuard
+
+This module supports real-time detection on live audio (e.g. a phone call)
+sent over a WebSocket. Incoming PCM frames are written to a rolling buffer that
+holds the most recent window of audio; every update interval the latest window
+is run through the DeepfakeAudioDetector and an incremental fake probability is
+pushed back to the client.
+
+Backpressure: at most one inference per connection is in flight. Updates that
+become due while it runs are coalesced into the next one (always on the newest
+audio), and the rolling buffer only keeps one window, so a slow model never
+builds up a backlog. Every connection also has a cap on total compute time.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+from core.executor import ExecutorSaturatedError
+
+# Streaming configuration
+STREAM_WINDOW_SECONDS = float(os.getenv("VOCALGUARD_STREAM_WINDOW_SECONDS", "4"))
+STREAM_MIN_AUDIO_SECONDS = float(os.getenv("VOCALGUARD_STREAM_MIN_AUDIO_SECONDS", "1"))
+STREAM_UPDATE_MS = int(os.getenv("VOCALGUARD_STREAM_UPDATE_MS", "500"))
+STREAM_MIN_UPDATE_MS = int(os.getenv("VOCALGUARD_STREAM_MIN_UPDATE_MS", "200"))
+STREAM_MAX_COMPUTE_SECONDS = float(os.getenv("VOCALGUARD_STREAM_MAX_COMPUTE_SECONDS", "300"))
+STREAM_MAX_FRAME_BYTES = int(os.getenv("VOCALGUARD_STREAM_MAX_FRAME_KB", "256")) * 1024
+
+# Supported PCM encodings and their numpy dtypes
+STREAM_ENCODINGS = {
+    "pcm_s16le": np.dtype("<i2"),
+    "pcm_f32le": np.dtype("<f4"),
+}
+
+# Weight of the newest window in the smoothed fake probability
+SMOOTHING_FACTOR = 0.3
+
+
+class StreamConfigError(ValueError):
+    """Raised for unsupported stream parameters"""
+
+
+class ComputeBudgetExceeded(RuntimeError):
+    """Raised when a connection has used up its compute budget"""
+
+
+class RollingAudioBuffer:
+    """Fixed-size ring buffer holding the most recent samples"""
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._buffer = np.zeros(self.capacity, dtype=np.float32)
+        self._write_pos = 0
+        self._filled = 0
+
+    def append(self, samples):
+        """Append samples, overwriting the oldest ones when full"""
+        samples = samples[-self.capacity:]
+        n = len(samples)
+        end = self._write_pos + n
+        if end <= self.capacity:
+            self._buffer[self._write_pos:end] = samples
+        else:
+            split = self.capacity - self._write_pos
+            self._buffer[self._write_pos:] = samples[:split]
+            self._buffer[:n - split] = samples[split:]
+        self._write_pos = end % self.capacity
+        self._filled = min(self.capacity, self._filled + n)
+
+    def snapshot(self):
+        """Return the buffered samples in chronological order"""
+        if self._filled < self.capacity:
+            return self._buffer[:self._filled].copy()
+        return np.concatenate((self._buffer[self._write_pos:], self._buffer[:self._write_pos]))
+
+    def __len__(self):
+        return self._filled
+
+
+def infer_window(window, sample_rate, precision=None):
+    """
+    Run the Wav2Vec2 detector on one window of streamed audio
+
+    Defined at module level so it can run on the shared inference executor in
+    both thread and process mode.
+
+    Args:
+        window: float32 mono samples at sample_rate
+        sample_rate: Sample rate of the window
+        precision: "fp32" or "int8" (default: VOCALGUARD_PRECISION)
+
+    Returns:
+        dict: fake_probability, probabilities and compute_ms
+    """
+    import torch
+    import librosa
+    from core.detect_deepfake import get_detector
+
+    start_time = time.time()
+    if sample_rate != 16000:
+        window = librosa.resample(window, orig_sr=sample_rate, target_sr=16000)
+
+    detector = get_detector(precision=precision)
+    probabilities = torch.nn.functional.softmax(detector.forward_logits([window]), dim=1)[0]
+    fake_index = next((i for i, label in detector.id2label.items() if label == "fake"), len(probabilities) - 1)
+
+    return {
+        "fake_probability": float(probabilities[fake_index]),
+        "probabilities": {detector.id2label[i]: float(p) for i, p in enumerate(probabilities)},
+        "compute_ms": (time.time() - start_time) * 1000,
+    }
+
+
+class StreamingDetectionSession:
+    """State of one streaming detection connection"""
+
+    def __init__(self, sample_rate=16000, encoding="pcm_s16le", update_ms=STREAM_UPDATE_MS,
+                 window_seconds=STREAM_WINDOW_SECONDS, max_compute_seconds=STREAM_MAX_COMPUTE_SECONDS,
+                 threshold=0.5):
+        """
+        Initialize the session
+
+        Args:
+            sample_rate: Sample rate of the incoming audio
+            encoding: "pcm_s16le" or "pcm_f32le" (mono)
+            update_ms: Interval of audio between probability updates in milliseconds
+            window_seconds: Length of the analysed rolling window in seconds
+            max_compute_seconds: Total inference time allowed for this connection
+            threshold: Fake probability above which audio is flagged as fake
+        """
+        if encoding not in STREAM_ENCODINGS:
+            raise StreamConfigError(
+                f"Unsupported encoding '{encoding}', expected one of {sorted(STREAM_ENCODINGS)}"
+            )
+        if not 8000 <= int(sample_rate) <= 48000:
+            raise StreamConfigError("sample_rate must be between 8000 and 48000")
+
+        self.sample_rate = int(sample_rate)
+        self.encoding = encoding
+        self.dtype = STREAM_ENCODINGS[encoding]
+        self.update_samples = int(self.sample_rate * max(update_ms, STREAM_MIN_UPDATE_MS) / 1000)
+        self.min_samples = int(self.sample_rate * STREAM_MIN_AUDIO_SECONDS)
+        self.window_seconds = window_seconds
+        self.max_compute_seconds = max_compute_seconds
+        self.threshold = threshold
+
+        self.buffer = RollingAudioBuffer(self.sample_rate * window_seconds)
+        self._pending_bytes = b""
+        self.samples_received = 0
+        self.samples_since_update = 0
+        self.compute_seconds = 0.0
+        self.updates_sent = 0
+        self.updates_coalesced = 0
+        self.smoothed_probability = None
+        self.last_result = None
+        self.inference_task = None
+
+    def feed(self, data):
+        """
+        Add a binary frame of PCM audio to the rolling buffer
+
+        Args:
+            data: Raw little-endian PCM bytes
+        """
+        data = self._pending_bytes + data
+        usable = len(data) - len(data) % self.dtype.itemsize
+        self._pending_bytes = data[usable:]
+        if not usable:
+            return
+
+        samples = np.frombuffer(data[:usable], dtype=self.dtype)
+        if self.dtype.kind == "i":
+            samples = samples.astype(np.float32) / 32768.0
+        else:
+            samples = samples.astype(np.float32)
+
+        self.buffer.append(samples)
+        self.samples_received += len(samples)
+        self.samples_since_update += len(samples)
+
+    @property
+    def update_due(self):
+        """Whether enough new audio arrived for the next update"""
+        return len(self.buffer) >= self.min_samples and self.samples_since_update >= self.update_samples
+
+    @property
+    def inference_running(self):
+        return self.inference_task is not None and not self.inference_task.done()
+
+    def take_window(self):
+        """Take the newest window for inference and reset the update counter"""
+        self.samples_since_update = 0
+        return self.buffer.snapshot()
+
+    def record_result(self, window_result):
+        """
+        Account for a finished inference and build the update message
+
+        Args:
+            window_result: Result from infer_window
+
+        Returns:
+            dict: Update message for the client
+
+        Raises:
+            ComputeBudgetExceeded: If the connection used up its compute budget
+        """
+        self.compute_seconds += window_result["compute_ms"] / 1000.0
+
+        probability = window_result["fake_probability"]
+        if self.smoothed_probability is None:
+            self.smoothed_probability = probability
+        else:
+            self.smoothed_probability = (SMOOTHING_FACTOR * probability +
+                                         (1 - SMOOTHING_FACTOR) * self.smoothed_probability)
+        self.updates_sent += 1
+
+        self.last_result = {
+            "type": "update",
+            "fake_probability": probability,
+            "smoothed_fake_probability": self.smoothed_probability,
+            "is_fake": self.smoothed_probability > self.threshold,
+            "probabilities": window_result["probabilities"],
+            "audio_seconds": self.samples_received / self.sample_rate,
+            "window_seconds": len(self.buffer) / self.sample_rate,
+            "compute_ms": window_result["compute_ms"],
+            "compute_seconds_used": self.compute_seconds,
+            "updates_coalesced": self.updates_coalesced,
+        }
+
+        if self.max_compute_seconds and self.compute_seconds > self.max_compute_seconds:
+            raise ComputeBudgetExceeded(
+                f"Compute budget of {self.max_compute_seconds:.0f} s for this connection is exhausted"
+            )
+        return self.last_result
+
+    def summary(self):
+        """Final message sent when the stream ends"""
+        return {
+            "type": "final",
+            "fake_probability": self.last_result["fake_probability"] if self.last_result else None,
+            "smoothed_fake_probability": self.smoothed_probability,
+            "is_fake": (self.smoothed_probability > self.threshold
+                        if self.smoothed_probability is not None else None),
+            "audio_seconds": self.samples_received / self.sample_rate,
+            "updates_sent": self.updates_sent,
+            "updates_coalesced": self.updates_coalesced,
+            "compute_seconds_used": self.compute_seconds,
+        }
+
+
+def _is_stop_message(text):
+    """Whether a text frame asks to end the stream ("stop" or {"type": "stop"})"""
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return text.strip().lower() == "stop"
+    return isinstance(payload, dict) and payload.get("type") == "stop"
+
+
+async def run_streaming_session(websocket, session, run_inference):
+    """
+    Drive a streaming session: receive audio, schedule inferences and push updates
+
+    Args:
+        websocket: Accepted Starlette WebSocket
+        session: StreamingDetectionSession
+        run_inference: Coroutine function (window, sample_rate) -> infer_window result,
+            e.g. the shared inference executor's run bound to infer_window
+    """
+    async def infer_and_send(window):
+        try:
+            window_result = await run_inference(window, session.sample_rate)
+            await websocket.send_json(session.record_result(window_result))
+        except ExecutorSaturatedError:
+            # Server-wide backpressure: drop this update, the next one retries on newer audio
+            session.updates_coalesced += 1
+        except ComputeBudgetExceeded as e:
+            await websocket.send_json({"type": "error", "error": str(e)})
+            await websocket.close(code=1008)
+        except Exception as e:
+            print(f"Error in streaming inference: {str(e)}")
+            await websocket.send_json({"type": "error", "error": f"Inference failed: {str(e)}"})
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes") is not None:
+                frame = message["bytes"]
+                if len(frame) > STREAM_MAX_FRAME_BYTES:
+                    await websocket.send_json({"type": "error", "error": "Audio frame too large"})
+                    await websocket.close(code=1009)
+                    break
+                session.feed(frame)
+            elif message.get("text") is not None and _is_stop_message(message["text"]):
+                if session.inference_task is not None:
+                    await session.inference_task
+                await websocket.send_json(session.summary())
+                await websocket.close()
+                break
+
+            if session.update_due:
+                if session.inference_running:
+                    # Backpressure: skip this update, the next one uses the newest audio
+                    session.updates_coalesced += 1
+                    session.samples_since_update = 0
+                else:
+                    session.inference_task = asyncio.create_task(infer_and_send(session.take_window()))
+    finally:
+        if session.inference_running:
+            session.inference_task.cancel()
@@ -0,0 +1,234 @@
+"""
+Upload Ingestion Module for VocalGuard
+
+This module streams uploaded files to disk in fixed-size chunks instead of
+reading them into memory with `await file.read()`. While streaming it computes
+the SHA-256 of the content and enforces a maximum size; once the file is on disk
+its duration is checked from the container header. Peak memory per upload
+therefore stays at one chunk regardless of the file size, and hashing and disk
+writes run in the threadpool instead of on the event loop.
+
+RequestSizeLimitMiddleware enforces the size limit before the endpoint runs:
+a declared Content-Length above the limit is refused at once, and a body that
+grows past it is cut off while it is still arriving, so an oversized upload is
+never fully received and spooled by the multipart parser.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from core.audio_metadata import probe_audio_metadata
+
+# Upload limits
+MAX_UPLOAD_BYTES = int(float(os.getenv("VOCALGUARD_MAX_UPLOAD_MB", "200")) * 1024 * 1024)
+MAX_UPLOAD_SECONDS = float(os.getenv("VOCALGUARD_MAX_UPLOAD_SECONDS", "3600"))
+UPLOAD_CHUNK_SIZE = int(os.getenv("VOCALGUARD_UPLOAD_CHUNK_KB", "1024")) * 1024
+
+# Multipart boundaries, headers and form fields sent along with the file
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+# Directory for spooled uploads (default: system temp dir)
+UPLOAD_DIR = os.getenv("VOCALGUARD_UPLOAD_DIR") or None
+
+
+class UploadRejectedError(Exception):
+    """Raised when an upload exceeds the configured limits"""
+
+    def __init__(self, message, status_code=413):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class SpooledUpload:
+    """An upload written to disk, with its size and content hash"""
+
+    def __init__(self, path, filename, size, sha256, content_type=None):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self.content_type = content_type
+
+    def cleanup(self):
+        """Delete the spooled file"""
+        try:
+            if self.path and os.path.exists(self.path):
+                os.unlink(self.path)
+        except (OSError, FileNotFoundError):
+            # File already deleted or doesn't exist
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+
+
+def _size_error(max_bytes):
+    return f"Upload exceeds the maximum size of {max_bytes // (1024 * 1024)} MB"
+
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware that rejects request bodies above a size limit with 413
+
+    Args:
+        app: The ASGI app
+        max_bytes: Limit for every request body (None to disable)
+        path_limits: Per-path limits overriding max_bytes (e.g. for batch uploads)
+    """
+
+    def __init__(self, app, max_bytes=MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES, path_limits=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self.path_limits.get(scope["path"], self.max_bytes)
+        if not limit:
+            await self.app(scope, receive, send)
+            return
+
+        # Refuse before reading anything when the declared size is too large
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            await JSONResponse({"error": _size_error(limit)}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Stop reading; the app sees a disconnect and its response is replaced below
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if exceeded and not response_started:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded or response_started:
+                raise
+        if exceeded and not response_started:
+            await JSONResponse({"error": _size_error(limit)}, status_code=413)(scope, receive, send)
+
+
+def _write_chunk(temp_file, hasher, chunk):
+    hasher.update(chunk)
+    temp_file.write(chunk)
+
+
+async def write_chunks(chunks, filename, max_bytes=MAX_UPLOAD_BYTES, content_type=None):
+    """
+    Write an async iterator of byte chunks to a temporary file
+
+    Args:
+        chunks: Async iterator yielding bytes
+        filename: Original filename (its extension is kept for format detection)
+        max_bytes: Maximum allowed size in bytes (None to disable)
+        content_type: Content type reported by the client
+
+    Returns:
+        SpooledUpload: The file on disk
+
+    Raises:
+        UploadRejectedError: If the upload grows beyond max_bytes
+    """
+    suffix = os.path.splitext(filename or "")[1]
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=UPLOAD_DIR)
+    hasher = hashlib.sha256()
+    size = 0
+
+    try:
+        with temp_file:
+            async for chunk in chunks:
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadRejectedError(_size_error(max_bytes))
+                # Hash and write off the event loop
+                await run_in_threadpool(_write_chunk, temp_file, hasher, chunk)
+    except BaseException:
+        SpooledUpload(temp_file.name, filename, size, None).cleanup()
+        raise
+
+    return SpooledUpload(temp_file.name, filename, size, hasher.hexdigest(), content_type)
+
+
+async def _iter_upload(file, chunk_size):
+    """Yield an UploadFile's content in chunks"""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def check_duration(upload, max_seconds=MAX_UPLOAD_SECONDS):
+    """
+    Reject a spooled upload whose header reports a duration above the limit
+
+    Args:
+        upload: SpooledUpload to check
+        max_seconds: Maximum allowed duration in seconds (None to disable)
+
+    Raises:
+        UploadRejectedError: If the audio is longer than max_seconds
+    """
+    if not max_seconds:
+        return
+    metadata = await run_in_threadpool(probe_audio_metadata, upload.path, False)
+    if metadata.get("duration", 0) > max_seconds:
+        upload.cleanup()
+        raise UploadRejectedError(
+            f"Audio duration of {metadata['duration']:.0f} s exceeds the maximum of {max_seconds:.0f} s"
+        )
+
+
+async def ingest_upload(file, max_bytes=MAX_UPLOAD_BYTES, max_seconds=MAX_UPLOAD_SECONDS,
+                        chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Stream an UploadFile to disk while hashing it and enforcing size/duration limits
+
+    Args:
+        file: FastAPI UploadFile
+        max_bytes: Maximum allowed size in bytes (None to disable)
+        max_seconds: Maximum allowed duration in seconds (None to disable)
+        chunk_size: Size of each read in bytes
+
+    Returns:
+        SpooledUpload: The file on disk; call cleanup() (or use it as a context manager) when done
+
+    Raises:
+        UploadRejectedError: If the upload is too large or too long
+    """
+    # Reject early when the client-declared size is already too large
+    declared_size = getattr(file, "size", None)
+    if max_bytes and declared_size and declared_size > max_bytes:
+        raise UploadRejectedError(_size_error(max_bytes))
+
+    upload = await write_chunks(
+        _iter_upload(file, chunk_size), file.filename, max_bytes, getattr(file, "content_type", None)
+    )
+    await check_duration(upload, max_seconds)
+    return upload
@@ -1,16 +1,17 @@
 import os
 import sys
 import json
-import tempfile
-import requests
+import hmac
+import uuid
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from dotenv import load_dotenv
 
-from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, Form, Body
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, Form, Body, WebSocket, Query, Header
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
 
 # Add the parent directory to system path to enable relative imports
 current_dir = Path(__file__).parent
@@ -18,11 +19,29 @@ sys.path.insert(0, str(current_dir))
 
 # Import Firebase configuration and services
 from services.firebase_config import initialize_firebase
-from services.database_service import DatabaseService
+from services.database_service import DatabaseService, DEFAULT_HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE
+from services.persistence import analysis_writer
+from services.token_cache import token_verifier
+from services.identity_client import identity_client
 from firebase_admin import auth, firestore
 
 # Import deepfake detection functionality
-from core.detect_deepfake import detect_deepfake, detect_deepfake_ensemble
+from core.detect_deepfake import (
+    detect_deepfake, detect_deepfake_ensemble, get_detector, get_transformer_detector
+)
+from core.model_registry import model_registry
+from core.batching import scheduler_stats
+from core.executor import inference_executor, ExecutorSaturatedError
+from core.upload import ingest_upload, UploadRejectedError, RequestSizeLimitMiddleware
+from core.result_cache import result_cache
+from core.quantization import resolve_precision
+from core.attention_summary import resolve_attention_options, pack_msgpack
+from core.batch_analysis import run_batch, spool_batch_inputs, BATCH_MAX_REQUEST_BYTES
+from core.job_queue import job_queue, JobNotFoundError, PRIORITIES
+from core.streaming import (
+    StreamingDetectionSession, infer_window, run_streaming_session,
+    STREAM_UPDATE_MS
+)
 
 # Import data models
 from models.models import (
@@ -36,7 +55,10 @@ app = FastAPI()
 # Initialize Firebase
 initialize_firebase()
 
-# Configure CORS middleware
+# Refuse oversized request bodies before they are received and spooled
+app.add_middleware(RequestSizeLimitMiddleware, path_limits={"/detect-deepfake-batch/": BATCH_MAX_REQUEST_BYTES})
+
+# Configure CORS middleware (outermost, so 413 responses carry CORS headers too)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In production, specify the exact origins
@@ -60,6 +82,36 @@ if not FIREBASE_WEB_API_KEY:
     print("You can find these credentials in your Firebase console")
     raise ValueError("FIREBASE_WEB_API_KEY environment variable must be set")
 
+# Load detection models at startup instead of on the first request
+PRELOAD_MODELS = os.getenv("VOCALGUARD_PRELOAD_MODELS", "true").lower() in ("1", "true", "yes")
+
+# Bearer token for /metrics (the endpoint is disabled when unset)
+METRICS_TOKEN = os.getenv("VOCALGUARD_METRICS_TOKEN")
+
+@app.on_event("startup")
+async def preload_models():
+    if not PRELOAD_MODELS:
+        return
+    try:
+        load_models()
+    except Exception as e:
+        # Models will be loaded lazily on the first request instead
+        print(f"Model preload failed: {str(e)}")
+
+@app.on_event("startup")
+async def start_background_workers():
+    analysis_writer.start()
+    job_queue.start()
+    token_verifier.start()
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    job_queue.shutdown()
+    inference_executor.shutdown()
+    analysis_writer.shutdown()
+    token_verifier.shutdown()
+    await identity_client.aclose()
+
 # Configure OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
@@ -67,9 +119,11 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 async def verify_token(authorization: str = Depends(oauth2_scheme)):
     try:
         token = authorization.replace("Bearer ", "")
-          # Verify token with Firebase
+        # Verify token locally against the Firebase signing keys, reusing earlier verifications
         try:
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = token_verifier.cached(token)
+            if decoded_token is None:
+                decoded_token = await run_in_threadpool(token_verifier.verify, token)
             return decoded_token
         except Exception as e:
             # Log error but don't expose details in production
@@ -85,13 +139,68 @@ async def verify_token(authorization: str = Depends(oauth2_scheme)):
             detail="Invalid authentication credentials"
         )
 
+# Inference precision selected per request ("fp32" or "int8", default: VOCALGUARD_PRECISION)
+def precision_param(precision: Optional[str] = Form(None)):
+    try:
+        return resolve_precision(precision)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Attention payload options selected per request (default: a pooled summary, see core.attention_summary)
+def attention_params(
+    attention_mode: Optional[str] = Form(None),
+    attention_pooling: Optional[str] = Form(None),
+    attention_resolution: Optional[int] = Form(None),
+    attention_top_k: Optional[int] = Form(None),
+    attention_encoding: Optional[str] = Form(None)
+):
+    try:
+        return resolve_attention_options(
+            attention_mode, attention_pooling, attention_resolution, attention_top_k, attention_encoding
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def attention_response(payload, attention_options):
+    """Return a payload as JSON, or as msgpack when the msgpack attention encoding was requested"""
+    if attention_options["encoding"] == "msgpack":
+        return Response(content=pack_msgpack(payload), media_type="application/msgpack")
+    return payload
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to VocalGuard API"}
 
+def verify_metrics_token(authorization: Optional[str] = Header(None)):
+    """Allow /metrics only with the operator token from VOCALGUARD_METRICS_TOKEN"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = (authorization or "").replace("Bearer ", "", 1)
+    if not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+@app.get("/metrics", dependencies=[Depends(verify_metrics_token)])
+async def metrics():
+    """
+    Runtime metrics for the inference stack (loaded models, load time, memory, batching)
+    
+    Requires the VOCALGUARD_METRICS_TOKEN bearer token.
+    """
+    return {
+        "models": model_registry.stats(),
+        "batching": scheduler_stats(),
+        "executor": inference_executor.stats(),
+        "result_cache": result_cache.stats() if result_cache is not None else None,
+        "jobs": job_queue.stats(),
+        "persistence": analysis_writer.stats(),
+        "auth": token_verifier.stats(),
+        "identity": identity_client.stats()
+    }
+
 @app.post("/detect-deepfake/")
 async def detect_deepfake_endpoint(
     file: UploadFile = File(...),
+    precision: str = Depends(precision_param),
     token_data: dict = Depends(verify_token)
 ):
     """
@@ -99,22 +208,23 @@ async def detect_deepfake_endpoint(
     """
     user_id = token_data["uid"]
     
-    # Save the uploaded file to a temporary location
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    # Stream the upload to disk (hashing it and enforcing size/duration limits)
+    upload = None
     try:
-        contents = await file.read()
-        with open(temp_file.name, 'wb') as f:
-            f.write(contents)
-              # Extract audio info
-        filename = file.filename
-        file_size = len(contents)
-          # Process the file with our deepfake detection logic and store results
-        result = detect_deepfake(temp_file.name, user_id=user_id, store_results=True, filename=filename, analysis_type="standard")
+        upload = await ingest_upload(file)
+        filename = upload.filename
+        
+        # Process the file with our deepfake detection logic and store results
+        result = await inference_executor.run(detect_deepfake, upload.path, user_id=user_id, store_results=True, filename=filename, analysis_type="standard", content_hash=upload.sha256, precision=precision)
         
         # Ensure filename is in the result
         result["filename"] = filename
         
         return result
+    except UploadRejectedError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    except ExecutorSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
     except Exception as e:
         print(f"Error processing audio: {str(e)}")
         return JSONResponse(
@@ -122,19 +232,14 @@ async def detect_deepfake_endpoint(
             content={"error": f"Failed to process audio: {str(e)}"}
         )
     finally:
-        # Clean up the temporary file safely
-        try:
-            if not temp_file.closed:
-                temp_file.close()
-            if os.path.exists(temp_file.name):
-                os.unlink(temp_file.name)
-        except (OSError, FileNotFoundError):
-            # File already deleted or doesn't exist
-            pass
+        # Clean up the spooled upload
+        if upload:
+            upload.cleanup()
         
 @app.post("/detect-deepfake-advanced/")
 async def detect_deepfake_advanced_endpoint(
     file: UploadFile = File(...),
+    precision: str = Depends(precision_param),
     token_data: dict = Depends(verify_token)
 ):
     """
@@ -142,22 +247,23 @@ async def detect_deepfake_advanced_endpoint(
     """
     user_id = token_data["uid"]
     
-    # Save the uploaded file to a temporary location
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    # Stream the upload to disk (hashing it and enforcing size/duration limits)
+    upload = None
     try:
-        contents = await file.read()
-        with open(temp_file.name, 'wb') as f:
-            f.write(contents)
-              # Extract audio info
-        filename = file.filename
-        file_size = len(contents)
-          # Process the file with our deepfake detection logic with Wav2Vec2 and store results
-        result = detect_deepfake(temp_file.name, user_id=user_id, store_results=True, filename=filename, analysis_type="advanced")
+        upload = await ingest_upload(file)
+        filename = upload.filename
+        
+        # Process the file with our deepfake detection logic with Wav2Vec2 and store results
+        result = await inference_executor.run(detect_deepfake, upload.path, user_id=user_id, store_results=True, filename=filename, analysis_type="advanced", content_hash=upload.sha256, precision=precision)
           # Add filename and model info to result
         result["filename"] = filename
         result["model_used"] = result.get("model_used", "wav2vec2-xlsr-deepfake")
         
         return result
+    except UploadRejectedError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    except ExecutorSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
     except Exception as e:
         print(f"Error processing audio with Wav2Vec2: {str(e)}")
         return JSONResponse(
@@ -165,15 +271,51 @@ async def detect_deepfake_advanced_endpoint(
             content={"error": f"Failed to process audio with Wav2Vec2: {str(e)}"}
         )
     finally:
-        # Clean up the temporary file safely
-        try:
-            if not temp_file.closed:
-                temp_file.close()
-            if os.path.exists(temp_file.name):
-                os.unlink(temp_file.name)
-        except (OSError, FileNotFoundError):
-            # File already deleted or doesn't exist
-            pass
+        # Clean up the spooled upload
+        if upload:
+            upload.cleanup()
+
+@app.post("/detect-deepfake-batch/")
+async def detect_deepfake_batch_endpoint(
+    files: List[UploadFile] = File(...),
+    stream: bool = Form(False),
+    precision: str = Depends(precision_param),
+    token_data: dict = Depends(verify_token)
+):
+    """
+    Analyse many audio files (or zip/tar archives of audio files) in one request
+    
+    Returns {"results": [...], "summary": {...}}, or with stream=true an NDJSON
+    stream with one line per file as it finishes followed by a summary line.
+    """
+    user_id = token_data["uid"]
+    
+    if stream:
+        # The uploads are closed once this handler returns, so spool them before streaming
+        batch = run_batch(await spool_batch_inputs(files), user_id=user_id, store_results=True, precision=precision)
+        
+        async def ndjson_lines():
+            async for entry in batch:
+                yield json.dumps(entry) + "\n"
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+    
+    try:
+        batch = run_batch(files, user_id=user_id, store_results=True, precision=precision)
+        results = []
+        summary = None
+        async for entry in batch:
+            if entry["type"] == "summary":
+                summary = entry
+            else:
+                results.append(entry)
+        results.sort(key=lambda entry: entry["index"])
+        return {"results": results, "summary": summary}
+    except Exception as e:
+        print(f"Error processing batch: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": f"Failed to process batch: {str(e)}"}
+        )
 
 @app.post("/signup")
 async def signup(user_data: UserSignUp):
@@ -201,20 +343,13 @@ async def signup(user_data: UserSignUp):
 @app.post("/login")
 async def login(user_data: UserLogin):
     try:
-        # Firebase Auth REST API endpoint for email/password sign-in
-        url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={FIREBASE_WEB_API_KEY}"
-        
-        # Request body
-        payload = {
-            "email": user_data.email,
-            "password": user_data.password,
-            "returnSecureToken": True
-        }
-          # Make request to Firebase Auth
-        response = requests.post(url, json=payload)
+        # Sign in through the Firebase Auth REST API on the pooled async client
+        response = await identity_client.sign_in_with_password(
+            user_data.email, user_data.password, FIREBASE_WEB_API_KEY
+        )
         
         # Check if the response was successful
-        if not response.ok:
+        if not response.is_success:
             raise HTTPException(
                 status_code=response.status_code,
                 detail=f"FIREBASE_ERROR: Authentication failed with HTTP {response.status_code}"
@@ -236,8 +371,9 @@ async def login(user_data: UserLogin):
                 detail="Invalid response from authentication service"
             )
         
-        try:            # Get user data from Firebase Admin SDK
-            user = auth.get_user_by_email(user_data.email)
+        try:
+            # Get user data from Firebase Admin SDK (blocking, so off the event loop)
+            user = await run_in_threadpool(auth.get_user_by_email, user_data.email)
             
             return {
                 "message": "Login successful",
@@ -268,33 +404,58 @@ async def protected_route(token_data=Depends(verify_token)):
     return {"message": "This is a protected route", "user_id": token_data["uid"]}
 
 # Database-related endpoints
-@app.get("/user/analyses")
-async def get_user_analyses(token_data=Depends(verify_token)):
-    """
-    Get all analyses for the currently authenticated user
-    """
-    user_id = token_data["uid"]
-    
+def history_params(
+    limit: int = Query(DEFAULT_HISTORY_PAGE_SIZE, ge=1, le=MAX_HISTORY_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    order: str = Query("desc"),
+    verdict: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None)
+):
+    """Validate the pagination, filter and projection parameters of the history endpoints"""
+    if verdict is not None and verdict.lower() not in ("real", "fake"):
+        raise HTTPException(status_code=400, detail="verdict must be 'real' or 'fake'")
+    if order.lower() not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+    return {
+        "limit": limit,
+        "cursor": cursor,
+        "order": order.lower(),
+        "is_deepfake": verdict.lower() == "fake" if verdict else None,
+        "date_from": date_from,
+        "date_to": date_to,
+        "model_version": model,
+        "fields": [field.strip() for field in fields.split(",") if field.strip()] if fields else None,
+    }
+
+def list_history(user_id, params):
+    """Get one page of the user's analysis summaries for the history endpoints"""
     try:
         db_service = DatabaseService()
-        analyses = db_service.get_user_analyses(user_id)
-        return {"analyses": analyses}
+        return db_service.list_user_analyses(user_id, **params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve analyses: {str(e)}")
 
+@app.get("/user/analyses")
+async def get_user_analyses(params=Depends(history_params), token_data=Depends(verify_token)):
+    """
+    Get one page of analyses for the currently authenticated user
+    
+    Results are ordered by analysis_timestamp, newest first unless order=asc.
+    Pass next_cursor back as cursor to get the following page.
+    """
+    return await run_in_threadpool(list_history, token_data["uid"], params)
+
 @app.get("/data/analyses")
-async def get_data_analyses(token_data=Depends(verify_token)):
+async def get_data_analyses(params=Depends(history_params), token_data=Depends(verify_token)):
     """
-    Get all analyses for the currently authenticated user (alternative endpoint)
+    Get one page of analyses for the currently authenticated user (alternative endpoint)
     """
-    user_id = token_data["uid"]
-    
-    try:
-        db_service = DatabaseService()
-        analyses = db_service.get_user_analyses(user_id)
-        return {"analyses": analyses}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to retrieve analyses: {str(e)}")
+    return await run_in_threadpool(list_history, token_data["uid"], params)
 
 @app.get("/analyses/{analysis_id}")
 async def get_analysis_by_id(analysis_id: str, token_data=Depends(verify_token)):
@@ -333,35 +494,31 @@ async def generate_dummy_data(token_data=Depends(verify_token)):
         raise HTTPException(status_code=500, detail=f"Failed to generate dummy data: {str(e)}")
 
 @app.post("/detect-deepfake-demo")
-async def detect_deepfake_demo(file: UploadFile = File(...)):
+async def detect_deepfake_demo(file: UploadFile = File(...), precision: str = Depends(precision_param)):
     """
     Public endpoint to detect deepfakes without authentication (for demo purposes)
     """
-    # Save the uploaded file to a temporary location
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    # Stream the upload to disk (hashing it and enforcing size/duration limits)
+    upload = None
     try:
-        contents = await file.read()
-        with open(temp_file.name, 'wb') as f:
-            f.write(contents)
-            
+        upload = await ingest_upload(file)
+        
         # Process the file with our deepfake detection logic without storing results
-        result = detect_deepfake(temp_file.name, store_results=False, analysis_type="demo")
+        result = await inference_executor.run(detect_deepfake, upload.path, store_results=False, analysis_type="demo", content_hash=upload.sha256, precision=precision)
         return result
+    except UploadRejectedError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    except ExecutorSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(
             status_code=500,
             content={"error": f"Failed to process audio: {str(e)}"}
         )
     finally:
-        # Clean up the temporary file safely
-        try:
-            if not temp_file.closed:
-                temp_file.close()
-            if os.path.exists(temp_file.name):
-                os.unlink(temp_file.name)
-        except (OSError, FileNotFoundError):
-            # File already deleted or doesn't exist
-            pass
+        # Clean up the spooled upload
+        if upload:
+            upload.cleanup()
 
 @app.post("/analyses/delete")
 async def delete_analyses(
@@ -377,16 +534,30 @@ async def delete_analyses(
         raise HTTPException(status_code=400, detail="No analysis IDs provided")
     try:
         db_service = DatabaseService()
-        # Optionally, check ownership of each analysis before deletion
-        # For now, rely on db_service to handle permissions if needed
-        results = db_service.delete_multiple_analyses(analysis_ids)
+        # Analyses of other users are left untouched and reported as failed
+        results = await run_in_threadpool(db_service.delete_multiple_analyses, analysis_ids, user_id)
         return {"deleted": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete analyses: {str(e)}")
 
+def format_attention_response(result, filename):
+    """Extract the attention analysis of an ensemble result for visualization"""
+    attention_analysis = result.get("detailed_results", {}).get("attention_analysis", {})
+    
+    return {
+        "filename": filename,
+        "prediction": result.get("prediction", "error"),
+        "confidence": result.get("confidence", 0.0),
+        "is_fake": result.get("is_fake", None),
+        "attention_analysis": attention_analysis,
+        "model_used": "transformer_attention_analysis"
+    }
+
 @app.post("/detect-deepfake-transformer/")
 async def detect_deepfake_transformer_endpoint(
     file: UploadFile = File(...),
+    precision: str = Depends(precision_param),
+    attention_options: dict = Depends(attention_params),
     token_data: dict = Depends(verify_token)
 ):
     """
@@ -394,30 +565,34 @@ async def detect_deepfake_transformer_endpoint(
     """
     user_id = token_data["uid"]
     
-    # Save the uploaded file to a temporary location
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    # Stream the upload to disk (hashing it and enforcing size/duration limits)
+    upload = None
     try:
-        contents = await file.read()
-        with open(temp_file.name, 'wb') as f:
-            f.write(contents)
+        upload = await ingest_upload(file)
         
-        filename = file.filename
-        file_size = len(contents)
+        filename = upload.filename
         
         # Process the file with ensemble detection (Wav2Vec2 + Transformer)
-        result = detect_deepfake_ensemble(
-            temp_file.name, 
+        result = await inference_executor.run(
+            detect_deepfake_ensemble,
+            upload.path, 
             user_id=user_id, 
             store_results=True, 
             filename=filename,
-            use_transformer=True
+            use_transformer=True,
+            precision=precision,
+            attention_options=attention_options
         )
         
         # Add filename and model info to result
         result["filename"] = filename
         result["model_used"] = result.get("model_used", "wav2vec2_transformer_ensemble")
         
-        return result
+        return attention_response(result, attention_options)
+    except UploadRejectedError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    except ExecutorSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
     except Exception as e:
         print(f"Error processing audio with Transformer ensemble: {str(e)}")
         return JSONResponse(
@@ -425,19 +600,15 @@ async def detect_deepfake_transformer_endpoint(
             content={"error": f"Failed to process audio with Transformer ensemble: {str(e)}"}
         )
     finally:
-        # Clean up the temporary file safely
-        try:
-            if not temp_file.closed:
-                temp_file.close()
-            if os.path.exists(temp_file.name):
-                os.unlink(temp_file.name)
-        except (OSError, FileNotFoundError):
-            # File already deleted or doesn't exist
-            pass
+        # Clean up the spooled upload
+        if upload:
+            upload.cleanup()
 
 @app.post("/detect-deepfake-attention-analysis/")
 async def detect_deepfake_attention_analysis_endpoint(
     file: UploadFile = File(...),
+    precision: str = Depends(precision_param),
+    attention_options: dict = Depends(attention_params),
     token_data: dict = Depends(verify_token)
 ):
     """
@@ -445,37 +616,30 @@ async def detect_deepfake_attention_analysis_endpoint(
     """
     user_id = token_data["uid"]
     
-    # Save the uploaded file to a temporary location
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    # Stream the upload to disk (hashing it and enforcing size/duration limits)
+    upload = None
     try:
-        contents = await file.read()
-        with open(temp_file.name, 'wb') as f:
-            f.write(contents)
+        upload = await ingest_upload(file)
         
-        filename = file.filename
+        filename = upload.filename
         
         # Get ensemble results with detailed attention analysis
-        result = detect_deepfake_ensemble(
-            temp_file.name, 
+        result = await inference_executor.run(
+            detect_deepfake_ensemble,
+            upload.path, 
             user_id=user_id, 
             store_results=False,  # Don't store for analysis-only requests
             filename=filename,
-            use_transformer=True
+            use_transformer=True,
+            precision=precision,
+            attention_options=attention_options
         )
         
-        # Extract attention analysis for visualization
-        attention_analysis = result.get("detailed_results", {}).get("attention_analysis", {})
-        
-        response = {
-            "filename": filename,
-            "prediction": result.get("prediction", "error"),
-            "confidence": result.get("confidence", 0.0),
-            "is_fake": result.get("is_fake", None),
-            "attention_analysis": attention_analysis,
-            "model_used": "transformer_attention_analysis"
-        }
-        
-        return response
+        return attention_response(format_attention_response(result, filename), attention_options)
+    except UploadRejectedError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    except ExecutorSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
     except Exception as e:
         print(f"Error processing attention analysis: {str(e)}")
         return JSONResponse(
@@ -483,16 +647,195 @@ async def detect_deepfake_attention_analysis_endpoint(
             content={"error": f"Failed to process attention analysis: {str(e)}"}
         )
     finally:
-        # Clean up the temporary file safely
-        try:
-            if not temp_file.closed:
-                temp_file.close()
-            if os.path.exists(temp_file.name):
-                os.unlink(temp_file.name)
-        except (OSError, FileNotFoundError):
-            # File already deleted or doesn't exist
-            pass
+        # Clean up the spooled upload
+        if upload:
+            upload.cleanup()
+
+def run_transformer_job(payload):
+    """Job handler for the transformer ensemble analysis"""
+    result = detect_deepfake_ensemble(
+        payload["path"],
+        user_id=payload["user_id"],
+        store_results=True,
+        filename=payload["filename"],
+        use_transformer=True,
+        precision=payload["precision"]
+    )
+    if result.get("error"):
+        raise RuntimeError(result["error"])
+    result["filename"] = payload["filename"]
+    result["model_used"] = result.get("model_used", "wav2vec2_transformer_ensemble")
+    return result
+
+def run_attention_analysis_job(payload):
+    """Job handler for the attention analysis"""
+    result = detect_deepfake_ensemble(
+        payload["path"],
+        user_id=payload["user_id"],
+        store_results=False,  # Don't store for analysis-only requests
+        filename=payload["filename"],
+        use_transformer=True,
+        precision=payload["precision"]
+    )
+    if result.get("error"):
+        raise RuntimeError(result["error"])
+    return format_attention_response(result, payload["filename"])
+
+job_queue.register("transformer", run_transformer_job)
+job_queue.register("attention_analysis", run_attention_analysis_job)
+
+async def submit_analysis_job(kind, file, priority, precision, user_id):
+    """Spool an upload into the job queue and return the 202 response with the job ID"""
+    if priority not in PRIORITIES:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"Unknown priority '{priority}', expected one of {', '.join(PRIORITIES)}"}
+        )
+    
+    upload = None
+    try:
+        upload = await ingest_upload(file)
+        job_id = str(uuid.uuid4())
+        
+        # The job owns the file from here on; it is deleted when the job finishes
+        path = job_queue.adopt_file(upload.path, job_id)
+        payload = {"path": path, "filename": upload.filename, "user_id": user_id, "precision": precision}
+        job_queue.submit(kind, payload, user_id=user_id, priority=priority, job_id=job_id)
+        
+        return JSONResponse(status_code=202, content={
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/jobs/{job_id}",
+            "result_url": f"/jobs/{job_id}/result"
+        })
+    except UploadRejectedError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    except Exception as e:
+        print(f"Error submitting job: {str(e)}")
+        return JSONResponse(status_code=500, content={"error": f"Failed to submit job: {str(e)}"})
+    finally:
+        # Only removes the spooled file if it wasn't handed to the queue
+        if upload:
+            upload.cleanup()
+
+@app.post("/jobs/detect-deepfake-transformer/")
+async def submit_transformer_job(
+    file: UploadFile = File(...),
+    priority: str = Form("normal"),
+    precision: str = Depends(precision_param),
+    token_data: dict = Depends(verify_token)
+):
+    """
+    Queue a transformer ensemble analysis and return its job ID immediately
+    """
+    return await submit_analysis_job("transformer", file, priority, precision, token_data["uid"])
+
+@app.post("/jobs/detect-deepfake-attention-analysis/")
+async def submit_attention_analysis_job(
+    file: UploadFile = File(...),
+    priority: str = Form("normal"),
+    precision: str = Depends(precision_param),
+    token_data: dict = Depends(verify_token)
+):
+    """
+    Queue an attention analysis and return its job ID immediately
+    """
+    return await submit_analysis_job("attention_analysis", file, priority, precision, token_data["uid"])
+
+def get_user_job(job_id, user_id):
+    """Get a job owned by the user, raising 404 otherwise"""
+    try:
+        job = job_queue.get(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str, token_data: dict = Depends(verify_token)):
+    """
+    Get the status of a queued analysis job
+    """
+    job = await run_in_threadpool(get_user_job, job_id, token_data["uid"])
+    job.pop("result")
+    return job
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, token_data: dict = Depends(verify_token)):
+    """
+    Get the result of a finished analysis job (202 while it is still queued or running)
+    """
+    job = await run_in_threadpool(get_user_job, job_id, token_data["uid"])
+    if job["status"] == "succeeded":
+        return job["result"]
+    if job["status"] == "failed":
+        return JSONResponse(status_code=500, content={"job_id": job_id, "status": "failed", "error": job["error"]})
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": job["status"]})
+
+@app.websocket("/ws/detect-deepfake")
+async def detect_deepfake_stream(
+    websocket: WebSocket,
+    token: str = "",
+    sample_rate: int = 16000,
+    encoding: str = "pcm_s16le",
+    update_ms: int = STREAM_UPDATE_MS,
+    precision: Optional[str] = None
+):
+    """
+    Real-time detection on a live audio stream
+
+    The client connects with ?token=<Firebase ID token>, sends mono PCM audio as
+    binary frames and receives {"type": "update", ...} messages with the fake
+    probability of the most recent window every update_ms of audio. Sending
+    "stop" (or {"type": "stop"}) returns a {"type": "final", ...} summary.
+    """
+    try:
+        if token_verifier.cached(token) is None:
+            await run_in_threadpool(token_verifier.verify, token)
+    except Exception as e:
+        print(f"WebSocket token verification error: {str(e)}")
+        await websocket.close(code=1008)
+        return
+
+    try:
+        precision = resolve_precision(precision)
+        session = StreamingDetectionSession(sample_rate=sample_rate, encoding=encoding, update_ms=update_ms)
+    except ValueError as e:
+        await websocket.accept()
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=1003)
+        return
+
+    await websocket.accept()
+    await websocket.send_json({
+        "type": "ready",
+        "sample_rate": session.sample_rate,
+        "encoding": session.encoding,
+        "update_ms": session.update_samples * 1000 // session.sample_rate,
+        "window_seconds": session.window_seconds,
+        "precision": precision,
+        "max_compute_seconds": session.max_compute_seconds
+    })
+
+    async def run_inference(window, window_sample_rate):
+        return await inference_executor.run(infer_window, window, window_sample_rate, precision)
+
+    try:
+        await run_streaming_session(websocket, session, run_inference)
+    except Exception as e:
+        print(f"Error in streaming detection: {str(e)}")
+
+def load_models():
+    """Load every detection model into the process-wide registry"""
+    get_detector()
+    get_transformer_detector()
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    from core.prefork import serve, WORKERS
+    if WORKERS > 1:
+        # Load the weights once and share them copy-on-write across the workers
+        serve(app, host="0.0.0.0", port=8000, workers=WORKERS, preload=load_models)
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
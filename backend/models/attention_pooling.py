@@ -0,0 +1,20 @@
+import torch.nn.functional as F
+
+
+def pool_matrix(matrix, resolution, pooling="mean"):
+    """
+    Reduce a (seq_len, seq_len) attention matrix to at most (resolution, resolution)
+
+    Args:
+        matrix: Head-averaged attention of one layer
+        resolution: Target number of query and key bins
+        pooling: "mean" or "max" over each bin
+
+    Returns:
+        torch.Tensor: Pooled matrix
+    """
+    if matrix.shape[-1] <= resolution:
+        return matrix
+    size = (min(resolution, matrix.shape[0]), resolution)
+    pool = F.adaptive_max_pool2d if pooling == "max" else F.adaptive_avg_pool2d
+    return pool(matrix[None, None].float(), size)[0, 0]
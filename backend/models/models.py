@@ -20,6 +20,8 @@ class AudioMetadataCreate(BaseModel):
     file_size: int
     duration: float
     sample_rate: int
+    channels: Optional[int] = None
+    bit_depth: Optional[str] = None
 
 class AudioMetadata(AudioMetadataCreate):
     id: str
@@ -9,6 +9,27 @@ from safetensors.torch import load_file
 import os
 import math
 
+from models.attention_pooling import pool_matrix
+
+# Pass as attention_layers to get the attention weights of every layer
+ALL_ATTENTION_LAYERS = "all"
+
+# Temporal front-end of the detector: Wav2Vec2 emits ~50 frames/s, attention cost grows with the square.
+# "avg" has no weights, so the bounded default works with any checkpoint
+TRANSFORMER_DOWNSAMPLE = os.getenv("VOCALGUARD_TRANSFORMER_DOWNSAMPLE", "avg").lower()  # "avg", "conv" or "none"
+TRANSFORMER_DOWNSAMPLE_FACTOR = int(os.getenv("VOCALGUARD_TRANSFORMER_DOWNSAMPLE_FACTOR", "4"))
+TRANSFORMER_MAX_FRAMES = int(os.getenv("VOCALGUARD_TRANSFORMER_MAX_FRAMES", "1000"))  # 0 = no cap
+DOWNSAMPLE_MODES = ("avg", "conv", "none")
+
+# Revision of the positional encoding, part of the stored model version.
+# 1 (default) adds the encoding of each item's batch index to all of its frames,
+# which is what existing checkpoints were trained with; 2 indexes encodings by frame
+TRANSFORMER_REVISION = int(os.getenv("VOCALGUARD_TRANSFORMER_REVISION", "1"))
+TRANSFORMER_REVISIONS = (1, 2)
+
+# Size the last-layer attention_weights of a detection result are pooled to
+DETECTION_ATTENTION_RESOLUTION = 32
+
 class MultiHeadAttention(nn.Module):
     """Multi-head attention mechanism for audio features"""
     
@@ -39,7 +60,14 @@ class MultiHeadAttention(nn.Module):
         context = torch.matmul(attention_weights, V)
         return context, attention_weights
     
-    def forward(self, query, key, value, mask=None):
+    def forward(self, query, key, value, mask=None, need_weights=True):
+        """
+        Apply attention
+        
+        Without need_weights the fused F.scaled_dot_product_attention kernel is
+        used, which never materialises the (seq_len, seq_len) score and softmax
+        matrices, and None is returned for the weights.
+        """
         batch_size = query.size(0)
         
         # Linear transformations
@@ -48,7 +76,15 @@ class MultiHeadAttention(nn.Module):
         V = self.w_v(value).view(batch_size, -1, self.num_heads, self.d_k).transpose(1, 2)
         
         # Apply attention
-        context, attention_weights = self.scaled_dot_product_attention(Q, K, V, mask)
+        if need_weights:
+            context, attention_weights = self.scaled_dot_product_attention(Q, K, V, mask)
+        else:
+            context = F.scaled_dot_product_attention(
+                Q, K, V,
+                attn_mask=None if mask is None else mask != 0,
+                dropout_p=self.dropout.p if self.training else 0.0
+            )
+            attention_weights = None
         
         # Concatenate heads
         context = context.transpose(1, 2).contiguous().view(
@@ -63,25 +99,90 @@ class MultiHeadAttention(nn.Module):
         
         return output, attention_weights
 
+def sinusoidal_encoding(length, d_model, device=None):
+    """Sinusoidal positional encodings for positions 0..length-1, shape (length, d_model)"""
+    position = torch.arange(0, length, dtype=torch.float, device=device).unsqueeze(1)
+    div_term = torch.exp(torch.arange(0, d_model, 2, dtype=torch.float, device=device) *
+                         (-math.log(10000.0) / d_model))
+    
+    pe = torch.zeros(length, d_model, device=device)
+    pe[:, 0::2] = torch.sin(position * div_term)
+    pe[:, 1::2] = torch.cos(position * div_term)
+    return pe
+
 class PositionalEncoding(nn.Module):
-    """Positional encoding for transformer"""
+    """
+    Positional encoding for transformer
     
-    def __init__(self, d_model, max_len=5000):
+    Encodings for the first max_len positions are precomputed; longer
+    sequences get theirs computed on the fly, so any length is supported.
+    Revision 1 indexes the encodings by batch item (every frame of an item gets
+    the same encoding), revision 2 by frame (see TRANSFORMER_REVISION).
+    """
+    
+    def __init__(self, d_model, max_len=5000, revision=TRANSFORMER_REVISION):
         super(PositionalEncoding, self).__init__()
+        if revision not in TRANSFORMER_REVISIONS:
+            raise ValueError(f"Unknown transformer revision {revision}, expected one of "
+                             f"{', '.join(str(r) for r in TRANSFORMER_REVISIONS)}")
+        self.d_model = d_model
+        self.revision = revision
         
-        pe = torch.zeros(max_len, d_model)
-        position = torch.arange(0, max_len, dtype=torch.float).unsqueeze(1)
-        div_term = torch.exp(torch.arange(0, d_model, 2).float() * 
-                           (-math.log(10000.0) / d_model))
-        
-        pe[:, 0::2] = torch.sin(position * div_term)
-        pe[:, 1::2] = torch.cos(position * div_term)
-        pe = pe.unsqueeze(0).transpose(0, 1)
-        
-        self.register_buffer('pe', pe)
+        # Deterministic, so not part of the state dict
+        self.register_buffer('pe', sinusoidal_encoding(max_len, d_model).unsqueeze(0), persistent=False)
+    
+    def _encodings(self, length, x):
+        """Encodings for positions 0..length-1, shape (length, d_model)"""
+        if length <= self.pe.size(1):
+            return self.pe[0, :length]
+        return sinusoidal_encoding(length, self.d_model, x.device).to(x.dtype)
+    
+    def forward(self, x):
+        # x: (batch, seq_len, d_model)
+        if self.revision == 1:
+            return x + self._encodings(x.size(0), x).unsqueeze(1)
+        return x + self._encodings(x.size(1), x).unsqueeze(0)
+    
+    def extra_repr(self):
+        return f"revision={self.revision}"
+
+class TemporalDownsampler(nn.Module):
+    """
+    Reduces the frame rate of a feature sequence before the transformer blocks
+    
+    "avg" averages every factor frames and has no weights; "conv" is a learned
+    strided convolution (it needs trained weights). Sequences are padded up to
+    a multiple of the factor, so the output has ceil(seq_len / factor) frames.
+    """
+    
+    def __init__(self, d_model, mode="avg", factor=4):
+        super(TemporalDownsampler, self).__init__()
+        if mode not in DOWNSAMPLE_MODES:
+            raise ValueError(f"Unknown downsample mode '{mode}', expected one of {', '.join(DOWNSAMPLE_MODES)}")
+        self.mode = mode if factor > 1 else "none"
+        self.factor = factor
+        if self.mode == "conv":
+            self.conv = nn.Conv1d(d_model, d_model, kernel_size=factor, stride=factor)
+    
+    def output_length(self, length):
+        """Number of frames left from length input frames"""
+        return length if self.mode == "none" else -(-length // self.factor)
     
     def forward(self, x):
-        return x + self.pe[:x.size(0), :]
+        # x: (batch, seq_len, d_model)
+        if self.mode == "none":
+            return x
+        
+        x = x.transpose(1, 2)  # (batch, d_model, seq_len)
+        if self.mode == "avg":
+            x = F.avg_pool1d(x, kernel_size=self.factor, stride=self.factor, ceil_mode=True)
+        else:
+            padding = -x.size(-1) % self.factor
+            x = self.conv(F.pad(x, (0, padding)))
+        return x.transpose(1, 2)
+    
+    def extra_repr(self):
+        return f"mode={self.mode}, factor={self.factor}"
 
 class FeedForward(nn.Module):
     """Feed-forward network"""
@@ -105,8 +206,8 @@ class TransformerBlock(nn.Module):
         self.attention = MultiHeadAttention(d_model, num_heads, dropout)
         self.feed_forward = FeedForward(d_model, d_ff, dropout)
         
-    def forward(self, x, mask=None):
-        x, attention_weights = self.attention(x, x, x, mask)
+    def forward(self, x, mask=None, need_weights=True):
+        x, attention_weights = self.attention(x, x, x, mask, need_weights)
         x = self.feed_forward(x)
         return x, attention_weights
 
@@ -116,12 +217,26 @@ class AudioTransformer(nn.Module):
     """
     
     def __init__(self, input_dim=1024, d_model=512, num_heads=8, num_layers=6, 
-                 d_ff=2048, max_len=1000, dropout=0.1, num_classes=2):
+                 d_ff=2048, max_len=None, dropout=0.1, num_classes=2,
+                 downsample="none", downsample_factor=4, revision=TRANSFORMER_REVISION):
+        """
+        Initialize the transformer
+        
+        Args:
+            max_len: Maximum number of frames the transformer blocks attend over.
+                Longer sequences (after downsampling) are average-pooled down to
+                max_len, which bounds the cost of long clips. None (default) disables the cap.
+            downsample: Temporal front-end, "avg", "conv" or "none" (see TemporalDownsampler)
+            downsample_factor: Frame-rate reduction of the front-end
+            revision: Positional encoding revision (see TRANSFORMER_REVISION)
+        """
         super(AudioTransformer, self).__init__()
         
         self.d_model = d_model
+        self.max_len = max_len
         self.input_projection = nn.Linear(input_dim, d_model)
-        self.positional_encoding = PositionalEncoding(d_model, max_len)
+        self.downsampler = TemporalDownsampler(d_model, downsample, downsample_factor)
+        self.positional_encoding = PositionalEncoding(d_model, max_len or 1000, revision)
         
         self.transformer_blocks = nn.ModuleList([
             TransformerBlock(d_model, num_heads, d_ff, dropout)
@@ -143,9 +258,74 @@ class AudioTransformer(nn.Module):
             nn.Linear(d_model // 4, num_classes)
         )
         
-    def forward(self, x, mask=None):
+    def sequence_length(self, num_frames):
+        """Number of frames the transformer blocks see for num_frames input frames"""
+        length = self.downsampler.output_length(num_frames)
+        return min(length, self.max_len) if self.max_len else length
+    
+    def extra_repr(self):
+        return f"max_len={self.max_len}"
+    
+    def version_tag(self):
+        """
+        Identify the forward computation, e.g. "tf1" or "tf1.avg4.max1000"
+        
+        Verdicts from different revisions or front-ends are not comparable,
+        so the tag is part of the model version stored with them.
+        """
+        tag = f"tf{self.positional_encoding.revision}"
+        if self.downsampler.mode != "none":
+            tag += f".{self.downsampler.mode}{self.downsampler.factor}"
+        if self.max_len:
+            tag += f".max{self.max_len}"
+        return tag
+    
+    def resolve_attention_layers(self, attention_layers=ALL_ATTENTION_LAYERS):
+        """
+        Normalise a layer selection to a set of layer indices
+        
+        Args:
+            attention_layers: ALL_ATTENTION_LAYERS or an iterable of layer indices
+                (negative indices count from the last layer)
+            
+        Returns:
+            set: Indices of the layers whose attention weights are returned
+        """
+        num_layers = len(self.transformer_blocks)
+        if attention_layers == ALL_ATTENTION_LAYERS:
+            return set(range(num_layers))
+        layers = set()
+        for index in attention_layers:
+            if not -num_layers <= index < num_layers:
+                raise ValueError(f"Attention layer {index} out of range for {num_layers} layers")
+            layers.add(index % num_layers)
+        return layers
+    
+    def forward(self, x, mask=None, attention_layers=ALL_ATTENTION_LAYERS):
+        """
+        Classify a sequence of audio features
+        
+        Args:
+            x: Features (batch, seq_len, input_dim)
+            mask: Optional attention mask over the downsampled sequence (0 = masked)
+            attention_layers: Layers whose attention weights are returned (default:
+                all). The other layers use the fused attention kernel, so pass []
+                when only the logits are needed.
+            
+        Returns:
+            tuple: (logits, list of (batch, heads, frames, frames) attention weights
+                of the requested layers, in layer order; frames = sequence_length(seq_len))
+        """
+        requested_layers = self.resolve_attention_layers(attention_layers)
+        
         # Input projection
         x = self.input_projection(x)
+        
+        # Reduce the frame rate, then cap the number of frames the blocks attend over
+        x = self.downsampler(x)
+        if self.max_len and x.size(1) > self.max_len:
+            x = F.adaptive_avg_pool1d(x.transpose(1, 2), self.max_len).transpose(1, 2)
+        
         x = x * math.sqrt(self.d_model)
         
         # Add positional encoding
@@ -154,9 +334,11 @@ class AudioTransformer(nn.Module):
         
         # Apply transformer blocks
         attention_weights = []
-        for transformer_block in self.transformer_blocks:
-            x, attn_weights = transformer_block(x, mask)
-            attention_weights.append(attn_weights)
+        for index, transformer_block in enumerate(self.transformer_blocks):
+            need_weights = index in requested_layers
+            x, attn_weights = transformer_block(x, mask, need_weights)
+            if need_weights:
+                attention_weights.append(attn_weights)
         
         x = self.layer_norm(x)
         
@@ -173,14 +355,25 @@ class TransformerDeepfakeDetector:
     Transformer-based deepfake detector using attention mechanism
     """
     
-    def __init__(self, model_path=None, device=None):
+    def __init__(self, model_path=None, device=None, feature_extractor=None, base_model=None):
+        """
+        Initialize the transformer detector
+        
+        Args:
+            model_path (str): Path to model directory
+            device: Torch device (default: cuda if available, else cpu)
+            feature_extractor: Already loaded Wav2Vec2 feature extractor to share
+            base_model: Already loaded Wav2Vec2 classification model to share
+        """
         self.device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.model_path = model_path
+        self.precision = "fp32"
         
-        # Load base wav2vec2 model for feature extraction
-        self.feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(
+        # Load base wav2vec2 model for feature extraction (reuse warm instances when given)
+        self.feature_extractor = feature_extractor or Wav2Vec2FeatureExtractor.from_pretrained(
             model_path or "facebook/wav2vec2-base"
         )
-        self.base_model = AutoModelForAudioClassification.from_pretrained(
+        self.base_model = base_model or AutoModelForAudioClassification.from_pretrained(
             model_path or "facebook/wav2vec2-base",
             use_safetensors=True
         ).to(self.device)
@@ -192,8 +385,12 @@ class TransformerDeepfakeDetector:
             num_heads=8,
             num_layers=6,
             d_ff=2048,
+            max_len=TRANSFORMER_MAX_FRAMES or None,
             dropout=0.1,
-            num_classes=2
+            num_classes=2,
+            downsample=TRANSFORMER_DOWNSAMPLE,
+            downsample_factor=TRANSFORMER_DOWNSAMPLE_FACTOR,
+            revision=TRANSFORMER_REVISION
         ).to(self.device)
         
         # Load transformer weights if available
@@ -202,6 +399,9 @@ class TransformerDeepfakeDetector:
         
         self.transformer_model.eval()
         
+        # Optional CompiledAudioTransformer (see core.compiled_backend)
+        self.compiled_model = None
+        
         # Class labels
         self.id2label = {0: "real", 1: "fake"}
         self.label2id = {"real": 0, "fake": 1}
@@ -231,12 +431,26 @@ class TransformerDeepfakeDetector:
         except Exception as e:
             print(f"Error loading transformer weights: {e}")
     
+    @property
+    def version(self):
+        """Version tag of the AudioTransformer's computation (see AudioTransformer.version_tag)"""
+        return self.transformer_model.version_tag()
+    
+    def run_transformer(self, features, attention_layers=ALL_ATTENTION_LAYERS):
+        """Run the AudioTransformer, through the compiled backend when one is attached"""
+        if self.compiled_model is not None:
+            return self.compiled_model(features, attention_layers=attention_layers)
+        return self.transformer_model(features, attention_layers=attention_layers)
+    
     def extract_features(self, audio_path):
-        """Extract features from audio using Wav2Vec2"""
+        """Extract features from audio (a path or an AudioContext) using Wav2Vec2"""
         try:
-            # Load audio
-            waveform, sample_rate = librosa.load(audio_path, sr=16000)
-            waveform = waveform.astype(np.float32)
+            # Load audio, reusing the request's decoded 16 kHz waveform when available
+            if hasattr(audio_path, "waveform_16k"):
+                waveform = audio_path.waveform_16k
+            else:
+                waveform, sample_rate = librosa.load(audio_path, sr=16000)
+                waveform = waveform.astype(np.float32)
             
             # Process through feature extractor
             inputs = self.feature_extractor(
@@ -260,6 +474,32 @@ class TransformerDeepfakeDetector:
             print(f"Error extracting features: {e}")
             return None
     
+    def _build_detection_result(self, logits, attention_weights, attention_resolution=DETECTION_ATTENTION_RESOLUTION):
+        """Convert transformer logits and attention weights into a detection result"""
+        # Get probabilities
+        probabilities = F.softmax(logits, dim=1)
+        predictions = torch.argmax(probabilities, dim=1)
+        
+        # Convert to numpy
+        pred_idx = predictions[0].cpu().item()
+        confidence = probabilities[0][pred_idx].cpu().item()
+        all_probs = probabilities[0].cpu().numpy()
+        
+        # Last-layer attention averaged over heads, pooled to a fixed resolution for visualization
+        avg_attention = pool_matrix(torch.mean(attention_weights[-1][0], dim=0), attention_resolution)
+        
+        return {
+            "prediction": self.id2label[pred_idx],
+            "confidence": confidence,
+            "label_index": pred_idx,
+            "probabilities": {
+                self.id2label[i]: float(prob) for i, prob in enumerate(all_probs)
+            },
+            "is_fake": pred_idx == 1,
+            "attention_weights": avg_attention.cpu().numpy().tolist(),
+            "model_type": "transformer_attention"
+        }
+    
     def detect(self, audio_path, threshold=0.5):
         """
         Detect deepfake audio using transformer with attention
@@ -277,35 +517,10 @@ class TransformerDeepfakeDetector:
             if features is None:
                 return {"error": "Failed to extract features"}
             
-            # Run transformer inference
+            # Run transformer inference (only the last layer's attention is reported)
             with torch.no_grad():
-                logits, attention_weights = self.transformer_model(features)
-                
-                # Get probabilities
-                probabilities = F.softmax(logits, dim=1)
-                predictions = torch.argmax(probabilities, dim=1)
-                
-                # Convert to numpy
-                pred_idx = predictions[0].cpu().item()
-                confidence = probabilities[0][pred_idx].cpu().item()
-                all_probs = probabilities[0].cpu().numpy()
-                
-                # Process attention weights for visualization
-                avg_attention = torch.mean(attention_weights[-1], dim=1).cpu().numpy()  # Average over heads
-                
-                result = {
-                    "prediction": self.id2label[pred_idx],
-                    "confidence": confidence,
-                    "label_index": pred_idx,
-                    "probabilities": {
-                        self.id2label[i]: float(prob) for i, prob in enumerate(all_probs)
-                    },
-                    "is_fake": pred_idx == 1,
-                    "attention_weights": avg_attention.tolist(),
-                    "model_type": "transformer_attention"
-                }
-                
-                return result
+                logits, attention_weights = self.run_transformer(features, attention_layers=[-1])
+                return self._build_detection_result(logits, attention_weights)
                 
         except Exception as e:
             print(f"Error in transformer detection: {e}")
@@ -317,58 +532,70 @@ class TransformerDeepfakeDetector:
                 "model_type": "transformer_attention"
             }
     
-    def get_attention_analysis(self, audio_path):
+    def transformer_logits(self, features):
         """
-        Get detailed attention analysis for visualization
+        Score a batch of feature sequences without collecting attention weights
         
         Args:
-            audio_path (str): Path to audio file
+            features (torch.Tensor): Wav2Vec2 hidden states (batch, seq_len, hidden_size)
             
         Returns:
-            dict: Detailed attention analysis
+            torch.Tensor: Logits of shape (batch, num_classes)
         """
-        try:
-            features = self.extract_features(audio_path)
-            if features is None:
-                return {"error": "Failed to extract features"}
+        with torch.no_grad():
+            logits, _ = self.run_transformer(features.to(self.device), attention_layers=[])
+        return logits
+    
+    def detect_with_attention(self, features, attention_resolution=DETECTION_ATTENTION_RESOLUTION, logits=None):
+        """
+        Run detection and collect the attention weights of every layer from one transformer forward pass
+        
+        Args:
+            features (torch.Tensor): Wav2Vec2 hidden states (batch, seq_len, hidden_size),
+                e.g. computed once per request and shared with the classification head
+            attention_resolution (int): Size the result's last-layer attention_weights are pooled to
+            logits (torch.Tensor): Precomputed (e.g. window-aggregated) logits to classify
+                with; the features then only supply the attention weights
             
+        Returns:
+            tuple: (detection result dict, list of (batch, heads, seq_len, seq_len) attention
+                weights per layer, or None on error)
+        """
+        if features is None:
+            return {"error": "Failed to extract features"}, None
+        
+        try:
             with torch.no_grad():
-                logits, attention_weights = self.transformer_model(features)
-                
-                # Process attention weights for each layer
-                attention_analysis = {
-                    "num_layers": len(attention_weights),
-                    "num_heads": attention_weights[0].shape[1],
-                    "sequence_length": attention_weights[0].shape[2],
-                    "layer_attention": []
-                }
-                
-                for i, layer_attention in enumerate(attention_weights):
-                    # Average attention across heads for each layer
-                    avg_layer_attention = torch.mean(layer_attention, dim=1).cpu().numpy()
-                    attention_analysis["layer_attention"].append({
-                        "layer": i + 1,
-                        "attention_matrix": avg_layer_attention.tolist(),
-                        "max_attention": float(torch.max(layer_attention).cpu()),
-                        "min_attention": float(torch.min(layer_attention).cpu())
-                    })
-                
-                return attention_analysis
-                
+                feature_logits, attention_weights = self.run_transformer(features.to(self.device))
+                if logits is None:
+                    logits = feature_logits
+                return self._build_detection_result(logits, attention_weights, attention_resolution), attention_weights
         except Exception as e:
-            print(f"Error in attention analysis: {e}")
-            return {"error": str(e)}
+            print(f"Error in transformer detection: {e}")
+            return {
+                "error": str(e),
+                "prediction": "error",
+                "confidence": 0.0,
+                "is_fake": None,
+                "model_type": "transformer_attention"
+            }, None
 
 def create_transformer_detector(model_path=None):
     """
     Create a transformer-based deepfake detector
     
+    When a model path is given the detector comes from the process-wide model
+    registry, so repeated calls reuse the already loaded weights.
+    
     Args:
         model_path (str): Path to model directory
         
     Returns:
         TransformerDeepfakeDetector: Initialized detector
     """
+    if model_path:
+        from core.detect_deepfake import get_transformer_detector
+        return get_transformer_detector(model_path)
     return TransformerDeepfakeDetector(model_path)
 
 # Example usage function
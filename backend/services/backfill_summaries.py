@@ -0,0 +1,28 @@
+import argparse
+import json
+import os
+import sys
+
+# Allow running as a script from the backend directory or the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.firebase_config import initialize_firebase
+from services.database_service import DatabaseService
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Write analysis_summaries documents for analyses stored before the summary collection existed"
+    )
+    parser.add_argument("--user-id", help="Only backfill this user's analyses (default: every user)")
+    parser.add_argument("--overwrite", action="store_true", help="Rewrite summaries that already exist")
+    args = parser.parse_args(argv)
+
+    initialize_firebase()
+    counts = DatabaseService().backfill_analysis_summaries(user_id=args.user_id, overwrite=args.overwrite)
+    print(json.dumps(counts, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,37 @@
 import firebase_admin
 from firebase_admin import firestore
+from google.cloud.firestore_v1 import Query
 from google.cloud.firestore_v1.base_query import FieldFilter
 import uuid
 import json
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
 
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_WRITES = 500
+
+# Firestore allows at most 30 values in an 'in' filter
+MAX_IN_VALUES = 30
+
+# Collections written for every analysis
+ANALYSIS_COLLECTIONS = ('audio_metadata', 'analysis_results', 'result_details', 'analysis_summaries')
+
+# Fields copied into the denormalised per-analysis summary used by the history page
+SUMMARY_METADATA_FIELDS = ('user_id', 'filename', 'file_size', 'duration', 'sample_rate',
+                           'channels', 'bit_depth', 'upload_timestamp')
+SUMMARY_ANALYSIS_FIELDS = ('metadata_id', 'is_deepfake', 'confidence_score', 'features_used',
+                           'analysis_timestamp')
+SUMMARY_DETAILS_FIELDS = ('model_version', 'processing_time')
+SUMMARY_FIELDS = ('id', 'details_id') + SUMMARY_METADATA_FIELDS + SUMMARY_ANALYSIS_FIELDS + SUMMARY_DETAILS_FIELDS
+
+# Batched deletes committed in parallel
+MAX_CONCURRENT_BATCHES = 8
+
+# History page size limits
+DEFAULT_HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+
 class DatabaseService:
     """Service for interacting with Firebase Firestore Database"""
     
@@ -26,8 +52,8 @@ class DatabaseService:
             file_size: Size of the file in bytes
             duration: Duration of the audio in seconds
             sample_rate: Sample rate of the audio
-            channels: Number of audio channels (default: 2)
-            bit_depth: Bit depth of the audio (default: "16 bits")
+            channels: Number of audio channels, as probed from the file header (default: 2)
+            bit_depth: Bit depth of the audio, e.g. "24 bits" or "compressed" (default: "16 bits")
             upload_timestamp: Custom timestamp (default: current time)
             
         Returns:
@@ -118,10 +144,167 @@ class DatabaseService:
         
         return details_id
     
+    @staticmethod
+    def build_analysis_summary(metadata: Optional[Dict[str, Any]], analysis: Dict[str, Any],
+                               details: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Build the denormalised summary of one analysis
+        
+        The summary is keyed by the analysis ID and holds everything the history
+        page lists, so a user's history is one query instead of a join over
+        three collections.
+        
+        Args:
+            metadata: The audio metadata document (None if it is missing)
+            analysis: The analysis result document
+            details: The result details document (None if it is missing)
+            
+        Returns:
+            dict: Summary document
+        """
+        summary = {field: (metadata or {}).get(field) for field in SUMMARY_METADATA_FIELDS}
+        summary.update({field: analysis.get(field) for field in SUMMARY_ANALYSIS_FIELDS})
+        summary.update({field: (details or {}).get(field) for field in SUMMARY_DETAILS_FIELDS})
+        summary['id'] = analysis['id']
+        summary['details_id'] = details.get('id') if details else None
+        return summary
+    
+    @staticmethod
+    def build_analysis_documents(user_id: str, filename: str, file_size: int, duration: float,
+                                 sample_rate: int, is_deepfake: bool, confidence_score: float,
+                                 features_used: List[str], feature_scores: Dict[str, Any],
+                                 model_version: str, processing_time: float, channels: int = 2,
+                                 bit_depth: str = "16 bits", timestamp: str = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Build the linked metadata, analysis, details and summary documents of one analysis
+        
+        IDs are generated client-side so the documents can be written in a
+        single batch.
+        
+        Args:
+            user_id: The ID of the user who uploaded the audio
+            filename: The name of the uploaded file
+            file_size: Size of the file in bytes
+            duration: Duration of the audio in seconds
+            sample_rate: Sample rate of the audio
+            is_deepfake: Boolean indicating if the audio is a deepfake
+            confidence_score: Confidence score of the prediction (0-1)
+            features_used: List of features used in the analysis
+            feature_scores: Dictionary of individual feature scores
+            model_version: Version of the ML model used
+            processing_time: Time taken to process in milliseconds
+            channels: Number of audio channels
+            bit_depth: Bit depth of the audio
+            timestamp: Custom upload/analysis timestamp (default: current time)
+            
+        Returns:
+            dict: Documents keyed by collection name
+        """
+        timestamp = timestamp if timestamp else datetime.datetime.now().isoformat()
+        metadata_id = str(uuid.uuid4())
+        analysis_id = str(uuid.uuid4())
+        details_id = str(uuid.uuid4())
+        
+        documents = {
+            'audio_metadata': {
+                'id': metadata_id,
+                'user_id': user_id,
+                'filename': filename,
+                'file_size': file_size,
+                'duration': duration,
+                'sample_rate': sample_rate,
+                'channels': channels,
+                'bit_depth': bit_depth,
+                'upload_timestamp': timestamp,
+            },
+            'analysis_results': {
+                'id': analysis_id,
+                'metadata_id': metadata_id,
+                'is_deepfake': is_deepfake,
+                'confidence_score': confidence_score,
+                'features_used': features_used,
+                'analysis_timestamp': timestamp,
+            },
+            'result_details': {
+                'id': details_id,
+                'analysis_id': analysis_id,
+                'feature_scores': feature_scores,
+                'model_version': model_version,
+                'processing_time': processing_time,
+                'created_at': timestamp,
+            },
+        }
+        documents['analysis_summaries'] = DatabaseService.build_analysis_summary(
+            documents['audio_metadata'], documents['analysis_results'], documents['result_details']
+        )
+        return documents
+    
+    def store_analyses_bulk(self, analyses: List[Dict[str, Dict[str, Any]]]) -> List[Dict[str, str]]:
+        """
+        Write many analyses with batched writes
+        
+        The documents of one analysis always go into the same batch, and a
+        batch is committed before it would exceed MAX_BATCH_WRITES.
+        
+        Args:
+            analyses: Documents from build_analysis_documents
+            
+        Returns:
+            List of dicts with metadata_id, analysis_id and details_id, in input order
+        """
+        batch = self.db.batch()
+        pending_writes = 0
+        
+        for documents in analyses:
+            if pending_writes + len(documents) > MAX_BATCH_WRITES:
+                batch.commit()
+                batch = self.db.batch()
+                pending_writes = 0
+            for collection, document in documents.items():
+                batch.set(self.db.collection(collection).document(document['id']), document)
+                pending_writes += 1
+        
+        if pending_writes:
+            batch.commit()
+        
+        return [
+            {
+                'metadata_id': documents['audio_metadata']['id'],
+                'analysis_id': documents['analysis_results']['id'],
+                'details_id': documents['result_details']['id'],
+            }
+            for documents in analyses
+        ]
+    
+    def _query_in(self, collection: str, field: str, values: List[str]) -> List[Any]:
+        """
+        Fetch the documents whose field matches any of the values
+        
+        Values are split into chunks of MAX_IN_VALUES, so N values cost
+        ceil(N / 30) queries instead of N.
+        
+        Args:
+            collection: Collection to query
+            field: Field to match
+            values: Values to match
+            
+        Returns:
+            List of document snapshots
+        """
+        documents = []
+        values = list(dict.fromkeys(values))
+        for start in range(0, len(values), MAX_IN_VALUES):
+            chunk = values[start:start + MAX_IN_VALUES]
+            documents.extend(self.db.collection(collection).where(filter=FieldFilter(field, 'in', chunk)).stream())
+        return documents
+    
     def get_user_analyses(self, user_id: str) -> List[Dict[str, Any]]:
         """
         Get all analyses for a specific user
         
+        Analyses and details are fetched in bulk with chunked 'in' queries
+        rather than one query per metadata and per analysis record.
+        
         Args:
             user_id: ID of the user
             
@@ -129,36 +312,175 @@ class DatabaseService:
             List of analysis records
         """
         # First get metadata records for the user
-        metadata_query = self.db.collection('audio_metadata').where(filter=FieldFilter('user_id', '==', user_id)).stream()
+        metadata_by_id = {
+            metadata_doc.id: metadata_doc.to_dict()
+            for metadata_doc in self.db.collection('audio_metadata').where(filter=FieldFilter('user_id', '==', user_id)).stream()
+        }
         
-        if not metadata_query:
+        if not metadata_by_id:
             return []
+        
+        # Then every analysis of those metadata records
+        analysis_docs = self._query_in('analysis_results', 'metadata_id', list(metadata_by_id))
+        
+        # And the details of every analysis (the first one if there are several)
+        details_by_analysis = {}
+        for details_doc in self._query_in('result_details', 'analysis_id', [doc.id for doc in analysis_docs]):
+            details = details_doc.to_dict()
+            details_by_analysis.setdefault(details.get('analysis_id'), details)
+        
+        analyses = []
+        for analysis_doc in analysis_docs:
+            analysis = analysis_doc.to_dict()
+            
+            # Merge metadata and analysis into one record
+            analysis_with_metadata = {**metadata_by_id.get(analysis.get('metadata_id'), {}), **analysis}
+            if analysis_doc.id in details_by_analysis:
+                analysis_with_metadata['details'] = details_by_analysis[analysis_doc.id]
             
+            analyses.append(analysis_with_metadata)
+        
+        return analyses
+    
+    def list_user_analyses(self, user_id: str, limit: int = DEFAULT_HISTORY_PAGE_SIZE,
+                           cursor: Optional[str] = None, order: str = 'desc',
+                           is_deepfake: Optional[bool] = None,
+                           date_from: Optional[str] = None, date_to: Optional[str] = None,
+                           model_version: Optional[str] = None,
+                           fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Get one page of a user's analysis summaries, newest first by default
+        
+        Reads only the analysis_summaries collection, so large feature scores
+        (e.g. attention matrices) are never loaded. Filters and the field
+        projection are applied by Firestore.
+        
+        Args:
+            user_id: ID of the user
+            limit: Maximum number of analyses in the page
+            cursor: next_cursor of the previous page (None for the first page)
+            order: 'desc' (newest first) or 'asc' by analysis_timestamp
+            is_deepfake: Only analyses with this verdict
+            date_from: Only analyses at or after this ISO timestamp
+            date_to: Only analyses at or before this ISO timestamp
+            model_version: Only analyses made by this model version
+            fields: Summary fields to return (default: all); 'id' is always included
+            
+        Returns:
+            dict: 'analyses' and 'next_cursor' (None on the last page)
+            
+        Raises:
+            ValueError: If the cursor or a field name is invalid
+        """
+        collection = self.db.collection('analysis_summaries')
+        query = collection.where(filter=FieldFilter('user_id', '==', user_id))
+        if is_deepfake is not None:
+            query = query.where(filter=FieldFilter('is_deepfake', '==', is_deepfake))
+        if model_version:
+            query = query.where(filter=FieldFilter('model_version', '==', model_version))
+        if date_from:
+            query = query.where(filter=FieldFilter('analysis_timestamp', '>=', date_from))
+        if date_to:
+            query = query.where(filter=FieldFilter('analysis_timestamp', '<=', date_to))
+        direction = Query.ASCENDING if order == 'asc' else Query.DESCENDING
+        query = query.order_by('analysis_timestamp', direction=direction)
+        
+        if fields:
+            unknown = [field for field in fields if field not in SUMMARY_FIELDS]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            query = query.select([field for field in fields if field != 'id'] or ['analysis_timestamp'])
+        
+        if cursor:
+            cursor_doc = collection.document(cursor).get()
+            if not cursor_doc.exists or cursor_doc.get('user_id') != user_id:
+                raise ValueError("Invalid cursor")
+            query = query.start_after(cursor_doc)
+        
+        # One extra document tells whether another page exists
+        docs = list(query.limit(limit + 1).stream())
+        has_more = len(docs) > limit
+        docs = docs[:limit]
+        
         analyses = []
+        for doc in docs:
+            summary = doc.to_dict()
+            if fields and 'analysis_timestamp' not in fields:
+                summary.pop('analysis_timestamp', None)
+            summary['id'] = doc.id
+            analyses.append(summary)
+        
+        return {
+            'analyses': analyses,
+            'next_cursor': docs[-1].id if has_more else None
+        }
+    
+    def backfill_analysis_summaries(self, user_id: str = None, overwrite: bool = False) -> Dict[str, int]:
+        """
+        Write the summary documents of analyses stored before summaries existed
+        
+        Analyses are read in bulk per user and summaries are written with
+        batched writes. Re-running is safe: existing summaries are skipped
+        unless overwrite is set.
         
-        # For each metadata, get the associated analysis
-        for metadata_doc in metadata_query:
+        Args:
+            user_id: Only backfill this user's analyses (default: every user)
+            overwrite: Rewrite summaries that already exist
+            
+        Returns:
+            dict: Number of analyses scanned, summaries written and skipped
+        """
+        counts = {'scanned': 0, 'written': 0, 'skipped': 0}
+        
+        metadata_query = self.db.collection('audio_metadata')
+        if user_id:
+            metadata_query = metadata_query.where(filter=FieldFilter('user_id', '==', user_id))
+        
+        # Group the metadata by user so every user is backfilled with a few bulk reads
+        metadata_by_user = {}
+        for metadata_doc in metadata_query.stream():
             metadata = metadata_doc.to_dict()
-            metadata_id = metadata_doc.id
+            metadata['id'] = metadata_doc.id
+            metadata_by_user.setdefault(metadata.get('user_id'), {})[metadata_doc.id] = metadata
+        
+        for metadata_by_id in metadata_by_user.values():
+            analyses = []
+            for analysis_doc in self._query_in('analysis_results', 'metadata_id', list(metadata_by_id)):
+                analysis = analysis_doc.to_dict()
+                analysis['id'] = analysis_doc.id
+                analyses.append(analysis)
+            counts['scanned'] += len(analyses)
             
-            # Query for analyses with this metadata_id
-            analysis_query = self.db.collection('analysis_results').where(filter=FieldFilter('metadata_id', '==', metadata_id)).stream()
+            if not overwrite and analyses:
+                summary_refs = [self.db.collection('analysis_summaries').document(a['id']) for a in analyses]
+                existing = {doc.id for doc in self.db.get_all(summary_refs) if doc.exists}
+                counts['skipped'] += len(existing)
+                analyses = [analysis for analysis in analyses if analysis['id'] not in existing]
             
-            for analysis_doc in analysis_query:
-                analysis = analysis_doc.to_dict()
-                analysis_id = analysis_doc.id
-                
-                # Merge metadata and analysis into one record
-                analysis_with_metadata = {**metadata, **analysis}
-                
-                # Get details if available
-                details_query = self.db.collection('result_details').where(filter=FieldFilter('analysis_id', '==', analysis_id)).limit(1).stream()
-                for details_doc in details_query:
-                    analysis_with_metadata['details'] = details_doc.to_dict()
-                
-                analyses.append(analysis_with_metadata)
+            details_by_analysis = {}
+            for details_doc in self._query_in('result_details', 'analysis_id', [a['id'] for a in analyses]):
+                details = details_doc.to_dict()
+                details['id'] = details_doc.id
+                details_by_analysis.setdefault(details.get('analysis_id'), details)
+            
+            batch = self.db.batch()
+            pending_writes = 0
+            for analysis in analyses:
+                summary = self.build_analysis_summary(
+                    metadata_by_id.get(analysis.get('metadata_id')), analysis,
+                    details_by_analysis.get(analysis['id'])
+                )
+                batch.set(self.db.collection('analysis_summaries').document(analysis['id']), summary)
+                pending_writes += 1
+                if pending_writes == MAX_BATCH_WRITES:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending_writes = 0
+            if pending_writes:
+                batch.commit()
+            counts['written'] += len(analyses)
         
-        return analyses
+        return counts
     
     def get_analysis(self, analysis_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -204,8 +526,6 @@ class DatabaseService:
         Returns:
             List of created analysis IDs
         """
-        analysis_ids = []
-        
         # Create dummy audio metadata
         dummy_files = [
             {"name": "audio_clip_10.wav", "size": 1245670, "duration": 15.3, "sample_rate": 44100, "date": "2025-02-07", "is_fake": False, "confidence": 0.97},
@@ -213,29 +533,11 @@ class DatabaseService:
             {"name": "audio_clip_08.wav", "size": 567890, "duration": 24.8, "sample_rate": 44100, "date": "2025-01-30", "is_fake": False, "confidence": 1.0}
         ]
         
+        analyses = []
         for file in dummy_files:
-            # Create metadata with specific upload date
-            metadata_id = self.create_audio_metadata(
-                user_id=user_id,
-                filename=file["name"],
-                file_size=file["size"],
-                duration=file["duration"],
-                sample_rate=file["sample_rate"],
-                upload_timestamp=file["date"]            )
-            
-            # Create analysis result
             is_fake = file["is_fake"]
-            confidence = file["confidence"]
             features = ["mfcc", "spectral_centroid", "zero_crossing_rate", "spectral_rolloff"]
             
-            analysis_id = self.create_analysis_result(
-                metadata_id=metadata_id,
-                is_deepfake=is_fake,
-                confidence_score=confidence,
-                features_used=features,
-                analysis_timestamp=file["date"]  # Use the same date for both metadata and analysis
-            )
-            
             # Create result details
             feature_scores = {
                 "mfcc_score": 0.88 if is_fake else 0.12,
@@ -243,69 +545,145 @@ class DatabaseService:
                 "temporal_score": 0.91 if is_fake else 0.08
             }
             
-            self.create_result_details(
-                analysis_id=analysis_id,
+            # Use the same date for both metadata and analysis
+            analyses.append(self.build_analysis_documents(
+                user_id=user_id,
+                filename=file["name"],
+                file_size=file["size"],
+                duration=file["duration"],
+                sample_rate=file["sample_rate"],
+                is_deepfake=is_fake,
+                confidence_score=file["confidence"],
+                features_used=features,
                 feature_scores=feature_scores,
                 model_version="v1.2.0",
-                processing_time=1250.45
-            )
-            
-            analysis_ids.append(analysis_id)
+                processing_time=1250.45,
+                timestamp=file["date"]
+            ))
         
-        return analysis_ids
+        return [ids['analysis_id'] for ids in self.store_analyses_bulk(analyses)]
     
-    def delete_analysis(self, analysis_id: str) -> bool:
+    def delete_analysis(self, analysis_id: str, user_id: str = None) -> bool:
         """
-        Delete an analysis and all related data (metadata and details)
+        Delete an analysis and all related data (metadata, details and summary)
         
         Args:
             analysis_id: ID of the analysis to delete
+            user_id: Only delete the analysis if it belongs to this user
             
         Returns:
             bool: True if successful, False otherwise
         """
+        return self.delete_multiple_analyses([analysis_id], user_id)[analysis_id]
+    
+    def _commit_batch(self, refs: List[Any]) -> bool:
         try:
-            # First, get the analysis to determine the metadata ID
-            analysis_doc = self.db.collection('analysis_results').document(analysis_id).get()
-            
-            if not analysis_doc.exists:
-                return False
-                
-            analysis = analysis_doc.to_dict()
-            metadata_id = analysis.get('metadata_id')
-            
-            # Delete related details
-            details_query = self.db.collection('result_details').where(filter=FieldFilter('analysis_id', '==', analysis_id)).stream()
-            for details_doc in details_query:
-                details_doc.reference.delete()
-            
-            # Delete the analysis result
-            self.db.collection('analysis_results').document(analysis_id).delete()
-            
-            # Check if there are any other analyses using this metadata
-            other_analyses = list(self.db.collection('analysis_results').where(filter=FieldFilter('metadata_id', '==', metadata_id)).limit(1).stream())
-              # If no other analyses reference this metadata, delete the metadata too
-            if not other_analyses and metadata_id:
-                self.db.collection('audio_metadata').document(metadata_id).delete()
+            batch = self.db.batch()
+            for ref in refs:
+                batch.delete(ref)
+            batch.commit()
             return True
-            
         except Exception as e:
-            print(f"Error deleting analysis: {str(e)}")
+            print(f"Error deleting analyses: {str(e)}")
             return False
     
-    def delete_multiple_analyses(self, analysis_ids: List[str]) -> Dict[str, bool]:
+    def _commit_batches_concurrently(self, batches: List[List[Any]]) -> List[bool]:
+        if len(batches) <= 1:
+            return [self._commit_batch(refs) for refs in batches]
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_BATCHES, len(batches))) as pool:
+            return list(pool.map(self._commit_batch, batches))
+    
+    def delete_multiple_analyses(self, analysis_ids: List[str], user_id: str = None) -> Dict[str, bool]:
         """
         Delete multiple analyses and their related data
         
+        All analyses and their metadata are prefetched with one get_all call and
+        the details with chunked 'in' queries. Metadata that no remaining
+        analysis references is found in memory. Deletes are grouped into write
+        batches of up to MAX_BATCH_WRITES, and the batches are committed
+        concurrently. Metadata is deleted after all of its analyses were.
+        Analyses still in the write-behind spool are discarded from it first.
+        
         Args:
             analysis_ids: List of analysis IDs to delete
+            user_id: Only delete analyses that belong to this user
             
         Returns:
             dict: Map of analysis ID to success/failure
         """
-        results = {}
+        analysis_ids = list(dict.fromkeys(analysis_ids))
+        results = {analysis_id: False for analysis_id in analysis_ids}
+        if not analysis_ids:
+            return results
         
-        for analysis_id in analysis_ids:
-            results[analysis_id] = self.delete_analysis(analysis_id)
+        # Analyses still waiting in the write-behind spool must not be written back later
+        from services.persistence import analysis_writer
+        try:
+            spooled = set(analysis_writer.discard(analysis_ids, user_id))
+        except Exception as e:
+            print(f"Error discarding spooled analyses: {str(e)}")
+            return results
+        
+        try:
+            # Prefetch the analyses and their metadata
+            analysis_refs = [self.db.collection('analysis_results').document(analysis_id) for analysis_id in analysis_ids]
+            analyses = {doc.id: doc.to_dict() for doc in self.db.get_all(analysis_refs) if doc.exists}
+            
+            metadata_ids = {analysis.get('metadata_id') for analysis in analyses.values() if analysis.get('metadata_id')}
+            metadata_refs = [self.db.collection('audio_metadata').document(metadata_id) for metadata_id in metadata_ids]
+            metadata_by_id = {doc.id: doc.to_dict() for doc in self.db.get_all(metadata_refs) if doc.exists} if metadata_refs else {}
+            
+            # Only delete analyses the user owns
+            if user_id:
+                analyses = {
+                    analysis_id: analysis for analysis_id, analysis in analyses.items()
+                    if metadata_by_id.get(analysis.get('metadata_id'), {}).get('user_id') == user_id
+                }
             
+            details_refs = {}
+            for details_doc in self._query_in('result_details', 'analysis_id', list(analyses)):
+                details_refs.setdefault(details_doc.to_dict().get('analysis_id'), []).append(details_doc.reference)
+            
+            # Every analysis still referencing the metadata, to find metadata left orphaned
+            referencing = {}
+            for sibling_doc in self._query_in('analysis_results', 'metadata_id',
+                                              [analysis.get('metadata_id') for analysis in analyses.values()
+                                               if analysis.get('metadata_id')]):
+                referencing.setdefault(sibling_doc.to_dict().get('metadata_id'), set()).add(sibling_doc.id)
+        except Exception as e:
+            print(f"Error preparing analyses for deletion: {str(e)}")
+            return results
+        
+        # Group the deletes so that an analysis and its details share one batch
+        batches, batch_ids = [], []
+        for analysis_id in analyses:
+            refs = details_refs.get(analysis_id, []) + [
+                self.db.collection('analysis_results').document(analysis_id),
+                self.db.collection('analysis_summaries').document(analysis_id),
+            ]
+            if not batches or len(batches[-1]) + len(refs) > MAX_BATCH_WRITES:
+                batches.append([])
+                batch_ids.append([])
+            batches[-1].extend(refs)
+            batch_ids[-1].append(analysis_id)
+        
+        for ids, committed in zip(batch_ids, self._commit_batches_concurrently(batches)):
+            for analysis_id in ids:
+                results[analysis_id] = committed
+        
+        # Spooled analyses that never reached Firestore are gone once discarded
+        for analysis_id in spooled - set(analyses):
+            results[analysis_id] = True
+        
+        # Delete metadata whose analyses are now all gone
+        deleted = {analysis_id for analysis_id, success in results.items() if success}
+        orphaned = [
+            self.db.collection('audio_metadata').document(metadata_id)
+            for metadata_id, analysis_ids_for_metadata in referencing.items()
+            if metadata_id in metadata_by_id and analysis_ids_for_metadata <= deleted
+        ]
+        self._commit_batches_concurrently([
+            orphaned[start:start + MAX_BATCH_WRITES] for start in range(0, len(orphaned), MAX_BATCH_WRITES)
+        ])
+        
         return results
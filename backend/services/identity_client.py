@@ -0,0 +1,167 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Dict, Any
+
+import httpx
+
+# Identity REST API configuration (point the base URL at a local stand-in for load tests)
+IDENTITY_BASE_URL = os.getenv("VOCALGUARD_IDENTITY_BASE_URL", "https://identitytoolkit.googleapis.com")
+IDENTITY_CONNECT_TIMEOUT = float(os.getenv("VOCALGUARD_IDENTITY_CONNECT_TIMEOUT_S", "3"))
+IDENTITY_TIMEOUT = float(os.getenv("VOCALGUARD_IDENTITY_TIMEOUT_S", "10"))
+IDENTITY_MAX_CONNECTIONS = int(os.getenv("VOCALGUARD_IDENTITY_MAX_CONNECTIONS", "100"))
+IDENTITY_KEEPALIVE_SECONDS = float(os.getenv("VOCALGUARD_IDENTITY_KEEPALIVE_S", "30"))
+
+# Retries: per request, and overall at most this share of recent requests
+IDENTITY_MAX_RETRIES = int(os.getenv("VOCALGUARD_IDENTITY_MAX_RETRIES", "2"))
+RETRY_BUDGET_RATIO = float(os.getenv("VOCALGUARD_IDENTITY_RETRY_RATIO", "0.2"))
+RETRY_BUDGET_MIN_PER_WINDOW = 10
+RETRY_BUDGET_WINDOW = 10.0  # seconds
+RETRY_BASE_DELAY = 0.1  # seconds, doubled per attempt
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RetryBudget:
+    """
+    Limits retries to a share of recent requests
+
+    Allows at most min_per_window + ratio * requests retries in any window,
+    so an identity-service outage does not multiply the login traffic.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_per_window: int = RETRY_BUDGET_MIN_PER_WINDOW,
+                 window: float = RETRY_BUDGET_WINDOW):
+        self.ratio = ratio
+        self.min_per_window = min_per_window
+        self.window = window
+        self._requests = deque()
+        self._retries = deque()
+
+    def _trim(self, now: float):
+        for events in (self._requests, self._retries):
+            while events and events[0] < now - self.window:
+                events.popleft()
+
+    def record_request(self):
+        now = time.monotonic()
+        self._trim(now)
+        self._requests.append(now)
+
+    def try_retry(self) -> bool:
+        """Take a retry from the budget; False if the budget is spent"""
+        now = time.monotonic()
+        self._trim(now)
+        if len(self._retries) >= self.min_per_window + self.ratio * len(self._requests):
+            return False
+        self._retries.append(now)
+        return True
+
+
+class IdentityClient:
+    """Pooled async client for the Firebase identity REST API"""
+
+    def __init__(self, base_url: str = IDENTITY_BASE_URL, max_retries: int = IDENTITY_MAX_RETRIES):
+        """
+        Initialize the client
+
+        The underlying httpx.AsyncClient is created on first use, inside the
+        event loop (and worker process) that uses it.
+
+        Args:
+            base_url: Base URL of the identity API
+            max_retries: Retries per request on connection errors and 429/5xx responses
+        """
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.retry_budget = RetryBudget()
+        self._client = None
+        self._stats = {"requests": 0, "retries": 0, "retries_denied": 0, "errors": 0, "total_time": 0.0}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(IDENTITY_TIMEOUT, connect=IDENTITY_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=IDENTITY_MAX_CONNECTIONS,
+                    max_keepalive_connections=IDENTITY_MAX_CONNECTIONS,
+                    keepalive_expiry=IDENTITY_KEEPALIVE_SECONDS
+                )
+            )
+        return self._client
+
+    async def _post(self, path: str, params: Dict[str, Any], payload: Dict[str, Any]) -> httpx.Response:
+        client = self._get_client()
+        self.retry_budget.record_request()
+        self._stats["requests"] += 1
+        start_time = time.time()
+
+        attempt = 0
+        try:
+            while True:
+                try:
+                    response = await client.post(path, params=params, json=payload)
+                    if response.status_code not in RETRYABLE_STATUS_CODES:
+                        return response
+                    error = None
+                except httpx.TransportError as e:
+                    response, error = None, e
+
+                if attempt >= self.max_retries or not self.retry_budget.try_retry():
+                    if attempt < self.max_retries:
+                        self._stats["retries_denied"] += 1
+                    if error is not None:
+                        self._stats["errors"] += 1
+                        raise error
+                    return response
+
+                attempt += 1
+                self._stats["retries"] += 1
+                delay = RETRY_BASE_DELAY * (2 ** (attempt - 1))
+                await asyncio.sleep(delay + random.uniform(0, delay))
+        finally:
+            self._stats["total_time"] += time.time() - start_time
+
+    async def sign_in_with_password(self, email: str, password: str, api_key: str) -> httpx.Response:
+        """
+        Sign a user in with email and password
+
+        Args:
+            email: The user's email
+            password: The user's password
+            api_key: Firebase Web API key
+
+        Returns:
+            httpx.Response: The identity API response (idToken, localId, ... on success)
+        """
+        return await self._post(
+            "/v1/accounts:signInWithPassword",
+            params={"key": api_key},
+            payload={"email": email, "password": password, "returnSecureToken": True}
+        )
+
+    async def aclose(self):
+        """Close the pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get identity client metrics
+
+        Returns:
+            dict: Request, retry and error counts and the average request time
+        """
+        stats = dict(self._stats)
+        stats["avg_request_ms"] = (stats.pop("total_time") * 1000 / stats["requests"]
+                                   if stats["requests"] else 0.0)
+        stats["base_url"] = self.base_url
+        return stats
+
+
+# Shared client for the API
+identity_client = IdentityClient()
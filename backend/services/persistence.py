@@ -0,0 +1,327 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Any
+
+from services.database_service import DatabaseService, MAX_BATCH_WRITES, ANALYSIS_COLLECTIONS
+
+# Persistence configuration
+PERSISTENCE_MODE = os.getenv("VOCALGUARD_PERSISTENCE", "sync").lower()  # "sync" or "write_behind"
+FLUSH_INTERVAL = float(os.getenv("VOCALGUARD_PERSISTENCE_FLUSH_MS", "200")) / 1000
+MAX_RETRY_DELAY = float(os.getenv("VOCALGUARD_PERSISTENCE_MAX_RETRY_S", "60"))
+# A flusher that dies mid-write leaves its claim behind; other workers take the rows over after this long
+CLAIM_TIMEOUT = float(os.getenv("VOCALGUARD_PERSISTENCE_CLAIM_S", "120"))
+DISCARD_CHUNK_SIZE = 500  # IDs per statement, below SQLite's bound-parameter limit
+
+# Durable spool for analyses waiting to be written (shared with the other on-disk caches)
+_cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
+SPOOL_PATH = os.getenv("VOCALGUARD_PERSISTENCE_SPOOL") or os.path.join(_cache_dir, "persistence_spool.sqlite3")
+
+# Every analysis is one document per collection, so this many fit in one Firestore batch
+ANALYSES_PER_FLUSH = MAX_BATCH_WRITES // len(ANALYSIS_COLLECTIONS)
+
+
+class AnalysisWriter:
+    """
+    Persists analysis documents to Firestore, either inline or write-behind
+
+    In "sync" mode every analysis is written with one atomic batch inside the
+    request. In "write_behind" mode analyses are appended to a local SQLite
+    spool and the request returns immediately; a background flusher writes
+    spooled analyses from many requests together and retries with backoff
+    while Firestore is slow or unavailable. The spool survives restarts.
+    Document IDs are generated client-side, so they are known before the write
+    and a re-sent batch simply overwrites the same documents.
+
+    Every pre-fork worker runs a flusher on the same spool, so a flusher claims
+    its rows in one write transaction before sending them and no other worker
+    sends those rows while the claim holds. Analyses deleted while still
+    spooled are discarded from the spool, and any that were in flight are
+    deleted again once their write lands.
+    """
+
+    def __init__(self, mode: str = PERSISTENCE_MODE, spool_path: str = SPOOL_PATH,
+                 flush_interval: float = FLUSH_INTERVAL, poll_interval: float = None):
+        """
+        Initialize the writer
+
+        Args:
+            mode: "sync" or "write_behind"
+            spool_path: Path to the SQLite spool (write-behind mode)
+            flush_interval: Seconds the flusher waits for more analyses before writing
+            poll_interval: Seconds an idle flusher waits before checking the spool
+                anyway, for rows spooled by other workers or whose claim expired
+                (default: a quarter of the claim timeout)
+        """
+        if mode not in ("sync", "write_behind"):
+            raise ValueError(f"Unknown persistence mode: {mode}")
+
+        self.mode = mode
+        self.spool_path = spool_path
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval or max(flush_interval, CLAIM_TIMEOUT / 4)
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {"written": 0, "spooled": 0, "flushes": 0, "failed_flushes": 0,
+                       "total_flush_time": 0.0, "last_error": None}
+
+        if mode == "write_behind":
+            os.makedirs(os.path.dirname(spool_path), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS spool ("
+                    "seq INTEGER PRIMARY KEY AUTOINCREMENT, documents TEXT NOT NULL, "
+                    "created_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0)"
+                )
+                # Columns added after the first release of the spool
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(spool)")}
+                for column, definition in (("analysis_id", "TEXT"), ("user_id", "TEXT"),
+                                           ("claimed_until", "REAL NOT NULL DEFAULT 0"),
+                                           ("discarded", "INTEGER NOT NULL DEFAULT 0")):
+                    if column not in columns:
+                        conn.execute(f"ALTER TABLE spool ADD COLUMN {column} {definition}")
+                conn.execute(
+                    "UPDATE spool SET analysis_id = json_extract(documents, '$.analysis_results.id'), "
+                    "user_id = json_extract(documents, '$.audio_metadata.user_id') WHERE analysis_id IS NULL"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_spool_analysis ON spool (analysis_id)")
+
+    def _connect(self):
+        # One short-lived connection per call keeps this safe across threads and processes
+        return sqlite3.connect(self.spool_path, timeout=10.0)
+
+    @contextmanager
+    def _transaction(self):
+        """Connection holding the spool's write lock until the block ends (commits on success)"""
+        conn = sqlite3.connect(self.spool_path, timeout=10.0, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _update_stats(self, **changes):
+        with self._stats_lock:
+            for name, value in changes.items():
+                if name == "last_error":
+                    self._stats[name] = value
+                else:
+                    self._stats[name] += value
+
+    @staticmethod
+    def _ids(documents: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        return {
+            'metadata_id': documents['audio_metadata']['id'],
+            'analysis_id': documents['analysis_results']['id'],
+            'details_id': documents['result_details']['id'],
+        }
+
+    def persist(self, documents: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Persist the documents of one analysis
+
+        Args:
+            documents: Documents from DatabaseService.build_analysis_documents
+
+        Returns:
+            dict: metadata_id, analysis_id and details_id
+        """
+        return self.persist_many([documents])[0]
+
+    def persist_many(self, analyses: List[Dict[str, Dict[str, Any]]]) -> List[Dict[str, str]]:
+        """
+        Persist the documents of several analyses
+
+        Args:
+            analyses: Documents from DatabaseService.build_analysis_documents
+
+        Returns:
+            List of dicts with metadata_id, analysis_id and details_id, in input order
+        """
+        if not analyses:
+            return []
+
+        if self.mode == "sync":
+            ids = DatabaseService().store_analyses_bulk(analyses)
+            self._update_stats(written=len(analyses))
+            return ids
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO spool (documents, created_at, analysis_id, user_id) VALUES (?, ?, ?, ?)",
+                [(json.dumps(documents), now, documents['analysis_results']['id'],
+                  documents['audio_metadata'].get('user_id')) for documents in analyses]
+            )
+        self._update_stats(spooled=len(analyses))
+        self._wakeup.set()
+        return [self._ids(documents) for documents in analyses]
+
+    def flush_once(self) -> int:
+        """
+        Write one Firestore batch of spooled analyses
+
+        Returns:
+            int: Number of analyses written
+
+        Raises:
+            Exception: The Firestore error if the write failed (entries stay spooled)
+        """
+        # Claim the rows so flushers in other workers skip them
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT seq, documents FROM spool WHERE claimed_until < ? AND discarded = 0 "
+                "ORDER BY seq LIMIT ?", (now, ANALYSES_PER_FLUSH)
+            ).fetchall()
+            conn.executemany("UPDATE spool SET claimed_until = ? WHERE seq = ?",
+                             [(now + CLAIM_TIMEOUT, seq) for seq, _ in rows])
+        if not rows:
+            return 0
+        seqs = [(seq,) for seq, _ in rows]
+
+        start_time = time.time()
+        try:
+            DatabaseService().store_analyses_bulk([json.loads(documents) for _, documents in rows])
+        except Exception as e:
+            with self._transaction() as conn:
+                conn.executemany("UPDATE spool SET attempts = attempts + 1, claimed_until = 0 WHERE seq = ?", seqs)
+                # Analyses deleted while in flight need not be written at all
+                conn.executemany("DELETE FROM spool WHERE seq = ? AND discarded = 1", seqs)
+            self._update_stats(failed_flushes=1, last_error=str(e))
+            raise
+
+        with self._transaction() as conn:
+            placeholders = ",".join("?" * len(seqs))
+            discarded = [row[0] for row in conn.execute(
+                f"SELECT analysis_id FROM spool WHERE discarded = 1 AND seq IN ({placeholders})",
+                [seq for seq, in seqs]
+            )]
+            conn.executemany("DELETE FROM spool WHERE seq = ?", seqs)
+        self._update_stats(written=len(rows), flushes=1, total_flush_time=time.time() - start_time)
+
+        if discarded:
+            # Deleted while this write was in flight; the write brought them back
+            DatabaseService().delete_multiple_analyses(discarded)
+        return len(rows)
+
+    def discard(self, analysis_ids: List[str], user_id: str = None) -> List[str]:
+        """
+        Drop spooled analyses that are being deleted, so a later flush does not write them back
+
+        Analyses a flusher is writing right now are marked instead, and deleted
+        again once that write has landed. Call this before deleting the
+        analyses from Firestore.
+
+        Args:
+            analysis_ids: IDs of the analyses being deleted
+            user_id: Only discard analyses that belong to this user
+
+        Returns:
+            List of the IDs that were still spooled
+        """
+        if self.mode != "write_behind" or not analysis_ids:
+            return []
+
+        now = time.time()
+        analysis_ids = list(analysis_ids)
+        spooled = []
+        with self._transaction() as conn:
+            for start in range(0, len(analysis_ids), DISCARD_CHUNK_SIZE):
+                chunk = analysis_ids[start:start + DISCARD_CHUNK_SIZE]
+                condition = f"analysis_id IN ({','.join('?' * len(chunk))})" + (" AND user_id = ?" if user_id else "")
+                params = chunk + ([user_id] if user_id else [])
+                spooled.extend(row[0] for row in conn.execute(
+                    f"SELECT analysis_id FROM spool WHERE {condition}", params
+                ))
+                conn.execute(f"DELETE FROM spool WHERE {condition} AND claimed_until < ?", params + [now])
+                conn.execute(f"UPDATE spool SET discarded = 1 WHERE {condition}", params)
+        return spooled
+
+    def _flush_loop(self):
+        retry_delay = self.flush_interval
+        while not self._stop.is_set():
+            try:
+                if self.flush_once() >= ANALYSES_PER_FLUSH:
+                    # More analyses are waiting; write the next batch right away
+                    continue
+                retry_delay = self.flush_interval
+            except Exception as e:
+                print(f"Error flushing analyses to Firestore (retrying in {retry_delay:.1f} s): {e}")
+                self._stop.wait(retry_delay)
+                retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+                continue
+
+            # Wait for new analyses, then give concurrent requests a moment to add theirs.
+            # Other workers spool without waking this flusher, so poll the spool regularly too
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            self._stop.wait(self.flush_interval)
+
+    def start(self):
+        """Start the background flusher (write-behind mode only)"""
+        if self.mode != "write_behind" or self._thread is not None:
+            return
+        self._stop.clear()
+        # Drain whatever a previous run left in the spool
+        self._wakeup.set()
+        self._thread = threading.Thread(target=self._flush_loop, name="analysis-flusher", daemon=True)
+        self._thread.start()
+
+    def shutdown(self, timeout: float = 10.0):
+        """Stop the flusher after a last attempt to write the spool"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
+        try:
+            while self.flush_once():
+                pass
+        except Exception as e:
+            # Entries stay in the spool and are written on the next start
+            print(f"Could not flush the analysis spool on shutdown: {e}")
+
+    def spool_depth(self) -> int:
+        """Number of analyses waiting in the spool"""
+        if self.mode != "write_behind":
+            return 0
+        try:
+            with self._connect() as conn:
+                return conn.execute("SELECT COUNT(*) FROM spool WHERE discarded = 0").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get persistence metrics
+
+        Returns:
+            dict: Mode, spool depth and write counters
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        flushes = stats["flushes"]
+        stats.update({
+            "mode": self.mode,
+            "spool_depth": self.spool_depth(),
+            "avg_flush_time": stats.pop("total_flush_time") / flushes if flushes else 0.0,
+        })
+        return stats
+
+
+# Shared writer for the detection pipeline
+analysis_writer = AnalysisWriter()
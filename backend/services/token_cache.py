@@ -0,0 +1,283 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+import jwt
+import requests
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
+
+# Token cache configuration
+TOKEN_CACHE_SIZE = int(os.getenv("VOCALGUARD_TOKEN_CACHE_SIZE", "10000"))
+CLOCK_SKEW_SECONDS = int(os.getenv("VOCALGUARD_AUTH_CLOCK_SKEW_S", "0"))
+
+# Public keys that sign Firebase ID tokens (X.509 certificates keyed by kid)
+CERTS_URL = os.getenv(
+    "VOCALGUARD_AUTH_CERTS_URL",
+    "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+)
+KEY_REFRESH_INTERVAL = float(os.getenv("VOCALGUARD_AUTH_KEY_REFRESH_S", "3600"))  # when no max-age is sent
+MIN_KEY_REFRESH_INTERVAL = 30.0  # rate limit for refreshes triggered by an unknown kid
+KEY_FETCH_TIMEOUT = 10.0
+
+# Offline use: a JSON file of {kid: PEM certificate or public key} replaces the fetched keys
+STUB_KEYS_PATH = os.getenv("VOCALGUARD_AUTH_STUB_KEYS")
+PROJECT_ID = os.getenv("VOCALGUARD_AUTH_PROJECT_ID")
+
+
+class TokenVerificationError(ValueError):
+    """Raised when an ID token is invalid"""
+
+
+def _load_public_key(pem: str):
+    pem_bytes = pem.encode()
+    if b"BEGIN CERTIFICATE" in pem_bytes:
+        return x509.load_pem_x509_certificate(pem_bytes).public_key()
+    return serialization.load_pem_public_key(pem_bytes)
+
+
+class TokenVerifier:
+    """
+    Verifies Firebase ID tokens locally and caches the verified claims
+
+    Claims are cached under a SHA-256 digest of the token until the token's
+    exp, so a client reusing its token costs one RSA check per hour instead
+    of one per request. Signing keys are fetched up front and refreshed in
+    the background before their max-age runs out; a token signed with an
+    unknown kid triggers one rate-limited refresh. If no keys are available
+    verification falls back to firebase_admin.auth.verify_id_token.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, certs_url: str = CERTS_URL,
+                 stub_keys_path: Optional[str] = STUB_KEYS_PATH, project_id: Optional[str] = PROJECT_ID):
+        """
+        Initialize the verifier
+
+        Args:
+            max_size: Maximum number of cached tokens
+            certs_url: URL of the signing certificates
+            stub_keys_path: Optional JSON file of local keys (disables fetching)
+            project_id: Firebase project ID (default: the initialized Firebase app's)
+        """
+        self.max_size = max_size
+        self.certs_url = certs_url
+        self.stub_keys_path = stub_keys_path
+        self._project_id = project_id
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._keys_lock = threading.Lock()
+        self._keys_expire_at = 0.0
+        self._last_refresh_attempt = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+        self._stats = {"hits": 0, "misses": 0, "verified": 0, "rejected": 0, "fallbacks": 0,
+                       "total_verify_time": 0.0, "key_refreshes": 0, "key_refresh_failures": 0}
+
+        if stub_keys_path:
+            with open(stub_keys_path) as f:
+                self._set_keys(json.load(f), max_age=None)
+
+    def _update_stats(self, **changes):
+        with self._lock:
+            for name, value in changes.items():
+                self._stats[name] += value
+
+    @property
+    def project_id(self) -> str:
+        if not self._project_id:
+            import firebase_admin
+            self._project_id = firebase_admin.get_app().project_id
+        return self._project_id
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _set_keys(self, pems: Dict[str, str], max_age: Optional[float]):
+        keys = {kid: _load_public_key(pem) for kid, pem in pems.items()}
+        with self._keys_lock:
+            self._keys = keys
+            self._keys_expire_at = time.time() + max_age if max_age else float("inf")
+
+    def refresh_keys(self) -> float:
+        """
+        Fetch the current signing keys
+
+        Returns:
+            float: Seconds until the keys should be refreshed again
+        """
+        self._last_refresh_attempt = time.time()
+        if self.stub_keys_path:
+            return KEY_REFRESH_INTERVAL
+
+        try:
+            response = requests.get(self.certs_url, timeout=KEY_FETCH_TIMEOUT)
+            response.raise_for_status()
+            match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+            max_age = float(match.group(1)) if match else KEY_REFRESH_INTERVAL
+            self._set_keys(response.json(), max_age)
+        except Exception:
+            self._update_stats(key_refresh_failures=1)
+            raise
+        self._update_stats(key_refreshes=1)
+        return max_age
+
+    def _refresh_loop(self):
+        retry_delay = MIN_KEY_REFRESH_INTERVAL
+        while not self._stop.is_set():
+            try:
+                max_age = self.refresh_keys()
+                retry_delay = MIN_KEY_REFRESH_INTERVAL
+                # Refresh well before the keys expire
+                wait = max(max_age * 0.8, MIN_KEY_REFRESH_INTERVAL)
+            except Exception as e:
+                print(f"Error fetching token signing keys (retrying in {retry_delay:.0f} s): {e}")
+                wait = retry_delay
+                retry_delay = min(retry_delay * 2, KEY_REFRESH_INTERVAL)
+            self._stop.wait(wait)
+
+    def start(self):
+        """Fetch the signing keys now and keep them fresh in the background"""
+        if self.stub_keys_path or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="auth-key-refresh", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        """Stop the background key refresh"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5.0)
+        self._thread = None
+
+    def _get_key(self, kid: str):
+        with self._keys_lock:
+            key = self._keys.get(kid)
+            expired = time.time() >= self._keys_expire_at
+        if (key is None or expired) and time.time() - self._last_refresh_attempt >= MIN_KEY_REFRESH_INTERVAL:
+            try:
+                self.refresh_keys()
+            except Exception as e:
+                print(f"Error fetching token signing keys: {e}")
+            with self._keys_lock:
+                key = self._keys.get(kid)
+        return key
+
+    def cached(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the claims of a token verified earlier
+
+        Returns:
+            dict: The cached claims, or None if the token is not cached or has expired
+        """
+        digest = self._digest(token)
+        with self._lock:
+            entry = self._cache.get(digest)
+            if entry is not None and entry[0] > time.time():
+                self._cache.move_to_end(digest)
+                self._stats["hits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._cache[digest]
+        return None
+
+    def _decode(self, token: str) -> Dict[str, Any]:
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except jwt.PyJWTError as e:
+            raise TokenVerificationError(f"Malformed token: {e}")
+
+        key = self._get_key(kid) if kid else None
+        if key is None:
+            with self._keys_lock:
+                have_keys = bool(self._keys)
+            if have_keys:
+                raise TokenVerificationError("Token is signed by an unknown key")
+            # No keys could be fetched at all; let firebase_admin verify the token itself
+            from firebase_admin import auth
+            self._update_stats(fallbacks=1)
+            return auth.verify_id_token(token)
+
+        try:
+            claims = jwt.decode(
+                token, key, algorithms=["RS256"], audience=self.project_id,
+                issuer=f"https://securetoken.google.com/{self.project_id}", leeway=CLOCK_SKEW_SECONDS,
+                options={"require": ["exp", "iat", "sub"]}
+            )
+        except jwt.PyJWTError as e:
+            raise TokenVerificationError(str(e))
+
+        if not isinstance(claims["sub"], str) or not claims["sub"] or len(claims["sub"]) > 128:
+            raise TokenVerificationError("Token has an invalid subject")
+        if claims.get("auth_time", 0) > time.time() + CLOCK_SKEW_SECONDS:
+            raise TokenVerificationError("Token auth_time is in the future")
+        claims["uid"] = claims["sub"]
+        return claims
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify a Firebase ID token, using the cache when possible
+
+        Args:
+            token: The encoded ID token
+
+        Returns:
+            dict: The token's claims, with the user ID under "uid"
+
+        Raises:
+            TokenVerificationError: If the token is invalid or expired
+        """
+        claims = self.cached(token)
+        if claims is not None:
+            return claims
+        self._update_stats(misses=1)
+
+        start_time = time.time()
+        try:
+            claims = self._decode(token)
+        except Exception:
+            self._update_stats(rejected=1)
+            raise
+        self._update_stats(verified=1, total_verify_time=time.time() - start_time)
+
+        digest = self._digest(token)
+        with self._lock:
+            self._cache[digest] = (float(claims["exp"]), claims)
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return claims
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get token cache metrics
+
+        Returns:
+            dict: Cache size, hit rate, verification latency and key refresh counters
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._cache)
+        with self._keys_lock:
+            stats["keys"] = len(self._keys)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "max_size": self.max_size,
+            "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+            "avg_verify_ms": stats.pop("total_verify_time") * 1000 / stats["verified"] if stats["verified"] else 0.0,
+            "key_source": "stub" if self.stub_keys_path else "remote",
+        })
+        return stats
+
+
+# Shared verifier for the API
+token_verifier = TokenVerifier()
@@ -0,0 +1,55 @@
+import asyncio
+import os
+
+import pytest
+
+for module in ("librosa", "soundfile"):
+    pytest.importorskip(module)
+
+from core import batch_analysis
+from core.upload import SpooledUpload
+
+
+class StubExecutor:
+    """Keeps every file in flight until cancelled, one at a time"""
+
+    max_workers = 1
+
+    def __init__(self):
+        self.seen_on_cancel = []
+
+    async def run(self, func, path, *args):
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            # The file must still be there while the task is being cancelled
+            self.seen_on_cancel.append(os.path.exists(path))
+            raise
+
+
+def test_uploads_deleted_when_client_goes_away(monkeypatch, tmp_path):
+    executor = StubExecutor()
+    monkeypatch.setattr(batch_analysis, "inference_executor", executor)
+
+    uploads = []
+    for name in ("first.wav", "second.wav", "third.wav"):
+        path = tmp_path / name
+        path.write_bytes(b"audio")
+        uploads.append(SpooledUpload(str(path), name, 5, name))
+
+    async def consume():
+        async for _ in batch_analysis.run_batch([(u.filename, u, None) for u in uploads], store_results=False):
+            pass
+
+    async def cancel_mid_batch():
+        # first.wav is being analysed and second.wav waits for an executor slot
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_mid_batch())
+
+    assert executor.seen_on_cancel == [True]
+    assert not any(os.path.exists(upload.path) for upload in uploads)
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from core.compiled_backend import _CompiledModule, model_hash
+
+
+def test_model_hash_follows_weights_file(tmp_path):
+    module = torch.nn.Linear(4, 2)
+    (tmp_path / "config.json").write_text('{"hidden_size": 4}')
+    weights = tmp_path / "model.safetensors"
+    weights.write_bytes(b"weights")
+
+    first = model_hash(module, "cpu", str(tmp_path))
+    assert model_hash(module, "cpu", str(tmp_path)) == first
+
+    # Re-exporting the weights changes the file's size or modification time
+    weights.write_bytes(b"retrained weights")
+    stat = os.stat(weights)
+    os.utime(weights, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert model_hash(module, "cpu", str(tmp_path)) != first
+
+    # Without a weights file the state dict is hashed
+    assert model_hash(module, "cpu") == model_hash(module, "cpu", str(tmp_path / "missing"))
+
+
+def test_compiled_module_requires_trace(tmp_path):
+    class Untraceable(_CompiledModule):
+        pass
+
+    with pytest.raises(TypeError):
+        Untraceable(torch.nn.Linear(4, 2), "cpu", "untraceable", str(tmp_path))
@@ -0,0 +1,50 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.embedding_store import EmbeddingStore
+
+
+def _open(directory, capacity=4):
+    return EmbeddingStore(str(directory), dim=8, capacity=capacity, dtype="float32")
+
+
+def test_workers_do_not_share_free_slots(tmp_path):
+    # Two handles on one directory stand in for two pre-fork workers
+    first, second = _open(tmp_path), _open(tmp_path)
+    first.put("clip-a", np.full(8, 1.0))
+    second.put("clip-b", np.full(8, 2.0))
+
+    np.testing.assert_array_equal(first.get("clip-a"), np.full(8, 1.0))
+    np.testing.assert_array_equal(second.get("clip-b"), np.full(8, 2.0))
+    # Entries written by the other worker are found too
+    np.testing.assert_array_equal(first.get("clip-b"), np.full(8, 2.0))
+    assert len(first) == len(second) == 2
+
+
+def test_slot_reused_by_another_worker_is_a_miss(tmp_path):
+    first, second = _open(tmp_path, capacity=1), _open(tmp_path, capacity=1)
+    first.put("clip-a", np.full(8, 1.0))
+    assert first.get("clip-a") is not None
+
+    # The only slot is evicted and reused by the other worker
+    second.put("clip-b", np.full(8, 2.0))
+
+    assert first.get("clip-a") is None
+    assert first.stats()["stale"] == 1
+    np.testing.assert_array_equal(first.get("clip-b"), np.full(8, 2.0))
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    store = _open(tmp_path, capacity=2)
+    store.put("clip-a", np.full(8, 1.0))
+    store.put("clip-b", np.full(8, 2.0))
+    assert store.get("clip-a") is not None
+
+    store.put("clip-c", np.full(8, 3.0))
+
+    assert store.get("clip-b") is None
+    assert store.get("clip-a") is not None
+    assert store.stats()["evictions"] == 1
+    # A reopened store rebuilds the same index from the files
+    assert "clip-c" in _open(tmp_path, capacity=2)
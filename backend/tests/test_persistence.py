@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+pytest.importorskip("firebase_admin")
+
+from services import persistence
+from services.persistence import AnalysisWriter
+
+
+def _documents(analysis_id, user_id="user-1"):
+    return {
+        "audio_metadata": {"id": f"meta-{analysis_id}", "user_id": user_id},
+        "analysis_results": {"id": analysis_id},
+        "result_details": {"id": f"details-{analysis_id}"},
+        "analysis_summaries": {"id": analysis_id},
+    }
+
+
+class FakeDatabase:
+    """Records what the flushers write and delete instead of talking to Firestore"""
+
+    def __init__(self, on_store=None):
+        self.stored, self.deleted = [], []
+        self.on_store = on_store
+
+    def __call__(self):
+        return self
+
+    def store_analyses_bulk(self, analyses):
+        if self.on_store:
+            self.on_store()
+        self.stored.extend(documents["analysis_results"]["id"] for documents in analyses)
+
+    def delete_multiple_analyses(self, analysis_ids, user_id=None):
+        self.deleted.extend(analysis_ids)
+
+
+@pytest.fixture
+def spool_path(tmp_path):
+    return str(tmp_path / "spool.sqlite3")
+
+
+def test_workers_never_send_the_same_rows(monkeypatch, spool_path):
+    database = FakeDatabase()
+    monkeypatch.setattr(persistence, "DatabaseService", database)
+    # Two writers on one spool stand in for two pre-fork workers
+    first = AnalysisWriter("write_behind", spool_path)
+    second = AnalysisWriter("write_behind", spool_path)
+    first.persist_many([_documents(f"a{i}") for i in range(3)])
+
+    # The first worker's write is in flight while the second one flushes
+    database.on_store = lambda: second.flush_once()
+    assert first.flush_once() == 3
+
+    assert sorted(database.stored) == ["a0", "a1", "a2"]
+    assert first.spool_depth() == 0
+
+
+def test_deleted_spooled_analysis_is_not_written(monkeypatch, spool_path):
+    database = FakeDatabase()
+    monkeypatch.setattr(persistence, "DatabaseService", database)
+    writer = AnalysisWriter("write_behind", spool_path)
+    writer.persist_many([_documents("keep"), _documents("drop"), _documents("other", user_id="user-2")])
+
+    assert writer.discard(["drop", "other"], user_id="user-1") == ["drop"]
+    writer.flush_once()
+
+    assert sorted(database.stored) == ["keep", "other"]
+
+
+def test_analysis_deleted_in_flight_is_deleted_again(monkeypatch, spool_path):
+    database = FakeDatabase()
+    monkeypatch.setattr(persistence, "DatabaseService", database)
+    writer = AnalysisWriter("write_behind", spool_path)
+    writer.persist(_documents("a1"))
+
+    database.on_store = lambda: writer.discard(["a1"])
+    writer.flush_once()
+
+    assert database.stored == ["a1"]
+    assert database.deleted == ["a1"]
+    assert writer.spool_depth() == 0
+
+
+def test_started_writer_drains_rows_spooled_by_another_worker(monkeypatch, spool_path):
+    database = FakeDatabase()
+    monkeypatch.setattr(persistence, "DatabaseService", database)
+    flusher = AnalysisWriter("write_behind", spool_path, flush_interval=0.01, poll_interval=0.05)
+    flusher.start()
+    try:
+        # Let the flusher drain the empty spool and go idle first
+        time.sleep(0.2)
+        # This worker's flusher is not running (e.g. it died), so nothing wakes the other one
+        AnalysisWriter("write_behind", spool_path).persist(_documents("a1"))
+        deadline = time.time() + 2
+        while not database.stored and time.time() < deadline:
+            time.sleep(0.02)
+        drained = list(database.stored)
+    finally:
+        flusher.shutdown()
+
+    assert drained == ["a1"]
+    assert flusher.spool_depth() == 0
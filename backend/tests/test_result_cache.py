@@ -0,0 +1,67 @@
+import pytest
+
+from core.result_cache import ResultCache, MemoryResultCache, DiskResultCache, make_cache_key
+
+
+@pytest.mark.parametrize("backend", ["memory", "disk"])
+def test_empty_cache_is_usable(backend, tmp_path):
+    cache = (MemoryResultCache() if backend == "memory"
+             else DiskResultCache(path=str(tmp_path / "result_cache.sqlite3")))
+    assert len(cache) == 0
+    # An empty cache must not be mistaken for a disabled one
+    assert cache
+
+    key = make_cache_key("abc", "3.0.0", "standard")
+    assert cache.get(key) is None
+    cache.set(key, {"is_fake": True})
+    assert cache.get(key) == {"is_fake": True}
+    assert cache.stats()["hits"] == 1
+
+
+def test_incomplete_backend_fails_at_construction():
+    class NoStorage(ResultCache):
+        pass
+
+    with pytest.raises(TypeError):
+        NoStorage()
+
+
+def test_cache_key_includes_pipeline_options():
+    base = make_cache_key("abc", "3.0.0", "standard")
+    windowed = make_cache_key("abc", "3.0.0", "standard", {"window": 10.0, "hop": 5.0})
+    rewindowed = make_cache_key("abc", "3.0.0", "standard", {"hop": 2.5, "window": 10.0})
+    assert len({base, windowed, rewindowed}) == 3
+    assert windowed == make_cache_key("abc", "3.0.0", "standard", {"hop": 5.0, "window": 10.0})
+
+
+def test_repeated_upload_hits_cache(monkeypatch, tmp_path):
+    for module in ("torch", "torchaudio", "librosa", "soundfile", "transformers", "firebase_admin"):
+        pytest.importorskip(module)
+    from core import detect_deepfake as pipeline
+
+    calls = []
+
+    def run_detection(audio, detector=None):
+        calls.append(audio.content_hash)
+        return {"is_fake": True, "confidence": 0.9, "prediction": "fake",
+                "probabilities": {"real": 0.1, "fake": 0.9}}
+
+    monkeypatch.setattr(pipeline, "result_cache", MemoryResultCache())
+    monkeypatch.setattr(pipeline, "get_detector", lambda *args, **kwargs: None)
+    monkeypatch.setattr(pipeline, "run_detection", run_detection)
+
+    audio_path = tmp_path / "clip.wav"
+    audio_path.write_bytes(b"not decoded")
+    first = pipeline.detect_deepfake(str(audio_path), store_results=False, content_hash="same-hash")
+    second = pipeline.detect_deepfake(str(audio_path), store_results=False, content_hash="same-hash")
+
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["is_fake"] == first["is_fake"]
+    assert calls == ["same-hash"]
+
+    # Changing the window configuration must not serve the earlier verdict
+    monkeypatch.setattr(pipeline, "WINDOW_HOP_SECONDS", pipeline.WINDOW_HOP_SECONDS / 2)
+    third = pipeline.detect_deepfake(str(audio_path), store_results=False, content_hash="same-hash")
+    assert third["cached"] is False
+    assert calls == ["same-hash", "same-hash"]
@@ -0,0 +1,55 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from models.transformer_models import AudioTransformer, ALL_ATTENTION_LAYERS
+
+TOLERANCE = 1e-5
+INPUT_DIM = 16
+
+
+@pytest.fixture
+def model():
+    torch.manual_seed(0)
+    return AudioTransformer(input_dim=INPUT_DIM, d_model=32, num_heads=4, num_layers=2, d_ff=64).eval()
+
+
+@pytest.fixture
+def features():
+    torch.manual_seed(1)
+    return torch.randn(2, 40, INPUT_DIM)
+
+
+def test_fused_attention_matches_explicit(model, features):
+    with torch.no_grad():
+        reference_logits, reference_weights = model(features, attention_layers=ALL_ATTENTION_LAYERS)
+        fused_logits, fused_weights = model(features, attention_layers=[])
+        last_logits, last_weights = model(features, attention_layers=[-1])
+
+    assert len(reference_weights) == 2
+    assert fused_weights == []
+    assert len(last_weights) == 1
+    torch.testing.assert_close(fused_logits, reference_logits, atol=TOLERANCE, rtol=0)
+    torch.testing.assert_close(last_logits, reference_logits, atol=TOLERANCE, rtol=0)
+    torch.testing.assert_close(last_weights[0], reference_weights[-1], atol=TOLERANCE, rtol=0)
+
+
+def test_fused_attention_matches_explicit_with_mask(model, features):
+    # Mask the last 10 frames of the second item (0 = masked)
+    mask = torch.ones(2, 1, 1, features.size(1))
+    mask[1, ..., -10:] = 0
+
+    with torch.no_grad():
+        reference_logits, reference_weights = model(features, mask=mask, attention_layers=ALL_ATTENTION_LAYERS)
+        fused_logits, _ = model(features, mask=mask, attention_layers=[])
+        last_logits, last_weights = model(features, mask=mask, attention_layers=[-1])
+
+    torch.testing.assert_close(fused_logits, reference_logits, atol=TOLERANCE, rtol=0)
+    torch.testing.assert_close(last_logits, reference_logits, atol=TOLERANCE, rtol=0)
+    torch.testing.assert_close(last_weights[0], reference_weights[-1], atol=TOLERANCE, rtol=0)
+    assert float(reference_weights[-1][1, ..., -10:].abs().max()) == 0.0
+
+
+def test_attention_layer_out_of_range(model, features):
+    with pytest.raises(ValueError):
+        model(features, attention_layers=[2])
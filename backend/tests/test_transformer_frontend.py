@@ -0,0 +1,78 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from models.transformer_models import AudioTransformer, PositionalEncoding, sinusoidal_encoding
+
+INPUT_DIM = 16
+FRAMES_PER_SECOND = 50  # Wav2Vec2 output frame rate
+
+
+def _model(**kwargs):
+    torch.manual_seed(0)
+    return AudioTransformer(input_dim=INPUT_DIM, d_model=32, num_heads=4, num_layers=2, d_ff=64, **kwargs).eval()
+
+
+@pytest.mark.parametrize("config", [
+    {"downsample": "none", "max_len": None},
+    {"downsample": "avg", "max_len": None},
+    {"downsample": "conv", "max_len": None},
+    {"downsample": "avg", "max_len": 500},
+])
+def test_minute_long_input(config):
+    model = _model(**config)
+    num_frames = 60 * FRAMES_PER_SECOND
+    features = torch.randn(1, num_frames, INPUT_DIM)
+
+    with torch.no_grad():
+        logits, attention_weights = model(features, attention_layers=[-1])
+
+    frames = model.sequence_length(num_frames)
+    assert logits.shape == (1, 2)
+    assert attention_weights[0].shape == (1, 4, frames, frames)
+    assert torch.isfinite(logits).all()
+    if config["max_len"]:
+        assert frames == config["max_len"]
+
+
+def test_positional_encoding_varies_across_positions():
+    encoding = PositionalEncoding(d_model=32, max_len=100, revision=2)
+    x = torch.zeros(3, 10, 32)
+
+    encoded = encoding(x)
+
+    # Every frame gets its own encoding, the same for every item of the batch
+    assert not torch.allclose(encoded[:, 0], encoded[:, 1])
+    assert torch.unique(encoded[0], dim=0).shape[0] == 10
+    torch.testing.assert_close(encoded[0], encoded[2])
+    torch.testing.assert_close(encoded[0], sinusoidal_encoding(10, 32))
+
+
+def test_positional_encoding_beyond_table():
+    encoding = PositionalEncoding(d_model=32, max_len=8, revision=2)
+
+    encoded = encoding(torch.zeros(1, 20, 32))
+
+    torch.testing.assert_close(encoded[0], sinusoidal_encoding(20, 32))
+
+
+def test_legacy_positional_encoding_is_indexed_by_batch_item():
+    encoding = PositionalEncoding(d_model=32, max_len=100, revision=1)
+
+    encoded = encoding(torch.zeros(3, 10, 32))
+
+    # Revision 1 keeps the encoding existing checkpoints were trained with
+    expected = sinusoidal_encoding(3, 32).unsqueeze(1).expand(3, 10, 32)
+    torch.testing.assert_close(encoded, expected)
+
+
+def test_unknown_revision_is_rejected():
+    with pytest.raises(ValueError):
+        PositionalEncoding(d_model=32, revision=3)
+
+
+def test_version_tag_follows_front_end():
+    assert _model().max_len is None
+    assert _model(downsample="none", revision=1).version_tag() == "tf1"
+    assert _model(downsample="none", revision=2).version_tag() == "tf2"
+    assert _model(downsample="avg", downsample_factor=4, max_len=1000, revision=1).version_tag() == "tf1.avg4.max1000"
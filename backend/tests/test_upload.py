@@ -0,0 +1,64 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from core.upload import RequestSizeLimitMiddleware, ingest_upload
+
+LIMIT = 64 * 1024
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(RequestSizeLimitMiddleware, max_bytes=LIMIT, path_limits={"/big": 4 * LIMIT})
+    calls = []
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        calls.append(file.filename)
+        spooled = await ingest_upload(file, max_seconds=None)
+        with spooled:
+            return {"size": spooled.size, "sha256": spooled.sha256}
+
+    @app.post("/big")
+    async def big(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    client = TestClient(app)
+    client.calls = calls
+    return client
+
+
+def test_upload_within_limit(client):
+    response = client.post("/upload", files={"file": ("clip.wav", b"x" * 1000)})
+    assert response.status_code == 200
+    assert response.json()["size"] == 1000
+
+
+def test_declared_size_rejected_before_endpoint(client):
+    response = client.post("/upload", files={"file": ("clip.wav", b"x" * (2 * LIMIT))})
+    assert response.status_code == 413
+    assert client.calls == []
+
+
+def test_streamed_body_cut_off(client):
+    # A chunked body has no Content-Length, so the limit is enforced while it arrives
+    def body():
+        yield (b'--boundary\r\nContent-Disposition: form-data; name="file"; filename="clip.wav"\r\n'
+               b"Content-Type: audio/wav\r\n\r\n")
+        for _ in range(8):
+            yield b"x" * (LIMIT // 2)
+        yield b"\r\n--boundary--\r\n"
+
+    response = client.post("/upload", content=body(),
+                           headers={"Content-Type": "multipart/form-data; boundary=boundary"})
+    assert response.status_code == 413
+    assert client.calls == []
+
+
+def test_path_limit_override(client):
+    response = client.post("/big", files={"file": ("batch.zip", b"x" * (2 * LIMIT))})
+    assert response.status_code == 200
@@ -0,0 +1,61 @@
+import pytest
+
+for module in ("torch", "torchaudio", "librosa", "soundfile", "transformers", "firebase_admin"):
+    pytest.importorskip(module)
+
+import numpy as np
+import soundfile as sf
+import torch
+from transformers import Wav2Vec2Config, Wav2Vec2FeatureExtractor, Wav2Vec2ForSequenceClassification
+
+from core import detect_deepfake as pipeline
+from core.audio_context import AudioContext
+from models.transformer_models import TransformerDeepfakeDetector
+
+TOLERANCE = 1e-4
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    # Tiny randomly initialised backbone; the AudioTransformer expects 1024-d hidden states
+    torch.manual_seed(0)
+    config = Wav2Vec2Config(
+        hidden_size=1024, num_hidden_layers=1, num_attention_heads=4, intermediate_size=64,
+        conv_dim=(32, 32), conv_stride=(5, 4), conv_kernel=(10, 8), num_conv_pos_embeddings=16,
+        num_conv_pos_embedding_groups=4, classifier_proj_size=16, num_labels=2,
+        id2label={0: "real", 1: "fake"}, label2id={"real": 0, "fake": 1}
+    )
+    directory = tmp_path_factory.mktemp("model")
+    Wav2Vec2ForSequenceClassification(config).eval().save_pretrained(directory, safe_serialization=True)
+    Wav2Vec2FeatureExtractor(return_attention_mask=True).save_pretrained(directory)
+    return str(directory)
+
+
+@pytest.fixture
+def long_clip(tmp_path):
+    path = tmp_path / "clip.wav"
+    sf.write(path, np.random.default_rng(0).standard_normal(16000 * 3).astype(np.float32) * 0.1, 16000)
+    return AudioContext(str(path))
+
+
+def test_windowed_ensemble_matches_windowed_detection(monkeypatch, model_dir, long_clip):
+    monkeypatch.setattr(pipeline, "WINDOW_SECONDS", 1.0)
+    monkeypatch.setattr(pipeline, "WINDOW_HOP_SECONDS", 1.0)
+    monkeypatch.setattr(pipeline, "WINDOW_BATCH_SIZE", 2)
+    detector = pipeline.DeepfakeAudioDetector(model_dir, device="cpu")
+    transformer_detector = TransformerDeepfakeDetector(
+        device=torch.device("cpu"), feature_extractor=detector.feature_extractor, base_model=detector.model
+    )
+
+    detection_result, transformer_result, attention_weights = pipeline.run_windowed_ensemble(
+        detector, transformer_detector, long_clip, attention_resolution=8
+    )
+    reference = detector.detect_windowed(long_clip, window_seconds=1.0, hop_seconds=1.0, batch_size=2)
+
+    # The classification head on shared hidden states scores each window like the full model
+    assert detection_result["num_windows"] == reference["num_windows"] == 3
+    np.testing.assert_allclose(detection_result["window_fake_probabilities"],
+                               reference["window_fake_probabilities"], atol=TOLERANCE)
+    assert transformer_result["num_windows"] == 3
+    assert "error" not in transformer_result
+    assert attention_weights is not None
@@ -3,6 +3,18 @@ import { useNavigate } from "react-router-dom";
 import { api } from "../services/api";
 import { useAuth } from "../context/AuthContext";
 
+// Summary columns the history table needs; everything else stays on the server
+const HISTORY_FIELDS = [
+  "filename",
+  "duration",
+  "sample_rate",
+  "is_deepfake",
+  "confidence_score",
+  "analysis_timestamp",
+  "processing_time",
+];
+const HISTORY_PAGE_SIZE = 50;
+
 const HistoryPage = () => {
   const [searchTerm, setSearchTerm] = useState("");
   const [historyData, setHistoryData] = useState([]);
@@ -12,6 +24,9 @@ const HistoryPage = () => {
   const [isDeleting, setIsDeleting] = useState(false);
   const [showDeleteModal, setShowDeleteModal] = useState(false);
   const [sortDirection, setSortDirection] = useState("desc"); // "asc" or "desc"
+  const [verdictFilter, setVerdictFilter] = useState(""); // "", "real" or "fake"
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
   const { user } = useAuth();
 
@@ -81,69 +96,28 @@ const HistoryPage = () => {
         
         resultText = `${resultClassification} (${resultPercentage}%)`;
 
-        // Extract audio details
-        const detailsArray = [];
-
-        // If we have feature details, add them
-        if (analysis.details && analysis.details.feature_scores) {
-          const features = analysis.details.feature_scores;
-
-          if (features.mfcc_score !== undefined) {
-            detailsArray.push({
-              label: "Voice Pattern Analysis",
-              value: features.mfcc_score > 0.5 ? "Artificial" : "Natural",
-              description:
-                features.mfcc_score > 0.5
-                  ? "Patterns indicate potential AI generation"
-                  : "Patterns match typical human speech characteristics",
-            });
-          }
-
-          if (features.spectral_score !== undefined) {
-            detailsArray.push({
-              label: "Frequency Analysis",
-              value: features.spectral_score > 0.5 ? "Abnormal" : "Normal",
-              description:
-                features.spectral_score > 0.5
-                  ? "Unusual frequency distribution detected"
-                  : "Frequency distribution within expected human range",
-            });
-          }
-
-          if (features.temporal_score !== undefined) {
-            detailsArray.push({
-              label: "Temporal Analysis",
-              value: features.temporal_score > 0.5 ? "Irregular" : "Regular",
-              description:
-                features.temporal_score > 0.5
-                  ? "Temporal patterns suggest artificial generation"
-                  : "Natural temporal flow detected in speech",
-            });
-          }
-        }
-
-        // Add default details if none available from API
-        if (detailsArray.length === 0) {
-          detailsArray.push({
+        // History summaries carry no feature scores, only the verdict
+        const detailsArray = [
+          {
             label: "Overall Analysis",
             value: analysis.is_deepfake ? "Artificial" : "Natural",
             description: analysis.is_deepfake
               ? "AI patterns detected in the audio"
               : "Natural human voice characteristics detected",
-          });
-        }
+          },
+        ];
 
-        // Safely get values with fallbacks
-        const details = analysis.details || {};
+        // Summaries carry the processing time at the top level
+        const rawProcessingTime = analysis.processing_time;
         let processingTime = null;
 
         // Handle processing time with proper type checking and error handling
-        if (details.processing_time !== undefined) {
+        if (rawProcessingTime !== undefined && rawProcessingTime !== null) {
           try {
-            if (typeof details.processing_time === "string") {
-              processingTime = parseInt(details.processing_time);
-            } else if (typeof details.processing_time === "number") {
-              processingTime = details.processing_time;
+            if (typeof rawProcessingTime === "string") {
+              processingTime = parseInt(rawProcessingTime);
+            } else if (typeof rawProcessingTime === "number") {
+              processingTime = rawProcessingTime;
             }
 
             if (isNaN(processingTime)) {
@@ -189,18 +163,24 @@ const HistoryPage = () => {
           timestamp: uploadDate, // Store the actual date object for sorting
         };
       })
-      .filter(Boolean) // Remove any null entries
-      .sort((a, b) => {
-        // Sort by timestamp in descending order (newest first)
-        // Handle cases where timestamp might be undefined or null
-        const timeA = a.timestamp ? a.timestamp.getTime() : 0;
-        const timeB = b.timestamp ? b.timestamp.getTime() : 0;
-        return timeB - timeA;
-      });
+      .filter(Boolean); // Remove any null entries (the server already sorted them)
+  };
+
+  // Fetch one page of the user's history (the first page when cursor is null)
+  const fetchAnalyses = async (cursor = null) => {
+    const response = await api.getUserAnalyses(user.token, {
+      limit: HISTORY_PAGE_SIZE,
+      cursor,
+      order: sortDirection,
+      verdict: verdictFilter,
+      fields: HISTORY_FIELDS,
+    });
+    setNextCursor(response.next_cursor || null);
+    return formatAnalysisData(response.analyses);
   };
 
   useEffect(() => {
-    const fetchAnalyses = async () => {
+    const fetchFirstPage = async () => {
       try {
         if (!user || !user.token) {
           setError("You must be logged in to view history");
@@ -208,22 +188,8 @@ const HistoryPage = () => {
           return;
         }
 
-        // Fetch user's analyses from the API
-        const response = await api.getUserAnalyses(user.token);
-
-        if (response.analyses && Array.isArray(response.analyses)) {
-          // Debug: Log the first analysis to see the structure
-          if (response.analyses.length > 0) {
-            console.log("Sample analysis structure:", response.analyses[0]);
-          }
-          
-          // Transform API data to match our component's expected format
-          const formattedData = formatAnalysisData(response.analyses);
-          setHistoryData(formattedData);
-        } else {
-          setHistoryData([]);
-        }
-
+        setLoading(true);
+        setHistoryData(await fetchAnalyses());
         setLoading(false);
       } catch (err) {
         console.error("Error fetching analyses:", err);
@@ -232,9 +198,23 @@ const HistoryPage = () => {
       }
     };
 
-    fetchAnalyses();
+    fetchFirstPage();
     setSelectedItems([]);
-  }, [user]);
+  }, [user, verdictFilter, sortDirection]);
+
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const moreData = await fetchAnalyses(nextCursor);
+      setHistoryData((prev) => [...prev, ...moreData]);
+    } catch (err) {
+      console.error("Error fetching more analyses:", err);
+      setError("Failed to load analysis history");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   const handleItemSelect = (id) => {
     setSelectedItems((prev) => {
@@ -295,28 +275,12 @@ const HistoryPage = () => {
     }
   };
 
-  // Function to toggle date sorting
+  // Toggle date sorting (the server returns the pages in the new order)
   const toggleDateSort = () => {
-    const newDirection = sortDirection === "desc" ? "asc" : "desc";
-    setSortDirection(newDirection);
-    
-    setHistoryData(prev => {
-      const sorted = [...prev].sort((a, b) => {
-        // Handle cases where timestamp might be undefined or null
-        const timeA = a.timestamp ? a.timestamp.getTime() : 0;
-        const timeB = b.timestamp ? b.timestamp.getTime() : 0;
-        
-        if (newDirection === "desc") {
-          return timeB - timeA;
-        } else {
-          return timeA - timeB;
-        }
-      });
-      return sorted;
-    });
+    setSortDirection((prev) => (prev === "desc" ? "asc" : "desc"));
   };
 
-  // Filter history based on search term
+  // Filter the loaded pages by file name (search does not query the server)
   const filteredHistory = historyData.filter(
     (item) =>
       item.fileName &&
@@ -396,10 +360,18 @@ const HistoryPage = () => {
               Delete {selectedItems.length} selected
             </button>
           )}
+          <select
+            value={verdictFilter}
+            onChange={(e) => setVerdictFilter(e.target.value)}
+            className="px-4 py-2 rounded-full bg-purple-50 focus:outline-none focus:ring-2 focus:ring-purple-500">
+            <option value="">All results</option>
+            <option value="real">Real only</option>
+            <option value="fake">Fake only</option>
+          </select>
           <div className="relative">
             <input
               type="text"
-              placeholder="Search files..."
+              placeholder="Search loaded files..."
               value={searchTerm}
               onChange={(e) => setSearchTerm(e.target.value)}
               className="w-64 px-4 py-2 rounded-full bg-purple-50 focus:outline-none focus:ring-2 focus:ring-purple-500"
@@ -577,6 +549,21 @@ const HistoryPage = () => {
               </table>
             </div>
           </div>
+          {nextCursor && searchTerm && (
+            <p className="mt-4 text-sm text-center text-gray-500">
+              Search covers the {historyData.length} loaded analyses. Load more to search older ones.
+            </p>
+          )}
+          {nextCursor && (
+            <div className="flex justify-center mt-6">
+              <button
+                onClick={handleLoadMore}
+                disabled={loadingMore}
+                className="px-5 py-2 rounded-md bg-purple-600 hover:bg-purple-700 text-white font-medium transition-colors disabled:opacity-60">
+                {loadingMore ? "Loading..." : "Load more"}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -65,8 +65,18 @@ const ProfilePage = () => {
   const fetchUserStats = async () => {
     try {
       if (user?.token) {
-        const response = await api.getUserAnalyses(user.token);
-        const analyses = response.analyses || [];
+        // Page through the history, fetching only the columns the stats need
+        const analyses = [];
+        let cursor = null;
+        do {
+          const response = await api.getUserAnalyses(user.token, {
+            limit: 200,
+            cursor,
+            fields: ["confidence_score", "analysis_timestamp"],
+          });
+          analyses.push(...(response.analyses || []));
+          cursor = response.next_cursor;
+        } while (cursor);
         
         setStats({
           totalAnalyses: analyses.length,
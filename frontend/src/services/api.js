@@ -109,6 +109,64 @@ export const api = {
         }
     },
 
+    // files: array of audio files and/or .zip/.tar archives
+    detectDeepfakeBatch: async (files, token, onResult = null) => {
+        try {
+            const formData = new FormData();
+            files.forEach((file) => formData.append('files', file));
+            formData.append('stream', onResult ? 'true' : 'false');
+
+            const response = await fetch(`${API_BASE_URL}/detect-deepfake-batch/`, {
+                method: 'POST',
+                headers: {
+                    'Authorization': `Bearer ${token}`,
+                },
+                body: formData,
+            });
+
+            if (!response.ok) {
+                const error = await response.json();
+                throw new Error(error.detail || error.error || 'Batch detection failed');
+            }
+
+            if (!onResult) {
+                return response.json();
+            }
+
+            // Streamed NDJSON: one line per finished file, then a summary line
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            const results = [];
+            let summary = null;
+            let buffered = '';
+
+            const handleLine = (line) => {
+                if (!line.trim()) return;
+                const entry = JSON.parse(line);
+                if (entry.type === 'summary') {
+                    summary = entry;
+                } else {
+                    results.push(entry);
+                    onResult(entry);
+                }
+            };
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffered += decoder.decode(value, { stream: true });
+                const lines = buffered.split('\n');
+                buffered = lines.pop();
+                lines.forEach(handleLine);
+            }
+            handleLine(buffered);
+
+            return { results, summary };
+        } catch (error) {
+            throw new Error(error.message || 'Network error');
+        }
+    },
+
     detectDeepfakeDemo: async (formData) => {
         try {
             const response = await fetch(`${API_BASE_URL}/detect-deepfake-demo`, {
@@ -127,9 +185,17 @@ export const api = {
         }
     },
 
-    getUserAnalyses: async (token) => {
+    // params: { limit, cursor, verdict: 'real' | 'fake', date_from, date_to, model, fields: [...] }
+    getUserAnalyses: async (token, params = {}) => {
         try {
-            const response = await fetch(`${API_BASE_URL}/data/analyses`, {
+            const query = new URLSearchParams();
+            Object.entries(params).forEach(([key, value]) => {
+                if (value !== undefined && value !== null && value !== '') {
+                    query.append(key, Array.isArray(value) ? value.join(',') : value);
+                }
+            });
+            const queryString = query.toString();
+            const response = await fetch(`${API_BASE_URL}/data/analyses${queryString ? `?${queryString}` : ''}`, {
                 method: 'GET',
                 headers: {
                     'Authorization': `Bearer ${token}`,